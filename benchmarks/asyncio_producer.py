@@ -0,0 +1,50 @@
+"""Measure the update rate an asyncio producer can push into a window.
+
+A producer task updates one element as fast as it can, yielding to the
+asyncio loop between updates like a real data feed would, while the window
+runs via run_async(). Run with a display:
+
+    python benchmarks/asyncio_producer.py --seconds 5
+"""
+
+import argparse
+import asyncio
+import time
+
+import wry_py
+
+
+async def produce(window, seconds):
+    loop = asyncio.get_running_loop()
+    while not window.is_running():
+        await asyncio.sleep(0.01)
+    await loop.run_in_executor(None, window.sync)
+
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        count += 1
+        window.update_element("price", wry_py.text(f"{count}").id("price").build())
+        await asyncio.sleep(0)
+    synced = await loop.run_in_executor(None, window.sync, 30.0)
+    elapsed = time.perf_counter() - start
+    window.close()
+    return count, elapsed, synced
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    window = wry_py.UiWindow(title="asyncio producer")
+    window.set_root(wry_py.div().child(wry_py.text("0").id("price")).build())
+
+    producer = asyncio.create_task(produce(window, args.seconds))
+    await window.run_async()
+    count, elapsed, synced = await producer
+    print(f"{count} updates in {elapsed:.2f} s ({count / elapsed:,.0f} updates/s, synced={synced})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
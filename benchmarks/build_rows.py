@@ -0,0 +1,55 @@
+"""Time building a list of N rows with the builder API.
+
+Mirrors the item_list pattern from examples/todo_list: a container with one
+row per item. The per-child loop appends rows with child_builder(); the bulk
+variant hands a generator to extend() in a single call. No window is opened.
+
+    python benchmarks/build_rows.py --rows 10000
+"""
+
+import argparse
+import time
+
+from wry_py import button, div, text
+
+
+def row(i):
+    return (
+        div()
+        .h_flex()
+        .gap(8)
+        .padding(8)
+        .child_builder(text(f"Item {i}").text_color("#1e293b"))
+        .child_builder(button("Remove").on_click(lambda i=i: None))
+    )
+
+
+def build_loop(rows):
+    container = div().v_flex().gap(8)
+    for i in range(rows):
+        container = container.child_builder(row(i))
+    return container.build()
+
+
+def build_bulk(rows):
+    return div().v_flex().gap(8).extend(row(i) for i in range(rows)).build()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 2500, 5000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, build in (("loop", build_loop), ("bulk", build_bulk)):
+        for rows in args.rows:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                build(rows)
+                best = min(best, time.perf_counter() - start)
+            print(f"{name} {rows:>6} rows: {best * 1000:8.1f} ms ({best / rows * 1e6:.2f} us/row)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure end-to-end latency of large tree patches.
+
+Opens a window, then for each tree size sends a fresh tree of N text nodes with
+set_root() and a second tree that changes every node, timing each until
+window.sync() confirms the webview applied it. Run with a display:
+
+    python benchmarks/patch_latency.py --nodes 1000 10000 50000
+"""
+
+import argparse
+import threading
+import time
+
+import wry_py
+
+
+def tree(nodes, label):
+    rows = (wry_py.text(f"{label} {i}").key(str(i)) for i in range(nodes))
+    return wry_py.div().v_flex().extend(rows).build()
+
+
+def timed(window, root):
+    start = time.perf_counter()
+    window.set_root(root)
+    synced = window.sync(timeout=120)
+    return time.perf_counter() - start, synced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    window = wry_py.UiWindow(title="patch latency")
+    results = []
+
+    def drive():
+        try:
+            while not window.is_running():
+                time.sleep(0.01)
+            window.sync()
+            for nodes in args.nodes:
+                window.set_root(wry_py.div().build())
+                window.sync()
+                first, first_synced = timed(window, tree(nodes, "Row"))
+                update, update_synced = timed(window, tree(nodes, "Changed"))
+                results.append((nodes, first, update, first_synced and update_synced))
+        finally:
+            window.close()
+
+    threading.Thread(target=drive, daemon=True).start()
+    window.run()
+
+    if len(results) != len(args.nodes):
+        raise SystemExit("benchmark did not complete")
+    for nodes, first, update, synced in results:
+        print(f"{nodes:>6} nodes: first {first * 1000:8.1f} ms, "
+              f"update {update * 1000:8.1f} ms (synced={synced})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Measure how many update_element() calls per second reach the DOM.
+
+Opens a window, then from a worker thread sends N updates to one element and
+waits for the webview to apply them with window.sync(). Run with a display:
+
+    python benchmarks/update_throughput.py --updates 2000
+"""
+
+import argparse
+import threading
+import time
+
+import wry_py
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--batch", action="store_true", help="send the updates inside window.batch()")
+    args = parser.parse_args()
+
+    window = wry_py.UiWindow(title="update throughput")
+    window.set_root(wry_py.div().child(wry_py.text("0").id("counter")).build())
+    results = {}
+
+    def drive():
+        try:
+            while not window.is_running():
+                time.sleep(0.01)
+            window.sync()
+
+            start = time.perf_counter()
+            if args.batch:
+                with window.batch():
+                    for i in range(args.updates):
+                        window.update_element("counter", wry_py.text(str(i)).id("counter").build())
+            else:
+                for i in range(args.updates):
+                    window.update_element("counter", wry_py.text(str(i)).id("counter").build())
+            results["synced"] = window.sync(timeout=60)
+            results["elapsed"] = time.perf_counter() - start
+        finally:
+            window.close()
+
+    threading.Thread(target=drive, daemon=True).start()
+    window.run()
+
+    if "elapsed" not in results:
+        raise SystemExit("benchmark did not complete")
+    elapsed = results["elapsed"]
+    print(f"{args.updates} updates in {elapsed * 1000:.1f} ms "
+          f"({args.updates / elapsed:,.0f} updates/s, synced={results['synced']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,555 @@
+use crate::protocol;
 use base64::Engine as _;
 use base64::engine::general_purpose::STANDARD;
+use percent_encoding::{NON_ALPHANUMERIC, utf8_percent_encode};
 use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
-use std::collections::HashMap;
-use std::sync::Mutex;
+use pyo3::types::PyDict;
+use std::collections::{BTreeMap, HashMap, HashSet};
+use std::fs::File;
+use std::io::{self, Read, Seek, SeekFrom};
+use std::ops::Deref;
+use std::path::{Path, PathBuf};
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, Mutex, OnceLock, RwLock};
 
-// Global asset store: optional HashMap from name -> bytes
-static ASSET_STORE: Mutex<Option<HashMap<String, Vec<u8>>>> = Mutex::new(None);
+/// Default byte budget for encoded data URIs
+const DEFAULT_CACHE_BUDGET: usize = 32 * 1024 * 1024;
+/// Misses remembered before the negative cache is cleared
+const MAX_REMEMBERED_MISSES: usize = 4096;
+
+/// Where an asset's bytes come from
+enum Source {
+    Memory(Arc<[u8]>),               // Added as bytes
+    File(PathBuf),                   // Mapped on first use
+    Zip(Arc<Mutex<File>>, ZipEntry), // Archive entry, inflated on first use
+}
+
+/// Loaded asset bytes. Mapped files are read straight from the page cache.
+#[derive(Clone)]
+enum Bytes {
+    Shared(Arc<[u8]>),
+    #[cfg(unix)]
+    Mapped(Arc<Mmap>),
+}
+
+impl Deref for Bytes {
+    type Target = [u8];
+
+    fn deref(&self) -> &[u8] {
+        match self {
+            Bytes::Shared(bytes) => bytes,
+            #[cfg(unix)]
+            Bytes::Mapped(map) => map,
+        }
+    }
+}
+
+struct Asset {
+    source: Source,
+    loaded: OnceLock<Bytes>,
+    version: u64, // Bumped when the name is re-added, so cached URLs go stale
+}
+
+impl Asset {
+    fn new(source: Source) -> Self {
+        Asset {
+            source,
+            loaded: OnceLock::new(),
+            version: NEXT_VERSION.fetch_add(1, Ordering::Relaxed),
+        }
+    }
+
+    /// The asset's bytes, loading them on first use. None if they can't be read.
+    fn bytes(&self) -> Option<Bytes> {
+        if let Source::Memory(bytes) = &self.source {
+            return Some(Bytes::Shared(bytes.clone()));
+        }
+        if let Some(bytes) = self.loaded.get() {
+            return Some(bytes.clone());
+        }
+        let loaded = match &self.source {
+            Source::Memory(_) => unreachable!(),
+            Source::File(path) => map_file(path),
+            Source::Zip(archive, entry) => read_zip_entry(archive, entry),
+        };
+        match loaded {
+            Ok(bytes) => Some(self.loaded.get_or_init(|| bytes).clone()),
+            Err(e) => {
+                eprintln!("Failed to load asset: {}", e);
+                None
+            }
+        }
+    }
+}
+
+/// A read-only memory map of a whole file, unmapped when dropped.
+#[cfg(unix)]
+struct Mmap {
+    ptr: *mut libc::c_void,
+    len: usize,
+}
+
+// Safety: the mapping is read-only and owned by this value
+#[cfg(unix)]
+unsafe impl Send for Mmap {}
+#[cfg(unix)]
+unsafe impl Sync for Mmap {}
+
+#[cfg(unix)]
+impl Mmap {
+    /// Map the first `len` bytes of `file`. `len` must not be zero.
+    fn map(file: &File, len: usize) -> io::Result<Self> {
+        use std::os::unix::io::AsRawFd;
+        // Safety: assets are treated as read-only; a file truncated underneath the map is
+        // the same hazard every mmap-based reader accepts.
+        let ptr = unsafe {
+            libc::mmap(
+                std::ptr::null_mut(),
+                len,
+                libc::PROT_READ,
+                libc::MAP_PRIVATE,
+                file.as_raw_fd(),
+                0,
+            )
+        };
+        if ptr == libc::MAP_FAILED {
+            return Err(io::Error::last_os_error());
+        }
+        Ok(Mmap { ptr, len })
+    }
+}
+
+#[cfg(unix)]
+impl Deref for Mmap {
+    type Target = [u8];
+
+    fn deref(&self) -> &[u8] {
+        // Safety: the mapping stays valid and unchanged until drop
+        unsafe { std::slice::from_raw_parts(self.ptr as *const u8, self.len) }
+    }
+}
+
+#[cfg(unix)]
+impl Drop for Mmap {
+    fn drop(&mut self) {
+        unsafe {
+            libc::munmap(self.ptr, self.len);
+        }
+    }
+}
+
+fn map_file(path: &Path) -> io::Result<Bytes> {
+    let file = File::open(path)?;
+    let len = usize::try_from(file.metadata()?.len()).map_err(io::Error::other)?;
+    // Mapping an empty file fails
+    if len == 0 {
+        return Ok(Bytes::Shared(Arc::from(&[][..])));
+    }
+    #[cfg(unix)]
+    let bytes = Bytes::Mapped(Arc::new(Mmap::map(&file, len)?));
+    // Elsewhere the file is read in whole, still only on first use
+    #[cfg(not(unix))]
+    let bytes = {
+        let mut bytes = Vec::with_capacity(len);
+        (&file).read_to_end(&mut bytes)?;
+        Bytes::Shared(bytes.into())
+    };
+    Ok(bytes)
+}
+
+/// Where a file sits in a zip archive, as listed by its central directory.
+#[derive(Clone, Debug)]
+struct ZipEntry {
+    name: String,
+    deflated: bool, // Otherwise stored as is
+    crc: u32,
+    compressed_size: u64,
+    size: u64,
+    header_offset: u64,
+}
+
+const ZIP_END_SIGNATURE: u32 = 0x0605_4b50;
+const ZIP_CENTRAL_SIGNATURE: u32 = 0x0201_4b50;
+const ZIP_LOCAL_SIGNATURE: u32 = 0x0403_4b50;
+
+fn invalid_zip(message: impl Into<String>) -> io::Error {
+    io::Error::new(io::ErrorKind::InvalidData, message.into())
+}
+
+fn le16(bytes: &[u8], at: usize) -> u16 {
+    u16::from_le_bytes([bytes[at], bytes[at + 1]])
+}
+
+fn le32(bytes: &[u8], at: usize) -> u32 {
+    u32::from_le_bytes([bytes[at], bytes[at + 1], bytes[at + 2], bytes[at + 3]])
+}
+
+/// List the files in a zip archive. Only the central directory is read.
+fn read_zip_entries(file: &mut File) -> io::Result<Vec<ZipEntry>> {
+    // The end record is 22 bytes, followed by a comment of up to 64 KiB
+    let len = file.metadata()?.len();
+    let tail_len = len.min(22 + 0xFFFF);
+    file.seek(SeekFrom::Start(len - tail_len))?;
+    let mut tail = vec![0; tail_len as usize];
+    file.read_exact(&mut tail)?;
+    let end = (0..tail.len().saturating_sub(21))
+        .rev()
+        .find(|&at| le32(&tail, at) == ZIP_END_SIGNATURE)
+        .ok_or_else(|| invalid_zip("no end of central directory record"))?;
+
+    let count = le16(&tail, end + 10);
+    let size = le32(&tail, end + 12);
+    let offset = le32(&tail, end + 16);
+    if count == u16::MAX || size == u32::MAX || offset == u32::MAX {
+        return Err(invalid_zip("zip64 archives are not supported"));
+    }
+    file.seek(SeekFrom::Start(offset as u64))?;
+    let mut directory = vec![0; size as usize];
+    file.read_exact(&mut directory)?;
+
+    let mut entries = Vec::with_capacity(count as usize);
+    let mut at = 0;
+    for _ in 0..count {
+        if directory.len() < at + 46 || le32(&directory, at) != ZIP_CENTRAL_SIGNATURE {
+            return Err(invalid_zip("truncated central directory"));
+        }
+        let flags = le16(&directory, at + 8);
+        let method = le16(&directory, at + 10);
+        let name_end = at + 46 + le16(&directory, at + 28) as usize;
+        let name = directory
+            .get(at + 46..name_end)
+            .ok_or_else(|| invalid_zip("truncated central directory"))?;
+        let name = String::from_utf8_lossy(name).into_owned();
+        let entry = ZipEntry {
+            deflated: method == 8,
+            crc: le32(&directory, at + 16),
+            compressed_size: le32(&directory, at + 20) as u64,
+            size: le32(&directory, at + 24) as u64,
+            header_offset: le32(&directory, at + 42) as u64,
+            name,
+        };
+        at = name_end + le16(&directory, at + 30) as usize + le16(&directory, at + 32) as usize;
+
+        if entry.name.ends_with('/') {
+            continue;
+        }
+        if flags & 1 != 0 {
+            return Err(invalid_zip(format!("{} is encrypted", entry.name)));
+        }
+        if method != 0 && method != 8 {
+            return Err(invalid_zip(format!(
+                "{} uses unsupported compression method {}",
+                entry.name, method
+            )));
+        }
+        entries.push(entry);
+    }
+    Ok(entries)
+}
+
+fn read_zip_entry(archive: &Mutex<File>, entry: &ZipEntry) -> io::Result<Bytes> {
+    let mut data = vec![0; entry.compressed_size as usize];
+    {
+        let mut file = archive.lock().unwrap();
+        let mut header = [0; 30];
+        file.seek(SeekFrom::Start(entry.header_offset))?;
+        file.read_exact(&mut header)?;
+        if le32(&header, 0) != ZIP_LOCAL_SIGNATURE {
+            return Err(invalid_zip(format!("{} has no local header", entry.name)));
+        }
+        // The local name and extra field needn't match the central directory's
+        let skip = le16(&header, 26) as i64 + le16(&header, 28) as i64;
+        file.seek(SeekFrom::Current(skip))?;
+        file.read_exact(&mut data)?;
+    }
+    if entry.deflated {
+        data = miniz_oxide::inflate::decompress_to_vec_with_limit(&data, entry.size as usize)
+            .map_err(|_| invalid_zip(format!("{} has corrupt compressed data", entry.name)))?;
+    }
+    if data.len() as u64 != entry.size || crc32fast::hash(&data) != entry.crc {
+        return Err(invalid_zip(format!("{} failed its CRC check", entry.name)));
+    }
+    Ok(Bytes::Shared(data.into()))
+}
+
+/// Registered assets, with an index for lookups by file name.
+struct Store {
+    assets: HashMap<String, Arc<Asset>>,
+    by_basename: HashMap<String, Vec<String>>, // "logo.png" -> names ending in it, oldest first
+    misses: HashSet<String>,                   // Lookups known to find nothing
+    generation: u64,                           // Bumped by every add; guards `misses`
+}
+
+impl Store {
+    fn new() -> Self {
+        Store {
+            assets: HashMap::new(),
+            by_basename: HashMap::new(),
+            misses: HashSet::new(),
+            generation: 0,
+        }
+    }
+
+    fn insert(&mut self, name: String, asset: Asset) {
+        if !self.assets.contains_key(&name) {
+            self.by_basename
+                .entry(basename(&name).to_string())
+                .or_default()
+                .push(name.clone());
+        }
+        self.assets.insert(name, Arc::new(asset));
+        // Any remembered miss may now resolve
+        self.misses.clear();
+        self.generation += 1;
+    }
+
+    /// The stored name and asset for a lookup by exact name, or by a trailing part of
+    /// a stored name that starts at a path component ("logo.png", "icons/logo.png").
+    fn find(&self, name: &str) -> Option<(&str, &Arc<Asset>)> {
+        if let Some((key, asset)) = self.assets.get_key_value(name) {
+            return Some((key, asset));
+        }
+        let candidates = self.by_basename.get(basename(name))?;
+        candidates
+            .iter()
+            .find(|k| k.ends_with(name) && k[..k.len() - name.len()].ends_with(['/', '\\']))
+            .and_then(|k| self.assets.get_key_value(k.as_str()))
+            .map(|(key, asset)| (key.as_str(), asset))
+    }
+}
+
+fn basename(name: &str) -> &str {
+    name.rsplit(['/', '\\']).next().unwrap_or(name)
+}
+
+// Global asset store. Lookups happen on every render, so they only take a read lock.
+static ASSET_STORE: RwLock<Option<Store>> = RwLock::new(None);
+static NEXT_VERSION: AtomicU64 = AtomicU64::new(1);
+static DATA_URI_CACHE: Mutex<Option<DataUriCache>> = Mutex::new(None);
 
 fn init_store() {
-    let mut s = ASSET_STORE.lock().unwrap();
+    let mut s = ASSET_STORE.write().unwrap();
     if s.is_none() {
-        *s = Some(HashMap::new());
+        *s = Some(Store::new());
     }
 }
 
-fn store_put(name: String, bytes: Vec<u8>) {
+fn store_add(entries: impl IntoIterator<Item = (String, Source)>) -> usize {
     init_store();
-    let mut s = ASSET_STORE.lock().unwrap();
-    if let Some(ref mut map) = *s {
-        map.insert(name, bytes);
+    let entries: Vec<(String, Source)> = entries.into_iter().collect();
+    with_cache(|cache| {
+        for (name, _) in &entries {
+            cache.invalidate(name);
+        }
+    });
+    let count = entries.len();
+    let mut s = ASSET_STORE.write().unwrap();
+    if let Some(ref mut store) = *s {
+        for (name, source) in entries {
+            store.insert(name, Asset::new(source));
+        }
     }
+    count
 }
 
-fn store_get(name: &str) -> Option<Vec<u8>> {
-    let s = ASSET_STORE.lock().unwrap();
-    if let Some(ref map) = *s {
-        map.get(name).cloned()
-    } else {
-        None
-    }
+fn store_put(name: String, bytes: Vec<u8>) {
+    store_add([(name, Source::Memory(bytes.into()))]);
+}
+
+/// Bytes of an asset by its exact stored name, loaded outside the store lock.
+fn store_get(name: &str) -> Option<Bytes> {
+    let asset = {
+        let s = ASSET_STORE.read().unwrap();
+        s.as_ref()?.assets.get(name)?.clone()
+    };
+    asset.bytes()
 }
 
-fn store_get_by_basename(basename: &str) -> Option<Vec<u8>> {
-    let s = ASSET_STORE.lock().unwrap();
-    if let Some(ref map) = *s {
-        for (k, v) in map.iter() {
-            if k.ends_with(basename) || k == basename {
-                return Some(v.clone());
+/// The stored name and version of an asset, looked up by name or basename.
+fn store_find(name: &str) -> Option<(String, u64)> {
+    let generation = {
+        let s = ASSET_STORE.read().unwrap();
+        let store = s.as_ref()?;
+        if let Some((key, asset)) = store.find(name) {
+            return Some((key.to_string(), asset.version));
+        }
+        if store.misses.contains(name) {
+            return None;
+        }
+        store.generation
+    };
+
+    // Remember the miss, unless an asset was added since we looked
+    let mut s = ASSET_STORE.write().unwrap();
+    if let Some(ref mut store) = *s {
+        if store.generation == generation {
+            if store.misses.len() >= MAX_REMEMBERED_MISSES {
+                store.misses.clear();
             }
+            store.misses.insert(name.to_string());
         }
     }
     None
 }
 
-fn guess_mime_from_name(name: &str) -> &str {
+/// Files under `root` whose path relative to it matches `pattern`, as (name, path)
+/// pairs sorted by name. Names use '/' on every platform.
+fn walk_dir(root: &Path, pattern: &str) -> io::Result<Vec<(String, PathBuf)>> {
+    fn walk(
+        dir: &Path,
+        prefix: &str,
+        pattern: &str,
+        out: &mut Vec<(String, PathBuf)>,
+    ) -> io::Result<()> {
+        for entry in std::fs::read_dir(dir)? {
+            let entry = entry?;
+            let name = format!("{}{}", prefix, entry.file_name().to_string_lossy());
+            let path = entry.path();
+            // Symlinked directories aren't followed, so a link loop can't recurse forever
+            if entry.file_type()?.is_dir() {
+                walk(&path, &format!("{}/", name), pattern, out)?;
+            } else if path.is_file() && glob_matches(pattern, &name) {
+                out.push((name, path));
+            }
+        }
+        Ok(())
+    }
+
+    let mut files = Vec::new();
+    walk(root, "", pattern, &mut files)?;
+    files.sort();
+    Ok(files)
+}
+
+/// Match a '/'-separated path against a glob: `*` and `?` within one component, `**`
+/// across any number of them.
+fn glob_matches(pattern: &str, path: &str) -> bool {
+    fn components(pattern: &[&str], path: &[&str]) -> bool {
+        match pattern.split_first() {
+            None => path.is_empty(),
+            Some((&"**", rest)) => (0..=path.len()).any(|i| components(rest, &path[i..])),
+            Some((first, rest)) => match path.split_first() {
+                Some((name, path_rest)) => {
+                    let first: Vec<char> = first.chars().collect();
+                    let name: Vec<char> = name.chars().collect();
+                    component(&first, &name) && components(rest, path_rest)
+                }
+                None => false,
+            },
+        }
+    }
+
+    fn component(pattern: &[char], name: &[char]) -> bool {
+        match pattern.split_first() {
+            None => name.is_empty(),
+            Some(('*', rest)) => (0..=name.len()).any(|i| component(rest, &name[i..])),
+            Some(('?', rest)) => !name.is_empty() && component(rest, &name[1..]),
+            Some((c, rest)) => name.first() == Some(c) && component(rest, &name[1..]),
+        }
+    }
+
+    let pattern: Vec<&str> = pattern.split('/').collect();
+    let path: Vec<&str> = path.split('/').collect();
+    components(&pattern, &path)
+}
+
+struct CachedUri {
+    uri: String,
+    version: u64,   // Asset version the URI was encoded from
+    last_used: u64, // Key into DataUriCache::recency
+}
+
+/// Encoded data URIs, kept within a byte budget by evicting the least recently used.
+struct DataUriCache {
+    entries: HashMap<String, CachedUri>,
+    recency: BTreeMap<u64, String>, // Oldest use first
+    clock: u64,
+    bytes: usize,
+    budget: usize,
+    hits: u64,
+    misses: u64,
+}
+
+impl DataUriCache {
+    fn new() -> Self {
+        DataUriCache {
+            entries: HashMap::new(),
+            recency: BTreeMap::new(),
+            clock: 0,
+            bytes: 0,
+            budget: DEFAULT_CACHE_BUDGET,
+            hits: 0,
+            misses: 0,
+        }
+    }
+
+    fn get(&mut self, name: &str, version: u64) -> Option<String> {
+        self.clock += 1;
+        match self.entries.get_mut(name) {
+            Some(entry) if entry.version == version => {
+                self.recency.remove(&entry.last_used);
+                self.recency.insert(self.clock, name.to_string());
+                entry.last_used = self.clock;
+                self.hits += 1;
+                Some(entry.uri.clone())
+            }
+            _ => {
+                self.misses += 1;
+                None
+            }
+        }
+    }
+
+    fn insert(&mut self, name: String, version: u64, uri: String) {
+        self.invalidate(&name);
+        if uri.len() > self.budget {
+            return;
+        }
+        self.clock += 1;
+        self.bytes += uri.len();
+        self.recency.insert(self.clock, name.clone());
+        self.entries.insert(
+            name,
+            CachedUri {
+                uri,
+                version,
+                last_used: self.clock,
+            },
+        );
+        self.evict();
+    }
+
+    fn invalidate(&mut self, name: &str) {
+        if let Some(entry) = self.entries.remove(name) {
+            self.recency.remove(&entry.last_used);
+            self.bytes -= entry.uri.len();
+        }
+    }
+
+    fn set_budget(&mut self, budget: usize) {
+        self.budget = budget;
+        self.evict();
+    }
+
+    fn evict(&mut self) {
+        while self.bytes > self.budget {
+            let Some((_, name)) = self.recency.pop_first() else {
+                break;
+            };
+            if let Some(entry) = self.entries.remove(&name) {
+                self.bytes -= entry.uri.len();
+            }
+        }
+    }
+}
+
+fn with_cache<R>(f: impl FnOnce(&mut DataUriCache) -> R) -> R {
+    let mut cache = DATA_URI_CACHE.lock().unwrap();
+    f(cache.get_or_insert_with(DataUriCache::new))
+}
+
+fn guess_mime_from_name(name: &str) -> &'static str {
     let name = name.to_lowercase();
     if name.ends_with(".png") {
         "image/png"
@@ -58,6 +563,20 @@ fn guess_mime_from_name(name: &str) -> &str {
         "image/webp"
     } else if name.ends_with(".bmp") {
         "image/bmp"
+    } else if name.ends_with(".ico") {
+        "image/x-icon"
+    } else if name.ends_with(".avif") {
+        "image/avif"
+    } else if name.ends_with(".woff2") {
+        "font/woff2"
+    } else if name.ends_with(".woff") {
+        "font/woff"
+    } else if name.ends_with(".ttf") {
+        "font/ttf"
+    } else if name.ends_with(".otf") {
+        "font/otf"
+    } else if name.ends_with(".css") {
+        "text/css"
     } else {
         "application/octet-stream"
     }
@@ -92,34 +611,126 @@ impl AssetCatalog {
         Ok(())
     }
 
+    /// Register a file on disk. Nothing is read until the asset is first served, and
+    /// then the file is memory-mapped rather than copied.
+    #[pyo3(signature = (path, name = None), text_signature = "($self, path, name=None)")]
+    fn add_file(&self, path: PathBuf, name: Option<String>) -> PyResult<()> {
+        let path = std::fs::canonicalize(path)?;
+        if !path.is_file() {
+            return Err(PyValueError::new_err(format!(
+                "{} is not a file",
+                path.display()
+            )));
+        }
+        let name = name.unwrap_or_else(|| basename(&path.to_string_lossy()).to_string());
+        store_add([(name, Source::File(path))]);
+        Ok(())
+    }
+
+    /// Register every file under `root` whose relative path matches `glob`, named by
+    /// that path. Files are mapped lazily, as with add_file(). Returns the count added.
+    #[pyo3(signature = (root, glob = "**/*"), text_signature = "($self, root, glob=\"**/*\")")]
+    fn add_dir(&self, root: PathBuf, glob: &str) -> PyResult<usize> {
+        let root = std::fs::canonicalize(root)?;
+        let files = walk_dir(&root, glob)?;
+        Ok(store_add(
+            files
+                .into_iter()
+                .map(|(name, path)| (name, Source::File(path))),
+        ))
+    }
+
+    /// Register every file in a zip archive, named by its path inside the archive.
+    /// Entries are inflated the first time they are served. Returns the count added.
+    #[pyo3(text_signature = "($self, path)")]
+    fn add_zip(&self, path: PathBuf) -> PyResult<usize> {
+        let mut file = File::open(&path)?;
+        let entries = read_zip_entries(&mut file).map_err(|e| {
+            PyValueError::new_err(format!(
+                "{} is not a valid zip archive: {}",
+                path.display(),
+                e
+            ))
+        })?;
+        let archive = Arc::new(Mutex::new(file));
+        Ok(store_add(entries.into_iter().map(|entry| {
+            (entry.name.clone(), Source::Zip(archive.clone(), entry))
+        })))
+    }
+
+    /// Return the URL the webview loads an asset from if present, else None.
+    #[pyo3(text_signature = "($self, name)")]
+    fn get_url(&self, name: String) -> Option<String> {
+        get_asset_url(&name)
+    }
+
     /// Return an asset data URI if present, else None.
     #[pyo3(text_signature = "($self, name)")]
     fn get_data_uri(&self, name: String) -> Option<String> {
-        if let Some(b) = store_get(&name) {
-            Some(bytes_to_data_uri(&name, &b))
-        } else if let Some(b) = store_get_by_basename(&name) {
-            Some(bytes_to_data_uri(&name, &b))
-        } else {
-            None
-        }
+        get_asset_data_uri(&name)
+    }
+
+    /// Limit the memory held by cached data URIs, evicting the least recently used.
+    #[pyo3(text_signature = "($self, max_bytes)")]
+    fn set_cache_budget(&self, max_bytes: usize) {
+        with_cache(|cache| cache.set_budget(max_bytes));
+    }
+
+    /// Return data URI cache counters: hits, misses, entries, bytes and budget.
+    #[pyo3(text_signature = "($self)")]
+    fn cache_stats<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyDict>> {
+        let stats = PyDict::new(py);
+        with_cache(|cache| -> PyResult<()> {
+            stats.set_item("hits", cache.hits)?;
+            stats.set_item("misses", cache.misses)?;
+            stats.set_item("entries", cache.entries.len())?;
+            stats.set_item("bytes", cache.bytes)?;
+            stats.set_item("budget", cache.budget)?;
+            Ok(())
+        })?;
+        Ok(stats)
     }
 }
 
 // Helpers for other Rust code to consult the store
+
+/// URL of an asset on the window's custom protocol.
+///
+/// The URL carries the asset's version, so the webview can cache it indefinitely.
+pub fn get_asset_url(name: &str) -> Option<String> {
+    let (name, version) = store_find(name)?;
+    let path = format!(
+        "asset/{}?v={}",
+        utf8_percent_encode(&name, NON_ALPHANUMERIC),
+        version
+    );
+    Some(protocol::url(&path))
+}
+
+/// Bytes and MIME type of an asset, by its exact stored name.
+pub fn get_asset(name: &str) -> Option<(impl Deref<Target = [u8]>, &'static str)> {
+    store_get(name).map(|bytes| (bytes, guess_mime_from_name(name)))
+}
+
+/// Data URI of an asset, looked up by name or basename. Encoded once per version.
 pub fn get_asset_data_uri(name: &str) -> Option<String> {
-    if let Some(b) = store_get(name) {
-        Some(bytes_to_data_uri(name, &b))
-    } else if let Some(b) = store_get_by_basename(name) {
-        Some(bytes_to_data_uri(name, &b))
-    } else {
-        None
+    let (name, version) = store_find(name)?;
+    if let Some(uri) = with_cache(|cache| cache.get(&name, version)) {
+        return Some(uri);
     }
+    let bytes = store_get(&name)?;
+    // Encode outside the lock so other lookups aren't held up by a large asset
+    let uri = bytes_to_data_uri(&name, &bytes);
+    with_cache(|cache| cache.insert(name, version, uri.clone()));
+    Some(uri)
 }
 
 #[cfg(test)]
 mod tests {
     use super::*;
-    use std::collections::HashMap;
+
+    // Tests that reset or inspect the global store take this first
+    static GLOBAL_STORE: Mutex<()> = Mutex::new(());
 
     #[test]
     fn test_guess_mime_from_name() {
@@ -127,7 +738,10 @@ mod tests {
         assert_eq!(guess_mime_from_name("foo.JPG"), "image/jpeg");
         assert_eq!(guess_mime_from_name("foo.svg"), "image/svg+xml");
         assert_eq!(guess_mime_from_name("foo.webp"), "image/webp");
-        assert_eq!(guess_mime_from_name("foo.unknown"), "application/octet-stream");
+        assert_eq!(
+            guess_mime_from_name("foo.unknown"),
+            "application/octet-stream"
+        );
     }
 
     #[test]
@@ -141,10 +755,11 @@ mod tests {
 
     #[test]
     fn test_store_and_get_asset_data_uri() {
+        let _guard = GLOBAL_STORE.lock().unwrap();
         // reset the global store
         {
-            let mut s = ASSET_STORE.lock().unwrap();
-            *s = Some(HashMap::new());
+            let mut s = ASSET_STORE.write().unwrap();
+            *s = Some(Store::new());
         }
 
         let name = "images/logo.png".to_string();
@@ -160,5 +775,220 @@ mod tests {
         // lookup by basename
         let uri2 = get_asset_data_uri("logo.png");
         assert!(uri2.is_some());
+
+        // URLs name the stored asset and change when it is replaced
+        let url = get_asset_url("logo.png").unwrap();
+        assert!(url.contains("asset/images%2Flogo%2Epng?v="));
+        store_put(name.clone(), bytes.clone());
+        assert_ne!(get_asset_url("logo.png").unwrap(), url);
+
+        let (served, mime) = get_asset("images/logo.png").unwrap();
+        assert_eq!(&served[..], &bytes[..]);
+        assert_eq!(mime, "image/png");
+        assert!(get_asset("logo.png").is_none());
+    }
+
+    #[test]
+    fn test_find_by_trailing_path_components() {
+        let memory = |bytes: &[u8]| Asset::new(Source::Memory(bytes.into()));
+        let mut store = Store::new();
+        store.insert("a/icons/logo.png".to_string(), memory(b"1"));
+        store.insert("b/icons/logo.png".to_string(), memory(b"2"));
+        store.insert("b/photos/logo.png".to_string(), memory(b"3"));
+
+        let found = |name| store.find(name).map(|(key, _)| key.to_string());
+        assert_eq!(
+            found("b/icons/logo.png").as_deref(),
+            Some("b/icons/logo.png")
+        );
+        assert_eq!(found("logo.png").as_deref(), Some("a/icons/logo.png"));
+        assert_eq!(
+            found("photos/logo.png").as_deref(),
+            Some("b/photos/logo.png")
+        );
+        assert_eq!(found("go.png"), None);
+        assert_eq!(found("missing.png"), None);
+    }
+
+    #[test]
+    fn test_misses_are_remembered_until_next_add() {
+        let _guard = GLOBAL_STORE.lock().unwrap();
+        init_store();
+        let remembered = |name: &str| {
+            let s = ASSET_STORE.read().unwrap();
+            s.as_ref().unwrap().misses.contains(name)
+        };
+
+        assert!(store_find("miss-test.png").is_none());
+        assert!(remembered("miss-test.png"));
+        assert!(store_find("miss-test.png").is_none());
+
+        store_put("later/miss-test.png".to_string(), vec![1, 2, 3]);
+        assert!(!remembered("miss-test.png"));
+        assert_eq!(
+            store_find("miss-test.png").unwrap().0,
+            "later/miss-test.png"
+        );
+    }
+
+    #[test]
+    fn test_glob_matches() {
+        assert!(glob_matches("**/*", "logo.png"));
+        assert!(glob_matches("**/*", "icons/dark/logo.png"));
+        assert!(glob_matches("*.png", "logo.png"));
+        assert!(!glob_matches("*.png", "icons/logo.png"));
+        assert!(glob_matches("**/*.png", "icons/logo.png"));
+        assert!(glob_matches("icons/**/*.svg", "icons/a/b/x.svg"));
+        assert!(glob_matches("icons/**/*.svg", "icons/x.svg"));
+        assert!(!glob_matches("icons/**/*.svg", "fonts/x.svg"));
+        assert!(glob_matches("icon-??.png", "icon-01.png"));
+        assert!(!glob_matches("icon-??.png", "icon-1.png"));
+    }
+
+    #[test]
+    fn test_files_load_on_first_use() {
+        let root = std::env::temp_dir().join(format!("wry-assets-{}", std::process::id()));
+        std::fs::create_dir_all(root.join("icons")).unwrap();
+        std::fs::write(root.join("icons/a.png"), b"png").unwrap();
+        std::fs::write(root.join("icons/b.svg"), b"svg").unwrap();
+        std::fs::write(root.join("empty.png"), b"").unwrap();
+
+        let files = walk_dir(&root, "**/*.png").unwrap();
+        let names: Vec<&str> = files.iter().map(|(name, _)| name.as_str()).collect();
+        assert_eq!(names, ["empty.png", "icons/a.png"]);
+
+        let asset = Asset::new(Source::File(files[1].1.clone()));
+        assert!(asset.loaded.get().is_none());
+        assert_eq!(&asset.bytes().unwrap()[..], b"png");
+        assert!(asset.loaded.get().is_some());
+        let empty = Asset::new(Source::File(files[0].1.clone()));
+        assert_eq!(empty.bytes().unwrap().len(), 0);
+
+        std::fs::remove_dir_all(&root).unwrap();
+        assert!(
+            Asset::new(Source::File(files[1].1.clone()))
+                .bytes()
+                .is_none()
+        );
+    }
+
+    #[test]
+    fn test_zip_entries_load_on_first_use() {
+        // Written by Python's zipfile: a directory, a deflated and a stored entry
+        let hex = concat!(
+            "504b0304140000000000000021580000000000000000000000000600000069636f6e732f504b0304",
+            "14000000080000002158be6778610b000000780000000b00000069636f6e732f612e737667b3292e",
+            "4bd7b7b3a13b0900504b0304140000000000000021580bf94356060000000600000005000000622e",
+            "74787473746f726564504b0102140314000000000000002158000000000000000000000000060000",
+            "00000000000000000080010000000069636f6e732f504b0102140314000000080000002158be6778",
+            "610b000000780000000b000000000000000000000080012400000069636f6e732f612e737667504b",
+            "01021403140000000000000021580bf9435606000000060000000500000000000000000000008001",
+            "58000000622e747874504b05060000000003000300a0000000810000000000",
+        );
+        let mut zip: Vec<u8> = (0..hex.len())
+            .step_by(2)
+            .map(|i| u8::from_str_radix(&hex[i..i + 2], 16).unwrap())
+            .collect();
+        let path = std::env::temp_dir().join(format!("wry-assets-{}.zip", std::process::id()));
+        std::fs::write(&path, &zip).unwrap();
+
+        let mut file = File::open(&path).unwrap();
+        let entries = read_zip_entries(&mut file).unwrap();
+        let names: Vec<&str> = entries.iter().map(|entry| entry.name.as_str()).collect();
+        assert_eq!(names, ["icons/a.svg", "b.txt"]);
+        let archive = Arc::new(Mutex::new(file));
+        let load =
+            |entry: &ZipEntry| Asset::new(Source::Zip(archive.clone(), entry.clone())).bytes();
+        assert_eq!(
+            &load(&entries[0]).unwrap()[..],
+            "<svg/>".repeat(20).as_bytes()
+        );
+        assert_eq!(&load(&entries[1]).unwrap()[..], b"stored");
+
+        // A damaged entry fails its CRC check instead of serving bad bytes
+        let stored = zip.windows(6).position(|w| w == b"stored").unwrap();
+        zip[stored] = b'S';
+        std::fs::write(&path, &zip).unwrap();
+        let archive = Arc::new(Mutex::new(File::open(&path).unwrap()));
+        assert!(
+            Asset::new(Source::Zip(archive, entries[1].clone()))
+                .bytes()
+                .is_none()
+        );
+
+        std::fs::write(&path, b"not a zip").unwrap();
+        assert!(read_zip_entries(&mut File::open(&path).unwrap()).is_err());
+        std::fs::remove_file(&path).unwrap();
+    }
+
+    /// Lookups against 10k registered assets, as resolve_local_asset() makes them.
+    /// Run with `cargo test --release bench_lookup_10k_assets -- --ignored --nocapture`.
+    #[test]
+    #[ignore]
+    fn bench_lookup_10k_assets() {
+        use std::time::Instant;
+
+        let _guard = GLOBAL_STORE.lock().unwrap();
+        init_store();
+        for i in 0..10_000 {
+            store_put(format!("icons/set-{}/icon-{}.png", i % 10, i), vec![0; 16]);
+        }
+
+        let start = Instant::now();
+        for i in 0..10_000 {
+            assert!(get_asset_url(&format!("icon-{}.png", i)).is_some());
+        }
+        let hits = start.elapsed();
+
+        // A plain file path misses twice: once by path, once by basename
+        let start = Instant::now();
+        for _ in 0..100 {
+            for i in 0..100 {
+                assert!(get_asset_url(&format!("photos/photo-{}.jpg", i)).is_none());
+                assert!(get_asset_url(&format!("photo-{}.jpg", i)).is_none());
+            }
+        }
+        let misses = start.elapsed();
+
+        println!("10k basename hits: {:?} ({:?}/lookup)", hits, hits / 10_000);
+        println!(
+            "20k misses:        {:?} ({:?}/lookup)",
+            misses,
+            misses / 20_000
+        );
+    }
+
+    #[test]
+    fn test_data_uri_cache_hits_until_version_changes() {
+        let mut cache = DataUriCache::new();
+        assert_eq!(cache.get("a.png", 1), None);
+        cache.insert("a.png".to_string(), 1, "data:a".to_string());
+        assert_eq!(cache.get("a.png", 1), Some("data:a".to_string()));
+        assert_eq!(cache.get("a.png", 2), None);
+        assert_eq!((cache.hits, cache.misses), (1, 2));
+    }
+
+    #[test]
+    fn test_data_uri_cache_evicts_least_recently_used() {
+        let mut cache = DataUriCache::new();
+        cache.set_budget(10);
+        cache.insert("a".to_string(), 1, "aaaa".to_string());
+        cache.insert("b".to_string(), 1, "bbbb".to_string());
+        cache.get("a", 1);
+        cache.insert("c".to_string(), 1, "cccc".to_string());
+
+        assert!(cache.get("a", 1).is_some());
+        assert!(cache.get("b", 1).is_none());
+        assert!(cache.get("c", 1).is_some());
+        assert_eq!(cache.bytes, 8);
+
+        // Larger than the whole budget: never cached
+        cache.insert("d".to_string(), 1, "d".repeat(11));
+        assert!(cache.get("d", 1).is_none());
+        assert_eq!(cache.bytes, 8);
+
+        cache.set_budget(4);
+        assert_eq!(cache.entries.len(), 1);
+        assert_eq!(cache.recency.len(), 1);
     }
 }
@@ -0,0 +1,751 @@
+use crate::elements::ElementDef;
+use crate::renderer::{assign_stable_ids, has_unique_keys, StateRules};
+use serde::Serialize;
+use std::collections::{BTreeMap, HashMap};
+
+/// A single DOM operation produced by diffing the committed tree against a new one.
+///
+/// Nodes are addressed by their stable path ID (the `data-wry-id` attribute in the DOM).
+#[derive(Debug, Serialize)]
+#[serde(tag = "op", rename_all = "snake_case")]
+pub enum PatchOp {
+    /// Re-apply the properties of an existing node. `node` carries no children.
+    Update { id: String, node: ElementDef },
+    /// Replace a node and its whole subtree
+    Replace { id: String, node: ElementDef },
+    /// Insert a new subtree under `parent`, before the sibling `before` (or at the end)
+    Insert {
+        parent: String,
+        before: Option<String>,
+        node: ElementDef,
+    },
+    /// Move an existing node under `parent`, before the sibling `before` (or to the end)
+    Move {
+        id: String,
+        parent: String,
+        before: Option<String>,
+    },
+    /// Remove a node and its subtree
+    Remove { id: String },
+}
+
+impl PatchOp {
+    /// The node carried by an op that renders one
+    pub fn node_mut(&mut self) -> Option<&mut ElementDef> {
+        match self {
+            PatchOp::Update { node, .. } | PatchOp::Replace { node, .. } | PatchOp::Insert { node, .. } => {
+                Some(node)
+            }
+            PatchOp::Move { .. } | PatchOp::Remove { .. } => None,
+        }
+    }
+}
+
+/// Payload handed to the webview's `applyPatch()`
+#[derive(Serialize)]
+pub struct PatchMessage<'a> {
+    pub ops: &'a [PatchOp],
+}
+
+/// Hover/focus rules the page has to change, by node ID. `None` drops a node's rules.
+pub type StateRuleChanges = BTreeMap<String, Option<Vec<String>>>;
+
+/// Replace the rules `page` holds for the subtree with ID `scope` by `fresh`.
+///
+/// `fresh` holds the rules of every node in that subtree that has any. Only nodes whose
+/// rules appeared, changed or went away are returned, so the page never touches the
+/// rules of the rest of the tree.
+pub fn diff_state_rules(page: &mut StateRules, scope: &str, fresh: StateRules) -> StateRuleChanges {
+    let prefix = format!("{}-", scope);
+    let stale: Vec<String> = page
+        .keys()
+        .filter(|id| (*id == scope || id.starts_with(&prefix)) && !fresh.contains_key(*id))
+        .cloned()
+        .collect();
+    let mut changes = StateRuleChanges::new();
+    for id in stale {
+        page.remove(&id);
+        changes.insert(id, None);
+    }
+    for (id, rules) in fresh {
+        if page.get(&id) != Some(&rules) {
+            changes.insert(id.clone(), Some(rules.clone()));
+            page.insert(id, rules);
+        }
+    }
+    changes
+}
+
+/// Diff two trees that both had stable IDs assigned.
+///
+/// `old` is consumed since it is about to be replaced as the committed tree. Children
+/// are matched by key when all siblings have one and by position otherwise, so
+/// unchanged nodes produce no operations at all.
+pub fn diff_trees(old: ElementDef, new: &mut ElementDef) -> Vec<PatchOp> {
+    let mut ops = Vec::new();
+    diff_node(old, new, &mut ops);
+    ops
+}
+
+fn diff_node(mut old: ElementDef, new: &mut ElementDef, ops: &mut Vec<PatchOp>) {
+    // A node matched by position can have had a key-derived ID, and the page only knows
+    // it by that ID, so its replacement has to be addressed to it
+    if old.id != new.id {
+        ops.push(PatchOp::Replace {
+            id: old.id,
+            node: new.clone(),
+        });
+        return;
+    }
+    // Both nodes sit at the same path, so equal content means nothing below them changed
+    // and the subtree is skipped without visiting it
+    if old.content_hash() == new.content_hash() {
+        return;
+    }
+    if old.element_type != new.element_type {
+        ops.push(PatchOp::Replace {
+            id: old.id,
+            node: new.clone(),
+        });
+        return;
+    }
+
+    // Compare the nodes' own properties with the children taken out, so the
+    // comparison (and the shallow clone for the op) is O(node) instead of O(subtree).
+    // The subtree hashes differ by now, so they're left out of the comparison too.
+    let old_children = std::mem::take(&mut old.children);
+    let new_children = std::mem::take(&mut new.children);
+    old.cached_hash = None;
+    let new_hash = new.cached_hash.take();
+    if old != *new {
+        ops.push(PatchOp::Update {
+            id: new.id.clone(),
+            node: new.clone(),
+        });
+    }
+    new.cached_hash = new_hash;
+    new.children = new_children;
+
+    diff_children(old_children, new, ops);
+}
+
+fn diff_children(old_children: Vec<ElementDef>, parent: &mut ElementDef, ops: &mut Vec<PatchOp>) {
+    if has_unique_keys(&old_children) && has_unique_keys(&parent.children) {
+        diff_keyed_children(old_children, parent, ops);
+        return;
+    }
+
+    let mut old_iter = old_children.into_iter();
+    for new_child in parent.children.iter_mut() {
+        match old_iter.next() {
+            Some(old_child) => diff_node(old_child, new_child, ops),
+            None => ops.push(PatchOp::Insert {
+                parent: parent.id.clone(),
+                before: None,
+                node: new_child.clone(),
+            }),
+        }
+    }
+    for old_child in old_iter {
+        ops.push(PatchOp::Remove { id: old_child.id });
+    }
+}
+
+/// Reconcile keyed children so only inserted, removed and moved nodes produce DOM operations.
+///
+/// Nodes in the longest increasing subsequence of old positions stay put; every other
+/// surviving node is moved, walking right to left so each anchor is already in place.
+fn diff_keyed_children(
+    old_children: Vec<ElementDef>,
+    parent: &mut ElementDef,
+    ops: &mut Vec<PatchOp>,
+) {
+    let old_index: HashMap<&str, usize> = old_children
+        .iter()
+        .enumerate()
+        .filter_map(|(i, c)| c.key.as_deref().map(|k| (k, i)))
+        .collect();
+    let sources: Vec<Option<usize>> = parent
+        .children
+        .iter()
+        .map(|c| c.key.as_deref().and_then(|k| old_index.get(k).copied()))
+        .collect();
+    drop(old_index);
+
+    let mut matched: Vec<Option<ElementDef>> = old_children.into_iter().map(Some).collect();
+    let mut pairs = Vec::with_capacity(sources.len());
+    for (i, source) in sources.iter().enumerate() {
+        if let Some(j) = *source {
+            pairs.push((i, matched[j].take()));
+        }
+    }
+    for old_child in matched.into_iter().flatten() {
+        ops.push(PatchOp::Remove { id: old_child.id });
+    }
+    for (i, old_child) in pairs {
+        if let Some(old_child) = old_child {
+            diff_node(old_child, &mut parent.children[i], ops);
+        }
+    }
+
+    let stays = longest_increasing_subsequence(&sources);
+    let mut before: Option<String> = None;
+    for i in (0..parent.children.len()).rev() {
+        let child = &parent.children[i];
+        match sources[i] {
+            None => ops.push(PatchOp::Insert {
+                parent: parent.id.clone(),
+                before: before.clone(),
+                node: child.clone(),
+            }),
+            Some(_) if !stays[i] => ops.push(PatchOp::Move {
+                id: child.id.clone(),
+                parent: parent.id.clone(),
+                before: before.clone(),
+            }),
+            Some(_) => {}
+        }
+        before = Some(child.id.clone());
+    }
+}
+
+/// Mark the positions of one longest strictly increasing subsequence of `seq`,
+/// ignoring `None` entries. O(n log n).
+fn longest_increasing_subsequence(seq: &[Option<usize>]) -> Vec<bool> {
+    // tails[k] = position in `seq` of the smallest tail of an increasing run of length k+1
+    let mut tails: Vec<usize> = Vec::new();
+    let mut prev: Vec<Option<usize>> = vec![None; seq.len()];
+    for (i, value) in seq.iter().enumerate() {
+        let Some(v) = *value else { continue };
+        let k = tails.partition_point(|&t| seq[t].unwrap_or(0) < v);
+        if k > 0 {
+            prev[i] = Some(tails[k - 1]);
+        }
+        if k == tails.len() {
+            tails.push(i);
+        } else {
+            tails[k] = i;
+        }
+    }
+
+    let mut marks = vec![false; seq.len()];
+    let mut cursor = tails.last().copied();
+    while let Some(i) = cursor {
+        marks[i] = true;
+        cursor = prev[i];
+    }
+    marks
+}
+
+/// Splice `replacement` into `tree` in place of the node whose `user_id` matches.
+///
+/// The replacement inherits the replaced node's path ID so later diffs stay aligned
+/// with the DOM, and the nodes above it drop their content hashes. Returns the replaced
+/// subtree and the spliced one, or None if no node carries that ID.
+pub fn splice_by_user_id<'a>(
+    tree: &'a mut ElementDef,
+    user_id: &str,
+    replacement: &ElementDef,
+) -> Option<(ElementDef, &'a mut ElementDef)> {
+    if tree.user_id.as_deref() == Some(user_id) {
+        let replaced = std::mem::replace(tree, replacement.clone());
+        assign_stable_ids(tree, &replaced.id);
+        return Some((replaced, tree));
+    }
+    let found = tree
+        .children
+        .iter_mut()
+        .find_map(|child| splice_by_user_id(child, user_id, replacement));
+    if found.is_some() {
+        tree.cached_hash = None;
+    }
+    found
+}
+
+/// The node whose `user_id` matches, if any
+pub fn find_by_user_id<'a>(tree: &'a ElementDef, user_id: &str) -> Option<&'a ElementDef> {
+    if tree.user_id.as_deref() == Some(user_id) {
+        return Some(tree);
+    }
+    tree.children.iter().find_map(|child| find_by_user_id(child, user_id))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::renderer::{bind_callbacks, render_to_json};
+    use crate::stylesheet::StyleSheet;
+    use std::collections::HashMap;
+
+    fn text(content: &str) -> ElementDef {
+        let mut el = ElementDef::default();
+        el.element_type = "text".to_string();
+        el.text_content = Some(content.to_string());
+        el
+    }
+
+    fn committed(mut el: ElementDef) -> ElementDef {
+        assign_stable_ids(&mut el, "r");
+        el
+    }
+
+    fn list(items: &[&str]) -> ElementDef {
+        let mut root = ElementDef::default();
+        root.children = items.iter().map(|s| text(s)).collect();
+        committed(root)
+    }
+
+    fn keyed_list(items: &[&str]) -> ElementDef {
+        let mut root = ElementDef::default();
+        root.children = items
+            .iter()
+            .map(|s| {
+                let mut row = text(s);
+                row.key = Some(s.to_string());
+                row
+            })
+            .collect();
+        committed(root)
+    }
+
+    /// Apply ops for a flat list to the old child IDs, mimicking the webview.
+    fn apply_to_ids(old: &ElementDef, ops: &[PatchOp]) -> Vec<String> {
+        let mut ids: Vec<String> = old.children.iter().map(|c| c.id.clone()).collect();
+        let position = |ids: &Vec<String>, before: &Option<String>| match before {
+            Some(b) => ids.iter().position(|id| id == b).unwrap(),
+            None => ids.len(),
+        };
+        for op in ops {
+            match op {
+                PatchOp::Remove { id } => ids.retain(|x| x != id),
+                PatchOp::Insert { before, node, .. } => {
+                    let at = position(&ids, before);
+                    ids.insert(at, node.id.clone());
+                }
+                PatchOp::Move { id, before, .. } => {
+                    ids.retain(|x| x != id);
+                    let at = position(&ids, before);
+                    ids.insert(at, id.clone());
+                }
+                PatchOp::Update { .. } | PatchOp::Replace { .. } => {}
+            }
+        }
+        ids
+    }
+
+    /// Diff `from` -> `to` keyed and unkeyed, check the keyed result, and return both op counts.
+    fn keyed_vs_index(from: &[&str], to: &[&str]) -> (usize, usize) {
+        let old = keyed_list(from);
+        let mut new = keyed_list(to);
+        let keyed_ops = diff_trees(old.clone(), &mut new);
+        let expected: Vec<String> = new.children.iter().map(|c| c.id.clone()).collect();
+        assert_eq!(apply_to_ids(&old, &keyed_ops), expected);
+
+        let index_ops = diff_trees(list(from), &mut list(to));
+        (keyed_ops.len(), index_ops.len())
+    }
+
+    fn rows(n: usize) -> Vec<String> {
+        (0..n).map(|i| format!("row{}", i)).collect()
+    }
+
+    #[test]
+    fn test_identical_trees_produce_no_ops() {
+        let old = list(&["a", "b", "c"]);
+        let mut new = list(&["a", "b", "c"]);
+        assert!(diff_trees(old, &mut new).is_empty());
+    }
+
+    #[test]
+    fn test_changed_prop_produces_single_update() {
+        let old = list(&["a", "b", "c"]);
+        let mut new = list(&["a", "x", "c"]);
+        let ops = diff_trees(old, &mut new);
+        assert_eq!(ops.len(), 1);
+        match &ops[0] {
+            PatchOp::Update { id, node } => {
+                assert_eq!(id, "r-1");
+                assert_eq!(node.text_content.as_deref(), Some("x"));
+                assert!(node.children.is_empty());
+            }
+            other => panic!("unexpected op {:?}", other),
+        }
+        // The new tree keeps its children after the shallow comparison
+        assert_eq!(new.children.len(), 3);
+    }
+
+    #[test]
+    fn test_append_and_truncate() {
+        let ops = diff_trees(list(&["a"]), &mut list(&["a", "b"]));
+        assert!(
+            matches!(&ops[..], [PatchOp::Insert { parent, before: None, .. }] if parent == "r")
+        );
+
+        let ops = diff_trees(list(&["a", "b"]), &mut list(&["a"]));
+        assert!(matches!(&ops[..], [PatchOp::Remove { id }] if id == "r-1"));
+    }
+
+    #[test]
+    fn test_type_change_replaces_subtree() {
+        let old = list(&["a"]);
+        let mut root = ElementDef::default();
+        let mut btn = text("a");
+        btn.element_type = "button".to_string();
+        root.children.push(btn);
+        let mut new = committed(root);
+        let ops = diff_trees(old, &mut new);
+        assert!(matches!(&ops[..], [PatchOp::Replace { id, .. }] if id == "r-0"));
+    }
+
+    #[test]
+    fn test_keyed_prepend() {
+        let old = rows(100);
+        let mut new = vec!["new".to_string()];
+        new.extend(old.iter().cloned());
+        let old: Vec<&str> = old.iter().map(String::as_str).collect();
+        let new: Vec<&str> = new.iter().map(String::as_str).collect();
+
+        let (keyed, index) = keyed_vs_index(&old, &new);
+        assert_eq!(keyed, 1);
+        assert_eq!(index, 101);
+    }
+
+    #[test]
+    fn test_keyed_reverse() {
+        let old = rows(100);
+        let new: Vec<String> = old.iter().rev().cloned().collect();
+        let old: Vec<&str> = old.iter().map(String::as_str).collect();
+        let new: Vec<&str> = new.iter().map(String::as_str).collect();
+
+        let (keyed, index) = keyed_vs_index(&old, &new);
+        assert_eq!(keyed, 99);
+        assert_eq!(index, 100);
+    }
+
+    #[test]
+    fn test_keyed_shuffle() {
+        let old = rows(100);
+        // Deterministic shuffle: stride through the list with a step coprime to its length
+        let new: Vec<String> = (0..100).map(|i| old[(i * 37) % 100].clone()).collect();
+        let old: Vec<&str> = old.iter().map(String::as_str).collect();
+        let new: Vec<&str> = new.iter().map(String::as_str).collect();
+
+        let (keyed, index) = keyed_vs_index(&old, &new);
+        assert!(keyed < index, "keyed {} vs index {}", keyed, index);
+    }
+
+    #[test]
+    fn test_keyed_insert_remove_and_move() {
+        let (keyed, _) = keyed_vs_index(&["a", "b", "c", "d"], &["d", "a", "x", "c"]);
+        // remove b, insert x, move d
+        assert_eq!(keyed, 3);
+    }
+
+    /// Apply ops to a copy of `old` the way the webview applies them to the DOM.
+    fn apply(old: &ElementDef, ops: &[PatchOp]) -> ElementDef {
+        fn find<'a>(node: &'a mut ElementDef, id: &str) -> &'a mut ElementDef {
+            if node.id == id {
+                return node;
+            }
+            let child = node.children.iter_mut().find(|c| c.id == id || id.starts_with(&format!("{}-", c.id)));
+            find(child.unwrap_or_else(|| panic!("no node {}", id)), id)
+        }
+        fn detach(tree: &mut ElementDef, id: &str) -> ElementDef {
+            let parent_id = &id[..id.rfind('-').unwrap()];
+            let parent = find(tree, parent_id);
+            let at = parent.children.iter().position(|c| c.id == id).unwrap();
+            parent.children.remove(at)
+        }
+        fn attach(tree: &mut ElementDef, parent: &str, before: &Option<String>, node: ElementDef) {
+            let parent = find(tree, parent);
+            let at = match before {
+                Some(b) => parent.children.iter().position(|c| &c.id == b).unwrap(),
+                None => parent.children.len(),
+            };
+            parent.children.insert(at, node);
+        }
+
+        let mut tree = old.clone();
+        for op in ops {
+            match op {
+                PatchOp::Update { id, node } => {
+                    let target = find(&mut tree, id);
+                    let children = std::mem::take(&mut target.children);
+                    *target = node.clone();
+                    target.children = children;
+                }
+                PatchOp::Replace { id, node } => *find(&mut tree, id) = node.clone(),
+                PatchOp::Insert { parent, before, node } => attach(&mut tree, parent, before, node.clone()),
+                PatchOp::Move { id, parent, before } => {
+                    let node = detach(&mut tree, id);
+                    attach(&mut tree, parent, before, node);
+                }
+                PatchOp::Remove { id } => {
+                    detach(&mut tree, id);
+                }
+            }
+        }
+        tree
+    }
+
+    /// Diff `old` -> `new` and check that applying the ops to `old` gives `new`.
+    fn assert_patches(old: ElementDef, mut new: ElementDef) {
+        let ops = diff_trees(old.clone(), &mut new);
+        let patched = apply(&old, &ops);
+        assert_eq!(
+            serde_json::to_value(&patched).unwrap(),
+            serde_json::to_value(&new).unwrap(),
+            "{:?}",
+            ops
+        );
+    }
+
+    /// A list where only the texts in `keyed` have a key
+    fn mixed_list(items: &[&str], keyed: &[&str]) -> ElementDef {
+        let mut root = ElementDef::default();
+        root.children = items
+            .iter()
+            .map(|s| {
+                let mut row = text(s);
+                row.key = keyed.contains(s).then(|| s.to_string());
+                row
+            })
+            .collect();
+        committed(root)
+    }
+
+    #[test]
+    fn test_mixed_keys_fall_back_to_index() {
+        let old = mixed_list(&["header", "a", "b"], &["a", "b"]);
+        assert_eq!(old.children[1].id, "r-1");
+        assert_patches(old, mixed_list(&["header", "b"], &["b"]));
+
+        // Leaving or joining the keyed scheme changes every ID, and the page gets the new ones
+        assert_patches(keyed_list(&["a", "b"]), mixed_list(&["x", "a", "b"], &["a", "b"]));
+        assert_patches(mixed_list(&["x", "a", "b"], &["a", "b"]), keyed_list(&["a", "b"]));
+        assert_patches(keyed_list(&["a", "b", "c"]), keyed_list(&["c", "a"]));
+    }
+
+    #[test]
+    fn test_duplicate_keys_fall_back_to_index() {
+        let mut dupes = keyed_list(&["a", "a", "b"]);
+        assign_stable_ids(&mut dupes, "r");
+        let ids: Vec<&str> = dupes.children.iter().map(|c| c.id.as_str()).collect();
+        assert_eq!(ids, ["r-0", "r-1", "r-2"]);
+        assert_patches(dupes, keyed_list(&["b", "a"]));
+    }
+
+    #[test]
+    fn test_lis_marks() {
+        let seq = [Some(3), None, Some(1), Some(2), Some(0), Some(4)];
+        let marks = longest_increasing_subsequence(&seq);
+        assert_eq!(marks, vec![false, false, true, true, false, true]);
+    }
+
+    /// A row of buttons whose click handlers carry freshly minted IDs, as after a re-render.
+    fn buttons(render: usize) -> (ElementDef, HashMap<String, String>) {
+        let mut root = ElementDef::default();
+        for i in 0..3 {
+            let mut button = text("go");
+            button.element_type = "button".to_string();
+            button.on_click = Some(format!("el_{}_{}", render, i));
+            root.children.push(button);
+        }
+        let mut tree = committed(root);
+        let mut bindings = HashMap::new();
+        bind_callbacks(&mut tree, &mut bindings);
+        (tree, bindings)
+    }
+
+    #[test]
+    fn test_rebound_handlers_diff_to_nothing() {
+        let (old, _) = buttons(1);
+        let (mut new, bindings) = buttons(2);
+        assert!(diff_trees(old, &mut new).is_empty());
+        assert_eq!(new.children[2].on_click.as_deref(), Some("r-2:click"));
+        assert_eq!(bindings["r-2:click"], "el_2_2");
+    }
+
+    #[test]
+    fn test_new_handler_is_an_update() {
+        let (old, _) = buttons(1);
+        let (mut new, _) = buttons(2);
+        new.children[0].on_click = None;
+        new.children[0].on_mouse_enter = Some("r-0:mouse_enter".to_string());
+        let ops = diff_trees(old, &mut new);
+        assert!(matches!(&ops[..], [PatchOp::Update { id, .. }] if id == "r-0"));
+    }
+
+    #[test]
+    fn test_splice_by_user_id_inherits_path() {
+        let mut root = ElementDef::default();
+        let mut target = text("old");
+        target.user_id = Some("counter".to_string());
+        root.children.push(text("a"));
+        root.children.push(target);
+        let mut tree = committed(root);
+
+        let mut replacement = text("new");
+        replacement.user_id = Some("counter".to_string());
+        let (replaced, spliced) = splice_by_user_id(&mut tree, "counter", &replacement).unwrap();
+        assert_eq!(spliced.id, "r-1");
+        assert_eq!(replaced.text_content.as_deref(), Some("old"));
+        assert_eq!(tree.children[1].text_content.as_deref(), Some("new"));
+        assert!(splice_by_user_id(&mut tree, "missing", &replacement).is_none());
+    }
+
+    #[test]
+    fn test_content_hash_ignores_ids_but_not_handlers() {
+        let mut a = text("go");
+        a.on_click = Some("el_1_0".to_string());
+        let mut b = text("go");
+        b.on_click = Some("el_2_0".to_string());
+        assert_ne!(a.id, b.id);
+        assert_eq!(a.content_hash(), b.content_hash());
+        assert_eq!(a.on_click.as_deref(), Some("el_1_0"));
+
+        assert_ne!(text("go").content_hash(), a.content_hash());
+        let mut other = text("stop");
+        other.on_click = Some("el_1_0".to_string());
+        assert_ne!(other.content_hash(), a.content_hash());
+
+        let mut parent = ElementDef::default();
+        parent.children = vec![a.clone()];
+        let mut changed = ElementDef::default();
+        changed.children = vec![other];
+        assert_ne!(parent.content_hash(), changed.content_hash());
+    }
+
+    #[test]
+    fn test_subtrees_with_equal_hashes_are_skipped() {
+        let old = list(&["a", "b", "c"]);
+        let mut new = list(&["a", "b", "changed"]);
+        let mut tampered = list(&["a", "b", "c"]);
+        tampered.children[2].text_content = Some("changed".to_string());
+
+        let ops = diff_trees(old.clone(), &mut new);
+        assert!(matches!(&ops[..], [PatchOp::Update { id, .. }] if id == "r-2"));
+        // A node whose hash matches isn't looked at, whatever it holds
+        let mut old = old;
+        old.children[2].content_hash();
+        tampered.children[2].cached_hash = old.children[2].cached_hash;
+        tampered.cached_hash = Some(old.content_hash());
+        assert!(diff_trees(old, &mut tampered).is_empty());
+    }
+
+    #[test]
+    fn test_splice_rehashes_ancestors() {
+        let mut root = ElementDef::default();
+        let mut target = text("old");
+        target.user_id = Some("counter".to_string());
+        root.children = vec![text("a"), target];
+        let mut tree = committed(root.clone());
+        tree.content_hash();
+
+        let mut replacement = text("new");
+        replacement.user_id = Some("counter".to_string());
+        splice_by_user_id(&mut tree, "counter", &replacement).unwrap();
+        assert_eq!(tree.cached_hash, None);
+
+        root.children[1] = replacement;
+        let mut fresh = committed(root);
+        assert_eq!(tree.content_hash(), fresh.content_hash());
+        assert!(diff_trees(tree, &mut fresh).is_empty());
+    }
+
+    #[test]
+    fn test_state_rules_change_only_touched_nodes() {
+        use crate::renderer::collect_state_rules;
+
+        fn rules(tree: &ElementDef) -> StateRules {
+            let mut rules = StateRules::new();
+            collect_state_rules(tree, &mut rules);
+            rules
+        }
+
+        let mut root = ElementDef::default();
+        for (i, color) in ["#111", "#222", "#333"].iter().enumerate() {
+            let mut row = text(&i.to_string());
+            row.hover_bg = Some((*color).into());
+            root.children.push(row);
+        }
+        let old = committed(root.clone());
+        let mut page = StateRules::new();
+        assert_eq!(diff_state_rules(&mut page, "r", rules(&old)).len(), 3);
+
+        root.children[1].hover_bg = Some("#fff".into());
+        root.children[2].hover_bg = None;
+        let new = committed(root);
+        let changes = diff_state_rules(&mut page, "r", rules(&new));
+        assert_eq!(changes.len(), 2);
+        assert_eq!(changes["r-1"], Some(vec!["#r-1:hover { background-color: #fff !important }".to_string()]));
+        assert_eq!(changes["r-2"], None);
+        assert_eq!(page, rules(&new));
+
+        // A subtree only affects the rules below it
+        assert!(diff_state_rules(&mut page, "r-2", StateRules::new()).is_empty());
+        assert_eq!(diff_state_rules(&mut page, "r-1", StateRules::new()).len(), 1);
+        assert!(page.contains_key("r-0"));
+    }
+
+    /// Compare patch size and time against re-serializing the whole tree.
+    ///
+    /// Run with `cargo test --release bench_single_cell_change -- --ignored --nocapture`.
+    #[test]
+    #[ignore]
+    fn bench_single_cell_change() {
+        use std::time::Instant;
+
+        fn table(changed: &str) -> ElementDef {
+            let mut root = ElementDef::default();
+            for r in 0..1000 {
+                let mut row = ElementDef::default();
+                row.flex_direction = Some("row".into());
+                row.padding = Some(4.0);
+                for c in 0..4 {
+                    let mut cell = if r == 500 && c == 2 {
+                        text(changed)
+                    } else {
+                        text(&format!("cell {}-{}", r, c))
+                    };
+                    cell.text_color = Some("#1e293b".into());
+                    cell.font_size = Some(13.0);
+                    row.children.push(cell);
+                }
+                root.children.push(row);
+            }
+            root
+        }
+
+        let mut old = committed(table("before"));
+        let mut new = table("after");
+        // Builders hash each subtree as they build it, and the committed tree kept the
+        // hashes from when it was diffed itself
+        let start = Instant::now();
+        old.content_hash();
+        new.content_hash();
+        let hash_time = start.elapsed() / 2;
+
+        let start = Instant::now();
+        let full = render_to_json(&new, &mut StyleSheet::default());
+        let full_time = start.elapsed();
+
+        let start = Instant::now();
+        let mut new_tree = committed(new.clone());
+        let ops = diff_trees(old, &mut new_tree);
+        let patch = serde_json::to_string(&ops).unwrap();
+        let diff_time = start.elapsed();
+
+        eprintln!(
+            "full tree: {} bytes in {:?}; diff: {} ops, {} bytes in {:?}; hashing a tree: {:?}",
+            full.len(),
+            full_time,
+            ops.len(),
+            patch.len(),
+            diff_time,
+            hash_time
+        );
+        assert_eq!(ops.len(), 1);
+        assert!(patch.len() * 100 < full.len());
+    }
+}
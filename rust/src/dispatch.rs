@@ -0,0 +1,246 @@
+use parking_lot::Mutex;
+use pyo3::prelude::*;
+use pyo3::types::{PyCFunction, PyDict, PyTuple};
+use std::collections::hash_map::DefaultHasher;
+use std::hash::{Hash, Hasher};
+use std::sync::Arc;
+use std::sync::atomic::{AtomicUsize, Ordering};
+use std::sync::mpsc;
+use std::thread;
+
+/// Looks up a Python callback by ID. Called on a worker thread with the GIL held.
+pub type CallbackResolver = Arc<dyn Fn(Python<'_>, &str) -> Option<Py<PyAny>> + Send + Sync>;
+
+/// Arguments passed from a DOM event to its callback
+#[derive(Debug, Clone, PartialEq)]
+pub enum CallbackArgs {
+    Empty,           // click and mouse enter/leave/down/up
+    Value(String),   // input and change
+    Point(f64, f64), // mouse move, relative to the element
+}
+
+/// Work done on the event loop's behalf with the GIL held
+pub type Task = Box<dyn FnOnce(Python<'_>) + Send>;
+
+enum Job {
+    Callback { callback_id: String, args: CallbackArgs },
+    Task(Task),
+}
+
+struct Worker {
+    sender: mpsc::Sender<Job>,
+    depth: Arc<AtomicUsize>,
+}
+
+/// Runs Python callbacks on a fixed pool of worker threads.
+///
+/// Every event for a given callback ID goes to the same worker, so a callback always
+/// sees its events in the order they happened. With a single worker all callbacks run
+/// in order. Workers exit once the dispatcher is dropped and their queues are drained.
+///
+/// Callbacks defined with `async def` return a coroutine, which is handed to the asyncio
+/// loop set with `set_event_loop()`, or run to completion on the worker if there is none.
+pub struct Dispatcher {
+    workers: Vec<Worker>,
+    event_loop: Arc<Mutex<Option<Py<PyAny>>>>,
+    queued: Arc<AtomicUsize>,
+    peak: Arc<AtomicUsize>,
+    dispatched: AtomicUsize,
+}
+
+impl Dispatcher {
+    pub fn new(workers: usize, resolve: CallbackResolver) -> Self {
+        let event_loop = Arc::new(Mutex::new(None));
+        let queued = Arc::new(AtomicUsize::new(0));
+        let peak = Arc::new(AtomicUsize::new(0));
+        let workers = (0..workers.max(1))
+            .map(|i| spawn_worker(i, resolve.clone(), event_loop.clone(), queued.clone()))
+            .collect();
+
+        Dispatcher {
+            workers,
+            event_loop,
+            queued,
+            peak,
+            dispatched: AtomicUsize::new(0),
+        }
+    }
+
+    /// Queue a callback invocation. Never blocks the calling (event loop) thread.
+    pub fn dispatch(&self, callback_id: String, args: CallbackArgs) {
+        let worker = worker_for(&callback_id, self.workers.len());
+        self.send(worker, Job::Callback { callback_id, args });
+    }
+
+    /// Queue a task on the worker that runs the callback `key`, so it runs in order with
+    /// that callback's events. Never blocks the calling (event loop) thread.
+    pub fn run(&self, key: &str, task: Task) {
+        self.send(worker_for(key, self.workers.len()), Job::Task(task));
+    }
+
+    fn send(&self, worker: usize, job: Job) {
+        let worker = &self.workers[worker];
+        worker.depth.fetch_add(1, Ordering::Relaxed);
+        let queued = self.queued.fetch_add(1, Ordering::Relaxed) + 1;
+        self.peak.fetch_max(queued, Ordering::Relaxed);
+        self.dispatched.fetch_add(1, Ordering::Relaxed);
+
+        if worker.sender.send(job).is_err() {
+            // The worker died (it only does so on panic); drop the event
+            worker.depth.fetch_sub(1, Ordering::Relaxed);
+            self.queued.fetch_sub(1, Ordering::Relaxed);
+        }
+    }
+
+    /// Set (or clear) the asyncio loop that coroutine callbacks are scheduled on.
+    pub fn set_event_loop(&self, event_loop: Option<Py<PyAny>>) {
+        *self.event_loop.lock() = event_loop;
+    }
+
+    pub fn stats(&self) -> DispatchStats {
+        DispatchStats {
+            workers: self.workers.len(),
+            queued: self.queued.load(Ordering::Relaxed),
+            peak_queued: self.peak.load(Ordering::Relaxed),
+            dispatched: self.dispatched.load(Ordering::Relaxed),
+            worker_queued: self
+                .workers
+                .iter()
+                .map(|w| w.depth.load(Ordering::Relaxed))
+                .collect(),
+        }
+    }
+}
+
+/// Snapshot of the dispatcher's queues
+#[derive(Debug, Clone)]
+pub struct DispatchStats {
+    pub workers: usize,
+    pub queued: usize,      // Events waiting or running right now
+    pub peak_queued: usize, // Highest value `queued` has reached
+    pub dispatched: usize,  // Events dispatched since the window was created
+    pub worker_queued: Vec<usize>,
+}
+
+/// Pick the worker that owns a callback ID.
+fn worker_for(callback_id: &str, workers: usize) -> usize {
+    let mut hasher = DefaultHasher::new();
+    callback_id.hash(&mut hasher);
+    (hasher.finish() % workers as u64) as usize
+}
+
+fn spawn_worker(
+    index: usize,
+    resolve: CallbackResolver,
+    event_loop: Arc<Mutex<Option<Py<PyAny>>>>,
+    queued: Arc<AtomicUsize>,
+) -> Worker {
+    let (sender, receiver) = mpsc::channel::<Job>();
+    let depth = Arc::new(AtomicUsize::new(0));
+    let worker_depth = depth.clone();
+
+    thread::Builder::new()
+        .name(format!("wry-callback-{}", index))
+        .spawn(move || {
+            for job in receiver {
+                #[allow(deprecated)]
+                Python::with_gil(|py| match job {
+                    Job::Callback { callback_id, args } => {
+                        if let Some(callback) = resolve(py, &callback_id) {
+                            let result = match args {
+                                CallbackArgs::Empty => callback.call0(py),
+                                CallbackArgs::Value(value) => callback.call1(py, (value,)),
+                                CallbackArgs::Point(x, y) => callback.call1(py, (x, y)),
+                            }
+                            .and_then(|value| schedule_coroutine(py, value, &event_loop));
+                            if let Err(e) = result {
+                                eprintln!("Callback error: {:?}", e);
+                            }
+                        }
+                    }
+                    Job::Task(task) => task(py),
+                });
+                worker_depth.fetch_sub(1, Ordering::Relaxed);
+                queued.fetch_sub(1, Ordering::Relaxed);
+            }
+        })
+        .expect("failed to spawn callback worker");
+
+    Worker { sender, depth }
+}
+
+/// If a callback returned a coroutine, run it on the registered asyncio loop.
+///
+/// Without a loop the coroutine runs to completion on the calling worker.
+fn schedule_coroutine(
+    py: Python<'_>,
+    value: Py<PyAny>,
+    event_loop: &Mutex<Option<Py<PyAny>>>,
+) -> PyResult<()> {
+    let asyncio = py.import("asyncio")?;
+    let value = value.into_bound(py);
+    if !asyncio
+        .call_method1("iscoroutine", (&value,))?
+        .is_truthy()?
+    {
+        return Ok(());
+    }
+
+    let event_loop = event_loop.lock().as_ref().map(|l| l.clone_ref(py));
+    match event_loop {
+        Some(event_loop) => {
+            let future = asyncio.call_method1("run_coroutine_threadsafe", (&value, event_loop))?;
+            // Nobody waits on the future, so report failures when it finishes
+            let report = PyCFunction::new_closure(
+                py,
+                None,
+                None,
+                |args: &Bound<'_, PyTuple>, _kwargs: Option<&Bound<'_, PyDict>>| -> PyResult<()> {
+                    let future = args.get_item(0)?;
+                    if future.call_method0("cancelled")?.is_truthy()? {
+                        return Ok(());
+                    }
+                    let exception = future.call_method0("exception")?;
+                    if !exception.is_none() {
+                        eprintln!("Callback error: {:?}", PyErr::from_value(exception));
+                    }
+                    Ok(())
+                },
+            )?;
+            future.call_method1("add_done_callback", (report,))?;
+        }
+        None => {
+            asyncio.call_method1("run", (&value,))?;
+        }
+    }
+    Ok(())
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_worker_for_is_stable() {
+        for id in ["a", "b", "some-uuid-1234"] {
+            assert_eq!(worker_for(id, 4), worker_for(id, 4));
+        }
+    }
+
+    #[test]
+    fn test_worker_for_in_range() {
+        for i in 0..100 {
+            assert!(worker_for(&format!("cb-{}", i), 3) < 3);
+        }
+        assert_eq!(worker_for("anything", 1), 0);
+    }
+
+    #[test]
+    fn test_worker_for_spreads_ids() {
+        let mut used = [false; 4];
+        for i in 0..100 {
+            used[worker_for(&format!("cb-{}", i), 4)] = true;
+        }
+        assert!(used.iter().all(|u| *u));
+    }
+}
@@ -1,17 +1,19 @@
+use crate::intern::Interned;
 use pyo3::prelude::*;
 use serde::{Deserialize, Serialize};
-use std::collections::HashMap;
-use std::sync::Mutex;
+use std::collections::{HashMap, HashSet};
+use std::hash::{DefaultHasher, Hash, Hasher};
+use std::sync::{Arc, Mutex, OnceLock};
 
 /// Option for select dropdowns.
-#[derive(Clone, Debug, Serialize, Deserialize)]
+#[derive(Clone, Debug, PartialEq, Serialize, Deserialize)]
 pub struct SelectOption {
     pub value: String,
     pub label: String,
 }
 
 /// Serializable element definition sent to frontend.
-#[derive(Clone, Debug, Serialize, Deserialize)]
+#[derive(Clone, Debug, PartialEq, Serialize, Deserialize)]
 pub struct ElementDef {
     pub id: String,              // Internal UUID
     pub element_type: String,
@@ -20,7 +22,11 @@ pub struct ElementDef {
     #[serde(skip_serializing_if = "Option::is_none")]
     pub user_id: Option<String>, // User-specified ID for targeting
     #[serde(default, skip_serializing_if = "Vec::is_empty")]
-    pub class_names: Vec<String>, // User-specified CSS classes
+    pub class_names: Vec<Interned>, // User-specified CSS classes
+    #[serde(default, skip_serializing_if = "Option::is_none")]
+    pub style_class: Option<Interned>, // Shared class standing in for the style properties on the wire
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub key: Option<String>, // Identity among siblings for keyed reconciliation
 
     // Layout
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -36,36 +42,36 @@ pub struct ElementDef {
     #[serde(skip_serializing_if = "Option::is_none")]
     pub max_height: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub flex_direction: Option<String>,
+    pub flex_direction: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub align_items: Option<String>,
+    pub align_items: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub justify_content: Option<String>,
+    pub justify_content: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub gap: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub flex_wrap: Option<String>,
+    pub flex_wrap: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub flex_grow: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub flex_shrink: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub flex_basis: Option<String>,
+    pub flex_basis: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub align_self: Option<String>,
+    pub align_self: Option<Interned>,
 
     // Grid layout
     pub display_grid: bool,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub grid_template_columns: Option<String>,
+    pub grid_template_columns: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub grid_template_rows: Option<String>,
+    pub grid_template_rows: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub grid_column: Option<String>,
+    pub grid_column: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub grid_row: Option<String>,
+    pub grid_row: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub place_items: Option<String>,
+    pub place_items: Option<Interned>,
 
     #[serde(skip_serializing_if = "Option::is_none")]
     pub padding: Option<f32>,
@@ -91,9 +97,9 @@ pub struct ElementDef {
 
     // Styling
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub background_color: Option<String>,
+    pub background_color: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub text_color: Option<String>,
+    pub text_color: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub border_radius: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -115,23 +121,23 @@ pub struct ElementDef {
     #[serde(skip_serializing_if = "Option::is_none")]
     pub border_width_left: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub border_color: Option<String>,
+    pub border_color: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub border_color_top: Option<String>,
+    pub border_color_top: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub border_color_right: Option<String>,
+    pub border_color_right: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub border_color_bottom: Option<String>,
+    pub border_color_bottom: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub border_color_left: Option<String>,
+    pub border_color_left: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub overflow: Option<String>,
+    pub overflow: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub text_align: Option<String>,
+    pub text_align: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub word_wrap: Option<String>,
+    pub word_wrap: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub position: Option<String>,
+    pub position: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub top: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -147,11 +153,11 @@ pub struct ElementDef {
     #[serde(skip_serializing_if = "Option::is_none")]
     pub font_size: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub font_weight: Option<String>,
+    pub font_weight: Option<Interned>,
 
     // Transitions
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub transition: Option<String>,
+    pub transition: Option<Interned>,
 
     // Opacity
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -159,18 +165,18 @@ pub struct ElementDef {
 
     // Cursor
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub cursor: Option<String>,
+    pub cursor: Option<Interned>,
     // Raw CSS styles
     #[serde(skip_serializing_if = "Option::is_none")]
     pub style: Option<String>,
 
     // Hover styles
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub hover_bg: Option<String>,
+    pub hover_bg: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub hover_text_color: Option<String>,
+    pub hover_text_color: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub hover_border_color: Option<String>,
+    pub hover_border_color: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
     pub hover_opacity: Option<f32>,
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -178,17 +184,29 @@ pub struct ElementDef {
 
     // Focus styles
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub focus_bg: Option<String>,
+    pub focus_bg: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub focus_text_color: Option<String>,
+    pub focus_text_color: Option<Interned>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub focus_border_color: Option<String>,
+    pub focus_border_color: Option<Interned>,
 
     // Image properties
     #[serde(skip_serializing_if = "Option::is_none")]
     pub alt: Option<String>,
     #[serde(skip_serializing_if = "Option::is_none")]
-    pub object_fit: Option<String>,
+    pub object_fit: Option<Interned>,
+
+    // Virtual lists
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub row_count: Option<usize>, // rows in the list's data source
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub row_height: Option<f32>, // height of every row, on the list and on each rendered row
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub overscan: Option<usize>, // rows rendered beyond each edge of the viewport
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub render_row: Option<String>, // callback ID of the row renderer
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub row_index: Option<usize>, // index of a rendered row in its list's data source
 
     // Interactivity
     #[serde(skip_serializing_if = "Option::is_none")]
@@ -196,6 +214,10 @@ pub struct ElementDef {
     #[serde(skip_serializing_if = "Option::is_none")]
     pub on_input: Option<String>, // callback ID for input changes
     #[serde(skip_serializing_if = "Option::is_none")]
+    pub input_debounce_ms: Option<u32>, // deliver on_input once typing pauses this long
+    #[serde(skip_serializing_if = "Option::is_none")]
+    pub input_throttle_ms: Option<u32>, // deliver on_input at most once per interval
+    #[serde(skip_serializing_if = "Option::is_none")]
     pub on_mouse_enter: Option<String>, // callback ID for mouse enter
     #[serde(skip_serializing_if = "Option::is_none")]
     pub on_mouse_leave: Option<String>, // callback ID for mouse leave
@@ -204,6 +226,8 @@ pub struct ElementDef {
     #[serde(skip_serializing_if = "Option::is_none")]
     pub on_mouse_up: Option<String>, // callback ID for mouse up
     #[serde(skip_serializing_if = "Option::is_none")]
+    pub on_mouse_move: Option<String>, // callback ID for mouse move, once per frame
+    #[serde(skip_serializing_if = "Option::is_none")]
     pub value: Option<String>, // input value
     #[serde(skip_serializing_if = "Option::is_none")]
     pub placeholder: Option<String>,
@@ -223,6 +247,11 @@ pub struct ElementDef {
     // Children
     #[serde(default)]
     pub children: Vec<ElementDef>,
+
+    // Hash of the subtree's content once content_hash() has computed it. Anything that
+    // changes a hashed node must reset this on the node and on all of its ancestors.
+    #[serde(skip)]
+    pub cached_hash: Option<u64>,
 }
 
 impl Default for ElementDef {
@@ -232,6 +261,8 @@ impl Default for ElementDef {
             element_type: "div".to_string(),
             user_id: None,
             class_names: Vec::new(),
+            style_class: None,
+            key: None,
             width: None,
             height: None,
             min_width: None,
@@ -306,12 +337,20 @@ impl Default for ElementDef {
             focus_border_color: None,
             alt: None,
             object_fit: None,
+            row_count: None,
+            row_height: None,
+            overscan: None,
+            render_row: None,
+            row_index: None,
             on_click: None,
             on_input: None,
+            input_debounce_ms: None,
+            input_throttle_ms: None,
             on_mouse_enter: None,
             on_mouse_leave: None,
             on_mouse_down: None,
             on_mouse_up: None,
+            on_mouse_move: None,
             value: None,
             placeholder: None,
             on_change: None,
@@ -321,10 +360,97 @@ impl Default for ElementDef {
             selected: None,
             label: None,
             children: Vec::new(),
+            cached_hash: None,
+        }
+    }
+}
+
+impl ElementDef {
+    /// Callback IDs registered on this node (not its children).
+    pub fn callback_ids(&self) -> impl Iterator<Item = &String> {
+        [
+            &self.on_click,
+            &self.on_input,
+            &self.on_mouse_enter,
+            &self.on_mouse_leave,
+            &self.on_mouse_down,
+            &self.on_mouse_up,
+            &self.on_mouse_move,
+            &self.on_change,
+            &self.render_row,
+        ]
+        .into_iter()
+        .flatten()
+    }
+
+    /// Callback fields on this node paired with their event names, for rewriting IDs.
+    pub fn callback_slots_mut(&mut self) -> [(&'static str, &mut Option<String>); 9] {
+        [
+            ("click", &mut self.on_click),
+            ("input", &mut self.on_input),
+            ("mouse_enter", &mut self.on_mouse_enter),
+            ("mouse_leave", &mut self.on_mouse_leave),
+            ("mouse_down", &mut self.on_mouse_down),
+            ("mouse_up", &mut self.on_mouse_up),
+            ("mouse_move", &mut self.on_mouse_move),
+            ("change", &mut self.on_change),
+            ("render_row", &mut self.render_row),
+        ]
+    }
+
+    /// Hash of everything in this subtree that ends up on the page, computed once and cached.
+    ///
+    /// Left out is what comes from the subtree's place in the tree: the path IDs, and the
+    /// callback IDs, of which only the events that have one count. Two subtrees with the
+    /// same hash therefore render, bind and diff the same when put in the same place.
+    pub fn content_hash(&mut self) -> u64 {
+        if let Some(hash) = self.cached_hash {
+            return hash;
+        }
+        let mut hasher = DefaultHasher::new();
+        for child in self.children.iter_mut() {
+            child.content_hash().hash(&mut hasher);
+        }
+
+        // Serialize the node's own properties straight into the hasher
+        let children = std::mem::take(&mut self.children);
+        let id = std::mem::take(&mut self.id);
+        let callbacks = self.callback_slots_mut().map(|(_, slot)| slot.as_mut().map(std::mem::take));
+        let _ = serde_json::to_writer(HashWriter(&mut hasher), &*self);
+        for ((_, slot), callback) in self.callback_slots_mut().into_iter().zip(callbacks) {
+            *slot = callback;
+        }
+        self.id = id;
+        self.children = children;
+
+        let hash = hasher.finish();
+        self.cached_hash = Some(hash);
+        hash
+    }
+
+    /// Add the callback IDs used anywhere in this subtree to `ids`.
+    pub fn collect_callback_ids<'a>(&'a self, ids: &mut HashSet<&'a str>) {
+        ids.extend(self.callback_ids().map(String::as_str));
+        for child in &self.children {
+            child.collect_callback_ids(ids);
         }
     }
 }
 
+/// Feeds whatever is written to it into a hasher
+struct HashWriter<'a, H: Hasher>(&'a mut H);
+
+impl<H: Hasher> std::io::Write for HashWriter<'_, H> {
+    fn write(&mut self, buf: &[u8]) -> std::io::Result<usize> {
+        self.0.write(buf);
+        Ok(buf.len())
+    }
+
+    fn flush(&mut self) -> std::io::Result<()> {
+        Ok(())
+    }
+}
+
 fn uuid() -> String {
     use std::time::{SystemTime, UNIX_EPOCH};
     static COUNTER: std::sync::atomic::AtomicU64 = std::sync::atomic::AtomicU64::new(0);
@@ -337,7 +463,10 @@ fn uuid() -> String {
 }
 
 // Global callback store
-static CALLBACK_STORE: Mutex<Option<HashMap<String, Py<PyAny>>>> = Mutex::new(None);
+//
+// Elements carry their own callables; the store only tracks the ones registered by
+// builders whose elements no window has mounted yet.
+static CALLBACK_STORE: Mutex<Option<HashMap<String, Arc<Py<PyAny>>>>> = Mutex::new(None);
 
 fn init_callback_store() {
     let mut store = CALLBACK_STORE.lock().unwrap();
@@ -346,7 +475,7 @@ fn init_callback_store() {
     }
 }
 
-fn store_callback(id: String, callback: Py<PyAny>) {
+fn store_callback(id: String, callback: Arc<Py<PyAny>>) {
     init_callback_store();
     let mut store = CALLBACK_STORE.lock().unwrap();
     if let Some(ref mut map) = *store {
@@ -354,18 +483,35 @@ fn store_callback(id: String, callback: Py<PyAny>) {
     }
 }
 
-pub fn take_callbacks() -> HashMap<String, Py<PyAny>> {
+pub fn take_callbacks() -> HashMap<String, Arc<Py<PyAny>>> {
     init_callback_store();
     let mut store = CALLBACK_STORE.lock().unwrap();
     store.take().unwrap_or_default()
 }
 
-/// Python Element class
-#[pyclass]
+/// Number of callbacks registered by builders but not yet taken by a window.
+pub fn pending_callback_count() -> usize {
+    CALLBACK_STORE
+        .lock()
+        .unwrap()
+        .as_ref()
+        .map_or(0, HashMap::len)
+}
+
+/// Python callables of an element and its children, by the IDs the builders minted
+type Callbacks = Vec<(String, Arc<Py<PyAny>>)>;
+
+/// Python Element class.
+///
+/// Built elements never change, so copies of one share its definition and it is
+/// serialized to JSON at most once. An element keeps its callables, so a window can bind
+/// them again whenever the element is mounted, however often it left the tree before.
+#[pyclass(frozen)]
 #[derive(Clone)]
 pub struct Element {
-    pub def: ElementDef,
-    callback_ids: Vec<String>,
+    pub def: Arc<ElementDef>,
+    callbacks: Arc<Callbacks>,
+    json: Arc<OnceLock<String>>,
 }
 
 #[pymethods]
@@ -377,46 +523,151 @@ impl Element {
     #[new]
     #[pyo3(text_signature = "(element_type=None)")]
     fn new(element_type: Option<String>) -> Self {
-        let mut def = ElementDef::default();
-        if let Some(t) = element_type {
-            def.element_type = t;
-        }
-        Element {
-            def,
-            callback_ids: Vec::new(),
-        }
+        ElementDraft::new(element_type).freeze()
     }
 
     /// Convert the element to a JSON string.
     ///
+    /// The JSON is computed the first time and reused after that.
+    ///
     /// Returns:
     ///     JSON representation of the element and all its properties.
     #[pyo3(text_signature = "($self)")]
-    fn to_json(&self) -> PyResult<String> {
-        serde_json::to_string(&self.def)
-            .map_err(|e| pyo3::exceptions::PyValueError::new_err(e.to_string()))
+    fn to_json(&self) -> PyResult<&str> {
+        if self.json.get().is_none() {
+            let json = serde_json::to_string(&*self.def)
+                .map_err(|e| pyo3::exceptions::PyValueError::new_err(e.to_string()))?;
+            let _ = self.json.set(json);
+        }
+        Ok(self.json.get().map_or("", String::as_str))
     }
 
     fn __repr__(&self) -> String {
-        format!(
-            "Element(type='{}', children={})",
-            self.def.element_type,
-            self.def.children.len()
-        )
+        element_repr(&self.def)
     }
 }
 
 impl Element {
-    pub fn collect_callbacks(&self) -> HashMap<String, Py<PyAny>> {
-        take_callbacks()
+    /// The callables of this element and its children, for a window mounting it.
+    ///
+    /// Empties the builders' store as well: whatever else is in it belongs to elements
+    /// that carry their callables themselves, or that were dropped unmounted.
+    pub fn collect_callbacks(&self, py: Python<'_>) -> HashMap<String, Py<PyAny>> {
+        drop(take_callbacks());
+        self.own_callbacks(py)
+    }
+
+    /// Like collect_callbacks(), but only this element's callbacks leave the store, so the
+    /// count of pending ones stays right for elements being built elsewhere.
+    pub fn take_own_callbacks(&self, py: Python<'_>) -> HashMap<String, Py<PyAny>> {
+        if let Some(map) = CALLBACK_STORE.lock().unwrap().as_mut() {
+            for (id, _) in self.callbacks.iter() {
+                map.remove(id);
+            }
+        }
+        self.own_callbacks(py)
+    }
+
+    fn own_callbacks(&self, py: Python<'_>) -> HashMap<String, Py<PyAny>> {
+        self.callbacks
+            .iter()
+            .map(|(id, callback)| (id.clone(), callback.clone_ref(py)))
+            .collect()
+    }
+
+    /// The Element behind a Python object that is an Element or an ElementBuilder.
+    pub fn from_object(item: &Bound<'_, PyAny>) -> Option<Element> {
+        if let Ok(element) = item.extract::<PyRef<'_, Element>>() {
+            Some(element.clone())
+        } else if let Ok(builder) = item.extract::<PyRef<'_, ElementBuilder>>() {
+            Some(builder.element.freeze())
+        } else {
+            None
+        }
+    }
+}
+
+/// The element an ElementBuilder is still changing
+#[derive(Clone)]
+struct ElementDraft {
+    def: ElementDef,
+    callbacks: Callbacks,
+}
+
+impl ElementDraft {
+    fn new(element_type: Option<String>) -> Self {
+        let mut def = ElementDef::default();
+        if let Some(t) = element_type {
+            def.element_type = t;
+        }
+        ElementDraft {
+            def,
+            callbacks: Vec::new(),
+        }
+    }
+
+    /// A finished Element with a copy of this draft, hashed so windows can skip it in diffs
+    fn freeze(&self) -> Element {
+        let mut def = self.def.clone();
+        // Children were hashed when they were built, so this only hashes the node itself
+        def.content_hash();
+        Element {
+            def: Arc::new(def),
+            callbacks: Arc::new(self.callbacks.clone()),
+            json: Arc::default(),
+        }
+    }
+
+    /// Keep a callable under the ID its slot was given, and list it as pending until a
+    /// window mounts the element
+    fn add_callback(&mut self, id: String, callback: Py<PyAny>) {
+        let callback = Arc::new(callback);
+        store_callback(id.clone(), callback.clone());
+        self.callbacks.push((id, callback));
+    }
+
+    fn push_child(&mut self, def: &ElementDef, callbacks: &[(String, Arc<Py<PyAny>>)]) {
+        self.def.children.push(def.clone());
+        self.callbacks.extend_from_slice(callbacks);
+    }
+
+    /// Append each Element or ElementBuilder produced by a Python iterable.
+    fn extend_children(&mut self, children: &Bound<'_, PyAny>) -> PyResult<()> {
+        // Generators have no length; they just grow the vector as they go
+        if let Ok(len) = children.len() {
+            self.def.children.reserve(len);
+        }
+        for (index, item) in children.try_iter()?.enumerate() {
+            let item = item?;
+            if let Ok(child) = item.extract::<PyRef<'_, Element>>() {
+                self.push_child(&child.def, &child.callbacks);
+            } else if let Ok(builder) = item.extract::<PyRef<'_, ElementBuilder>>() {
+                self.push_child(&builder.element.def, &builder.element.callbacks);
+            } else {
+                return Err(pyo3::exceptions::PyTypeError::new_err(format!(
+                    "children[{}] must be an Element or ElementBuilder, not {}",
+                    index,
+                    item.get_type().name()?
+                )));
+            }
+        }
+        Ok(())
     }
 }
 
+fn element_repr(def: &ElementDef) -> String {
+    format!(
+        "Element(type='{}', children={})",
+        def.element_type,
+        def.children.len()
+    )
+}
+
 /// Builder pattern for creating elements
 #[pyclass]
 #[derive(Clone)]
 pub struct ElementBuilder {
-    element: Element,
+    element: ElementDraft,
 }
 
 #[pymethods]
@@ -426,7 +677,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "()")]
     fn div() -> Self {
         ElementBuilder {
-            element: Element::new(Some("div".to_string())),
+            element: ElementDraft::new(Some("div".to_string())),
         }
     }
 
@@ -437,7 +688,7 @@ impl ElementBuilder {
     #[staticmethod]
     #[pyo3(text_signature = "(content)")]
     fn text(content: String) -> Self {
-        let mut element = Element::new(Some("text".to_string()));
+        let mut element = ElementDraft::new(Some("text".to_string()));
         element.def.text_content = Some(content);
         ElementBuilder { element }
     }
@@ -449,7 +700,7 @@ impl ElementBuilder {
     #[staticmethod]
     #[pyo3(text_signature = "(label)")]
     fn button(label: String) -> Self {
-        let mut element = Element::new(Some("button".to_string()));
+        let mut element = ElementDraft::new(Some("button".to_string()));
         element.def.text_content = Some(label);
         ElementBuilder { element }
     }
@@ -461,7 +712,7 @@ impl ElementBuilder {
     #[staticmethod]
     #[pyo3(text_signature = "(src)")]
     fn image(src: String) -> Self {
-        let mut element = Element::new(Some("image".to_string()));
+        let mut element = ElementDraft::new(Some("image".to_string()));
         element.def.text_content = Some(src);
         ElementBuilder { element }
     }
@@ -471,7 +722,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "()")]
     fn input() -> Self {
         ElementBuilder {
-            element: Element::new(Some("input".to_string())),
+            element: ElementDraft::new(Some("input".to_string())),
         }
     }
 
@@ -479,7 +730,7 @@ impl ElementBuilder {
     #[staticmethod]
     #[pyo3(text_signature = "(label=None)")]
     fn checkbox(label: Option<String>) -> Self {
-        let mut element = Element::new(Some("checkbox".to_string()));
+        let mut element = ElementDraft::new(Some("checkbox".to_string()));
         element.def.label = label;
         ElementBuilder { element }
     }
@@ -488,7 +739,7 @@ impl ElementBuilder {
     #[staticmethod]
     #[pyo3(text_signature = "(label=None)")]
     fn radio(label: Option<String>) -> Self {
-        let mut element = Element::new(Some("radio".to_string()));
+        let mut element = ElementDraft::new(Some("radio".to_string()));
         element.def.label = label;
         ElementBuilder { element }
     }
@@ -498,10 +749,38 @@ impl ElementBuilder {
     #[pyo3(text_signature = "()")]
     fn select() -> Self {
         ElementBuilder {
-            element: Element::new(Some("select".to_string())),
+            element: ElementDraft::new(Some("select".to_string())),
         }
     }
 
+    /// Create a virtual list, which only renders the rows in and around its viewport.
+    ///
+    /// The window calls ``render_row(index)`` for each row as it scrolls into view and
+    /// recycles the DOM nodes of rows that scroll out, so a list of any length costs about
+    /// as much as the rows that fit on screen. Give the list a height (or size_full()) so
+    /// it has a viewport to scroll.
+    ///
+    /// Args:
+    ///     row_count: Number of rows in the data source.
+    ///     row_height: Height of every row in pixels.
+    ///     render_row: Called with a row index; returns the Element or ElementBuilder for it.
+    #[staticmethod]
+    #[pyo3(text_signature = "(row_count, row_height, render_row)")]
+    fn virtual_list(row_count: usize, row_height: f32, render_row: Py<PyAny>) -> PyResult<Self> {
+        if !(row_height > 0.0) {
+            return Err(pyo3::exceptions::PyValueError::new_err(
+                "row_height must be greater than 0",
+            ));
+        }
+        let mut element = ElementDraft::new(Some("virtual_list".to_string()));
+        let callback_id = uuid();
+        element.def.row_count = Some(row_count);
+        element.def.row_height = Some(row_height);
+        element.def.render_row = Some(callback_id.clone());
+        element.add_callback(callback_id, render_row);
+        Ok(ElementBuilder { element })
+    }
+
     // User-facing identification
 
     /// Set a user-facing ID for targeting this element. Used for partial updates.
@@ -511,17 +790,27 @@ impl ElementBuilder {
         slf
     }
 
+    /// Set a key identifying this element among its siblings.
+    ///
+    /// When every child of a container has a key, re-renders match children by key
+    /// instead of position, so inserts, removals and reorders only touch the moved nodes.
+    #[pyo3(text_signature = "($self, key)")]
+    fn key(mut slf: PyRefMut<'_, Self>, key: String) -> PyRefMut<'_, Self> {
+        slf.element.def.key = Some(key);
+        slf
+    }
+
     /// Add a CSS class name to this element.
     #[pyo3(text_signature = "($self, name)")]
     fn class_name(mut slf: PyRefMut<'_, Self>, name: String) -> PyRefMut<'_, Self> {
-        slf.element.def.class_names.push(name);
+        slf.element.def.class_names.push(name.into());
         slf
     }
 
     /// Add multiple CSS class names to this element.
     #[pyo3(text_signature = "($self, names)")]
     fn classes(mut slf: PyRefMut<'_, Self>, names: Vec<String>) -> PyRefMut<'_, Self> {
-        slf.element.def.class_names.extend(names);
+        slf.element.def.class_names.extend(names.into_iter().map(Interned::from));
         slf
     }
 
@@ -603,35 +892,35 @@ impl ElementBuilder {
     /// Use vertical (column) flex layout. Returns self for chaining.
     #[pyo3(text_signature = "($self)")]
     fn v_flex(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.flex_direction = Some("column".to_string());
+        slf.element.def.flex_direction = Some("column".into());
         slf
     }
 
     /// Use horizontal (row) flex layout. Returns self for chaining.
     #[pyo3(text_signature = "($self)")]
     fn h_flex(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.flex_direction = Some("row".to_string());
+        slf.element.def.flex_direction = Some("row".into());
         slf
     }
 
     /// Center child items perpendicular to flex direction. Returns self for chaining.
     #[pyo3(text_signature = "($self)")]
     fn items_center(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.align_items = Some("center".to_string());
+        slf.element.def.align_items = Some("center".into());
         slf
     }
 
     /// Center content along the flex direction. Returns self for chaining.
     #[pyo3(text_signature = "($self)")]
     fn justify_center(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.justify_content = Some("center".to_string());
+        slf.element.def.justify_content = Some("center".into());
         slf
     }
 
     /// Distribute children evenly with space between them. Returns self for chaining.
     #[pyo3(text_signature = "($self)")]
     fn justify_between(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.justify_content = Some("space-between".to_string());
+        slf.element.def.justify_content = Some("space-between".into());
         slf
     }
 
@@ -645,14 +934,14 @@ impl ElementBuilder {
     /// Allow flex items to wrap to multiple lines
     #[pyo3(text_signature = "($self)")]
     fn flex_wrap(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.flex_wrap = Some("wrap".to_string());
+        slf.element.def.flex_wrap = Some("wrap".into());
         slf
     }
 
     /// Prevent flex items from wrapping
     #[pyo3(text_signature = "($self)")]
     fn flex_nowrap(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.flex_wrap = Some("nowrap".to_string());
+        slf.element.def.flex_wrap = Some("nowrap".into());
         slf
     }
 
@@ -673,7 +962,7 @@ impl ElementBuilder {
     /// Set flex basis (initial size before growing/shrinking)
     #[pyo3(text_signature = "($self, value)")]
     fn flex_basis(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.flex_basis = Some(value);
+        slf.element.def.flex_basis = Some(value.into());
         slf
     }
 
@@ -682,14 +971,14 @@ impl ElementBuilder {
     fn flex_1(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
         slf.element.def.flex_grow = Some(1.0);
         slf.element.def.flex_shrink = Some(1.0);
-        slf.element.def.flex_basis = Some("0%".to_string());
+        slf.element.def.flex_basis = Some("0%".into());
         slf
     }
 
     /// Align this item differently from siblings
     #[pyo3(text_signature = "($self, value)")]
     fn align_self(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.align_self = Some(value);
+        slf.element.def.align_self = Some(value.into());
         slf
     }
 
@@ -706,7 +995,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, value)")]
     fn grid_cols(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
         slf.element.def.display_grid = true;
-        slf.element.def.grid_template_columns = Some(value);
+        slf.element.def.grid_template_columns = Some(value.into());
         slf
     }
 
@@ -714,35 +1003,35 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, value)")]
     fn grid_rows(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
         slf.element.def.display_grid = true;
-        slf.element.def.grid_template_rows = Some(value);
+        slf.element.def.grid_template_rows = Some(value.into());
         slf
     }
 
     /// Set which column(s) this item spans (e.g., "1 / 3" or "span 2")
     #[pyo3(text_signature = "($self, value)")]
     fn col(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.grid_column = Some(value);
+        slf.element.def.grid_column = Some(value.into());
         slf
     }
 
     /// Set which row(s) this item spans (e.g., "1 / 3" or "span 2")
     #[pyo3(text_signature = "($self, value)")]
     fn row(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.grid_row = Some(value);
+        slf.element.def.grid_row = Some(value.into());
         slf
     }
 
     /// Set place-items (align and justify items)
     #[pyo3(text_signature = "($self, value)")]
     fn place_items(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.place_items = Some(value);
+        slf.element.def.place_items = Some(value.into());
         slf
     }
 
     /// Center grid items both horizontally and vertically
     #[pyo3(text_signature = "($self)")]
     fn place_center(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.place_items = Some("center".to_string());
+        slf.element.def.place_items = Some("center".into());
         slf
     }
 
@@ -885,14 +1174,14 @@ impl ElementBuilder {
     /// Set background color. Accepts hex strings like "#ff0000" or CSS colors like "rgb(255,0,0)". Returns self for chaining.
     #[pyo3(text_signature = "($self, color)")]
     fn bg(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.background_color = Some(color);
+        slf.element.def.background_color = Some(color.into());
         slf
     }
 
     /// Set text color. Returns self for chaining.
     #[pyo3(text_signature = "($self, color)")]
     fn text_color(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.text_color = Some(color);
+        slf.element.def.text_color = Some(color.into());
         slf
     }
 
@@ -935,7 +1224,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, width, color)")]
     fn border(mut slf: PyRefMut<'_, Self>, width: f32, color: String) -> PyRefMut<'_, Self> {
         slf.element.def.border_width = Some(width);
-        slf.element.def.border_color = Some(color);
+        slf.element.def.border_color = Some(color.into());
         slf
     }
 
@@ -943,7 +1232,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, width, color)")]
     fn border_top(mut slf: PyRefMut<'_, Self>, width: f32, color: String) -> PyRefMut<'_, Self> {
         slf.element.def.border_width_top = Some(width);
-        slf.element.def.border_color_top = Some(color);
+        slf.element.def.border_color_top = Some(color.into());
         slf
     }
 
@@ -951,7 +1240,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, width, color)")]
     fn border_right(mut slf: PyRefMut<'_, Self>, width: f32, color: String) -> PyRefMut<'_, Self> {
         slf.element.def.border_width_right = Some(width);
-        slf.element.def.border_color_right = Some(color);
+        slf.element.def.border_color_right = Some(color.into());
         slf
     }
 
@@ -959,7 +1248,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, width, color)")]
     fn border_bottom(mut slf: PyRefMut<'_, Self>, width: f32, color: String) -> PyRefMut<'_, Self> {
         slf.element.def.border_width_bottom = Some(width);
-        slf.element.def.border_color_bottom = Some(color);
+        slf.element.def.border_color_bottom = Some(color.into());
         slf
     }
 
@@ -967,7 +1256,7 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, width, color)")]
     fn border_left(mut slf: PyRefMut<'_, Self>, width: f32, color: String) -> PyRefMut<'_, Self> {
         slf.element.def.border_width_left = Some(width);
-        slf.element.def.border_color_left = Some(color);
+        slf.element.def.border_color_left = Some(color.into());
         slf
     }
 
@@ -975,73 +1264,76 @@ impl ElementBuilder {
     #[pyo3(text_signature = "($self, color)")]
     fn b(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
         slf.element.def.border_width = Some(1.0);
-        slf.element.def.border_color = Some(color);
+        slf.element.def.border_color = Some(color.into());
         slf
     }
 
     /// Set overflow to hidden
     #[pyo3(text_signature = "($self)")]
     fn overflow_hidden(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.overflow = Some("hidden".to_string());
+        slf.element.def.overflow = Some("hidden".into());
         slf
     }
 
     /// Set overflow
     #[pyo3(text_signature = "($self, value)")]
     fn overflow(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.overflow = Some(value);
+        slf.element.def.overflow = Some(value.into());
         slf
     }
 
     /// Set text alignment
     #[pyo3(text_signature = "($self, align)")]
     fn text_align(mut slf: PyRefMut<'_, Self>, align: String) -> PyRefMut<'_, Self> {
-        slf.element.def.text_align = Some(align);
+        slf.element.def.text_align = Some(align.into());
         slf
     }
 
     /// Center text
     #[pyo3(text_signature = "($self)")]
     fn text_center(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.text_align = Some("center".to_string());
+        slf.element.def.text_align = Some("center".into());
         slf
     }
 
     /// Set word wrap
     #[pyo3(text_signature = "($self, value)")]
     fn word_wrap(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.word_wrap = Some(value);
+        slf.element.def.word_wrap = Some(value.into());
         slf
     }
 
     /// Set CSS transition (raw value for advanced use)
     #[pyo3(text_signature = "($self, value)")]
     fn transition(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.transition = Some(value);
+        slf.element.def.transition = Some(value.into());
         slf
     }
 
     /// Transition all properties with given duration in seconds
     #[pyo3(text_signature = "($self, seconds)")]
     fn transition_all(mut slf: PyRefMut<'_, Self>, seconds: f32) -> PyRefMut<'_, Self> {
-        slf.element.def.transition = Some(format!("all {}s ease", seconds));
+        slf.element.def.transition = Some(format!("all {}s ease", seconds).into());
         slf
     }
 
     /// Transition colors (background, text, border) with given duration
     #[pyo3(text_signature = "($self, seconds)")]
     fn transition_colors(mut slf: PyRefMut<'_, Self>, seconds: f32) -> PyRefMut<'_, Self> {
-        slf.element.def.transition = Some(format!(
-            "background-color {}s ease, color {}s ease, border-color {}s ease",
-            seconds, seconds, seconds
-        ));
+        slf.element.def.transition = Some(
+            format!(
+                "background-color {}s ease, color {}s ease, border-color {}s ease",
+                seconds, seconds, seconds
+            )
+            .into(),
+        );
         slf
     }
 
     /// Transition transform (scale, etc.) with given duration
     #[pyo3(text_signature = "($self, seconds)")]
     fn transition_transform(mut slf: PyRefMut<'_, Self>, seconds: f32) -> PyRefMut<'_, Self> {
-        slf.element.def.transition = Some(format!("transform {}s ease", seconds));
+        slf.element.def.transition = Some(format!("transform {}s ease", seconds).into());
         slf
     }
 
@@ -1055,7 +1347,7 @@ impl ElementBuilder {
     /// Set cursor style (e.g., "pointer", "grab", "not-allowed")
     #[pyo3(text_signature = "($self, value)")]
     fn cursor(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.cursor = Some(value);
+        slf.element.def.cursor = Some(value.into());
         slf
     }
 
@@ -1082,21 +1374,21 @@ impl ElementBuilder {
     /// Set background color on hover
     #[pyo3(text_signature = "($self, color)")]
     fn hover_bg(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.hover_bg = Some(color);
+        slf.element.def.hover_bg = Some(color.into());
         slf
     }
 
     /// Set text color on hover
     #[pyo3(text_signature = "($self, color)")]
     fn hover_text_color(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.hover_text_color = Some(color);
+        slf.element.def.hover_text_color = Some(color.into());
         slf
     }
 
     /// Set border color on hover
     #[pyo3(text_signature = "($self, color)")]
     fn hover_border_color(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.hover_border_color = Some(color);
+        slf.element.def.hover_border_color = Some(color.into());
         slf
     }
 
@@ -1119,21 +1411,21 @@ impl ElementBuilder {
     /// Set background color on focus
     #[pyo3(text_signature = "($self, color)")]
     fn focus_bg(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.focus_bg = Some(color);
+        slf.element.def.focus_bg = Some(color.into());
         slf
     }
 
     /// Set text color on focus
     #[pyo3(text_signature = "($self, color)")]
     fn focus_text_color(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.focus_text_color = Some(color);
+        slf.element.def.focus_text_color = Some(color.into());
         slf
     }
 
     /// Set border color on focus
     #[pyo3(text_signature = "($self, color)")]
     fn focus_border_color(mut slf: PyRefMut<'_, Self>, color: String) -> PyRefMut<'_, Self> {
-        slf.element.def.focus_border_color = Some(color);
+        slf.element.def.focus_border_color = Some(color.into());
         slf
     }
 
@@ -1149,28 +1441,28 @@ impl ElementBuilder {
     /// Set object-fit for images (cover, contain, fill, none, scale-down)
     #[pyo3(text_signature = "($self, value)")]
     fn object_fit(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.object_fit = Some(value);
+        slf.element.def.object_fit = Some(value.into());
         slf
     }
 
     /// Set position
     #[pyo3(text_signature = "($self, value)")]
     fn position(mut slf: PyRefMut<'_, Self>, value: String) -> PyRefMut<'_, Self> {
-        slf.element.def.position = Some(value);
+        slf.element.def.position = Some(value.into());
         slf
     }
 
     /// Set position to absolute
     #[pyo3(text_signature = "($self)")]
     fn absolute(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.position = Some("absolute".to_string());
+        slf.element.def.position = Some("absolute".into());
         slf
     }
 
     /// Set position to relative
     #[pyo3(text_signature = "($self)")]
     fn relative(mut slf: PyRefMut<'_, Self>) -> PyRefMut<'_, Self> {
-        slf.element.def.position = Some("relative".to_string());
+        slf.element.def.position = Some("relative".into());
         slf
     }
 
@@ -1212,24 +1504,45 @@ impl ElementBuilder {
     /// Set font weight ("normal", "bold", "100"-"900")
     #[pyo3(text_signature = "($self, weight)")]
     fn text_weight(mut slf: PyRefMut<'_, Self>, weight: String) -> PyRefMut<'_, Self> {
-        slf.element.def.font_weight = Some(weight);
+        slf.element.def.font_weight = Some(weight.into());
         slf
     }
 
     /// Add a child element
     #[pyo3(text_signature = "($self, child)")]
-    fn child(&mut self, child: &Element) -> Self {
-        self.element.def.children.push(child.def.clone());
-        self.element.callback_ids.extend(child.callback_ids.clone());
-        self.clone()
+    fn child<'py>(mut slf: PyRefMut<'py, Self>, child: &Element) -> PyRefMut<'py, Self> {
+        slf.element.push_child(&child.def, &child.callbacks);
+        slf
     }
 
     /// Add a child from a builder
     #[pyo3(text_signature = "($self, child)")]
-    fn child_builder(&mut self, child: &ElementBuilder) -> Self {
-        self.element.def.children.push(child.element.def.clone());
-        self.element.callback_ids.extend(child.element.callback_ids.clone());
-        self.clone()
+    fn child_builder<'py>(mut slf: PyRefMut<'py, Self>, child: &ElementBuilder) -> PyRefMut<'py, Self> {
+        slf.element.push_child(&child.element.def, &child.element.callbacks);
+        slf
+    }
+
+    /// Add every element or builder from an iterable as a child, in order.
+    ///
+    /// Consumes the iterable in a single call, so building a large list costs one
+    /// crossing instead of one per child.
+    #[pyo3(text_signature = "($self, children)")]
+    fn children<'py>(
+        mut slf: PyRefMut<'py, Self>,
+        children: &Bound<'py, PyAny>,
+    ) -> PyResult<PyRefMut<'py, Self>> {
+        slf.element.extend_children(children)?;
+        Ok(slf)
+    }
+
+    /// Same as children(); reads naturally with a generator expression.
+    #[pyo3(text_signature = "($self, children)")]
+    fn extend<'py>(
+        mut slf: PyRefMut<'py, Self>,
+        children: &Bound<'py, PyAny>,
+    ) -> PyResult<PyRefMut<'py, Self>> {
+        slf.element.extend_children(children)?;
+        Ok(slf)
     }
 
     /// Add text child (convenience)
@@ -1244,12 +1557,11 @@ impl ElementBuilder {
 
     /// Register a callback function to run when the element is clicked. Returns self for chaining.
     #[pyo3(text_signature = "($self, callback)")]
-    fn on_click(&mut self, callback: Py<PyAny>) -> Self {
+    fn on_click(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
         let callback_id = uuid();
-        self.element.def.on_click = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_click = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
     }
 
     /// Set input value
@@ -1296,72 +1608,104 @@ impl ElementBuilder {
 
     /// Register a callback for checkbox/radio/select change events. Callback receives the new value.
     #[pyo3(text_signature = "($self, callback)")]
-    fn on_change(&mut self, callback: Py<PyAny>) -> Self {
+    fn on_change(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
         let callback_id = uuid();
-        self.element.def.on_change = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_change = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
     }
 
     /// Register a callback function to run when the input value changes. Callback receives the new value as a string argument. Returns self for chaining.
-    #[pyo3(text_signature = "($self, callback)")]
-    fn on_input(&mut self, callback: Py<PyAny>) -> Self {
+    ///
+    /// Rate limiting happens in the webview, so skipped keystrokes never reach Python and the
+    /// callback always gets the latest value. Pass at most one of:
+    ///     debounce_ms: Only deliver once the value has stopped changing for this long.
+    ///     throttle_ms: Deliver at most once per interval, plus a final call with the last value.
+    #[pyo3(signature = (callback, debounce_ms = None, throttle_ms = None), text_signature = "($self, callback, debounce_ms=None, throttle_ms=None)")]
+    fn on_input(
+        mut slf: PyRefMut<'_, Self>,
+        callback: Py<PyAny>,
+        debounce_ms: Option<u32>,
+        throttle_ms: Option<u32>,
+    ) -> PyResult<PyRefMut<'_, Self>> {
+        if debounce_ms.is_some() && throttle_ms.is_some() {
+            return Err(pyo3::exceptions::PyValueError::new_err(
+                "on_input accepts debounce_ms or throttle_ms, not both",
+            ));
+        }
         let callback_id = uuid();
-        self.element.def.on_input = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_input = Some(callback_id.clone());
+        slf.element.def.input_debounce_ms = debounce_ms;
+        slf.element.def.input_throttle_ms = throttle_ms;
+        slf.element.add_callback(callback_id, callback);
+        Ok(slf)
     }
 
     /// Register a callback for when the mouse enters the element.
     #[pyo3(text_signature = "($self, callback)")]
-    fn on_mouse_enter(&mut self, callback: Py<PyAny>) -> Self {
+    fn on_mouse_enter(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
         let callback_id = uuid();
-        self.element.def.on_mouse_enter = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_mouse_enter = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
     }
 
     /// Register a callback for when the mouse leaves the element.
     #[pyo3(text_signature = "($self, callback)")]
-    fn on_mouse_leave(&mut self, callback: Py<PyAny>) -> Self {
+    fn on_mouse_leave(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
         let callback_id = uuid();
-        self.element.def.on_mouse_leave = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_mouse_leave = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
     }
 
     /// Register a callback for when the mouse button is pressed on the element.
     #[pyo3(text_signature = "($self, callback)")]
-    fn on_mouse_down(&mut self, callback: Py<PyAny>) -> Self {
+    fn on_mouse_down(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
         let callback_id = uuid();
-        self.element.def.on_mouse_down = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_mouse_down = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
     }
 
     /// Register a callback for when the mouse button is released on the element.
     #[pyo3(text_signature = "($self, callback)")]
-    fn on_mouse_up(&mut self, callback: Py<PyAny>) -> Self {
+    fn on_mouse_up(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
+        let callback_id = uuid();
+        slf.element.def.on_mouse_up = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
+    }
+
+    /// Register a callback for mouse movement over the element. Callback receives the pointer
+    /// position (x, y) in pixels relative to the element's top-left corner.
+    ///
+    /// Moves are coalesced in the webview and delivered at most once per animation frame,
+    /// always with the latest position.
+    #[pyo3(text_signature = "($self, callback)")]
+    fn on_mouse_move(mut slf: PyRefMut<'_, Self>, callback: Py<PyAny>) -> PyRefMut<'_, Self> {
         let callback_id = uuid();
-        self.element.def.on_mouse_up = Some(callback_id.clone());
-        self.element.callback_ids.push(callback_id.clone());
-        store_callback(callback_id, callback);
-        self.clone()
+        slf.element.def.on_mouse_move = Some(callback_id.clone());
+        slf.element.add_callback(callback_id, callback);
+        slf
+    }
+
+    /// Set how many rows a virtual list renders beyond each edge of its viewport.
+    /// Defaults to 10.
+    #[pyo3(text_signature = "($self, rows)")]
+    fn overscan(mut slf: PyRefMut<'_, Self>, rows: usize) -> PyRefMut<'_, Self> {
+        slf.element.def.overscan = Some(rows);
+        slf
     }
 
     /// Build and return the final Element. Call this after configuring all properties.
     #[pyo3(text_signature = "($self)")]
     fn build(&self) -> Element {
-        self.element.clone()
+        self.element.freeze()
     }
 
     fn __repr__(&self) -> String {
-        format!("ElementBuilder({})", self.element.__repr__())
+        format!("ElementBuilder({})", element_repr(&self.element.def))
     }
 }
 
@@ -1421,3 +1765,10 @@ pub fn radio(label: Option<String>) -> ElementBuilder {
 pub fn select() -> ElementBuilder {
     ElementBuilder::select()
 }
+
+/// Create a virtual list. Shorthand for ElementBuilder.virtual_list(row_count, row_height, render_row).
+#[pyfunction]
+#[pyo3(text_signature = "(row_count, row_height, render_row)")]
+pub fn virtual_list(row_count: usize, row_height: f32, render_row: Py<PyAny>) -> PyResult<ElementBuilder> {
+    ElementBuilder::virtual_list(row_count, row_height, render_row)
+}
@@ -0,0 +1,171 @@
+use parking_lot::Mutex;
+use serde::{Deserialize, Deserializer, Serialize, Serializer};
+use std::borrow::Borrow;
+use std::collections::HashSet;
+use std::fmt;
+use std::hash::{Hash, Hasher};
+use std::ops::Deref;
+use std::sync::{Arc, LazyLock};
+
+/// Number of entries before the table first drops strings nothing refers to anymore
+const MIN_PRUNE_LEN: usize = 1024;
+
+struct Table {
+    strings: HashSet<Interned>,
+    prune_at: usize,
+}
+
+static TABLE: LazyLock<Mutex<Table>> = LazyLock::new(|| {
+    Mutex::new(Table {
+        strings: HashSet::new(),
+        prune_at: MIN_PRUNE_LEN,
+    })
+});
+
+/// A shared, deduplicated string for values that repeat across many nodes
+/// (colors, CSS keywords, class names).
+///
+/// Equal strings share one allocation, so a node holds a single pointer per
+/// property and cloning a node only bumps reference counts. Serializes as a plain
+/// string, so JSON output is the same as for `String`.
+#[derive(Clone)]
+pub struct Interned(Arc<String>);
+
+impl Interned {
+    pub fn new(s: &str) -> Self {
+        let mut table = TABLE.lock();
+        if let Some(existing) = table.strings.get(s) {
+            return existing.clone();
+        }
+
+        // Colors computed per frame would otherwise pile up forever
+        if table.strings.len() >= table.prune_at {
+            table.strings.retain(|s| Arc::strong_count(&s.0) > 1);
+            table.prune_at = (table.strings.len() * 2).max(MIN_PRUNE_LEN);
+        }
+
+        let interned = Interned(Arc::new(s.to_string()));
+        table.strings.insert(interned.clone());
+        interned
+    }
+
+    pub fn as_str(&self) -> &str {
+        self.0.as_str()
+    }
+}
+
+/// Number of distinct strings currently interned.
+#[cfg(test)]
+fn interned_count() -> usize {
+    TABLE.lock().strings.len()
+}
+
+impl Deref for Interned {
+    type Target = str;
+
+    fn deref(&self) -> &str {
+        self.as_str()
+    }
+}
+
+impl Borrow<str> for Interned {
+    fn borrow(&self) -> &str {
+        self.as_str()
+    }
+}
+
+impl PartialEq for Interned {
+    fn eq(&self, other: &Self) -> bool {
+        Arc::ptr_eq(&self.0, &other.0) || self.0 == other.0
+    }
+}
+
+impl Eq for Interned {}
+
+impl Hash for Interned {
+    // Must match str's hash for HashSet::get(&str)
+    fn hash<H: Hasher>(&self, state: &mut H) {
+        self.as_str().hash(state)
+    }
+}
+
+impl PartialEq<str> for Interned {
+    fn eq(&self, other: &str) -> bool {
+        self.as_str() == other
+    }
+}
+
+impl PartialEq<&str> for Interned {
+    fn eq(&self, other: &&str) -> bool {
+        self.as_str() == *other
+    }
+}
+
+impl From<&str> for Interned {
+    fn from(s: &str) -> Self {
+        Interned::new(s)
+    }
+}
+
+impl From<String> for Interned {
+    fn from(s: String) -> Self {
+        Interned::new(&s)
+    }
+}
+
+impl fmt::Display for Interned {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        f.write_str(self)
+    }
+}
+
+impl fmt::Debug for Interned {
+    fn fmt(&self, f: &mut fmt::Formatter<'_>) -> fmt::Result {
+        fmt::Debug::fmt(self.as_str(), f)
+    }
+}
+
+impl Serialize for Interned {
+    fn serialize<S: Serializer>(&self, serializer: S) -> Result<S::Ok, S::Error> {
+        serializer.serialize_str(self)
+    }
+}
+
+impl<'de> Deserialize<'de> for Interned {
+    fn deserialize<D: Deserializer<'de>>(deserializer: D) -> Result<Self, D::Error> {
+        let s = String::deserialize(deserializer)?;
+        Ok(Interned::new(&s))
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_equal_strings_share_storage() {
+        let a = Interned::new("#1e293b");
+        let b = Interned::from("#1e293b".to_string());
+        assert!(Arc::ptr_eq(&a.0, &b.0));
+        assert_eq!(a, b);
+        assert_eq!(a, "#1e293b");
+    }
+
+    #[test]
+    fn test_serializes_as_plain_string() {
+        let value = Interned::new("center");
+        assert_eq!(serde_json::to_string(&value).unwrap(), "\"center\"");
+        let back: Interned = serde_json::from_str("\"center\"").unwrap();
+        assert!(Arc::ptr_eq(&value.0, &back.0));
+    }
+
+    #[test]
+    fn test_unused_strings_are_pruned() {
+        let kept = Interned::new("intern-test-kept");
+        for i in 0..MIN_PRUNE_LEN * 3 {
+            Interned::new(&format!("intern-test-{}", i));
+        }
+        assert!(interned_count() < MIN_PRUNE_LEN * 3);
+        assert!(Arc::ptr_eq(&kept.0, &Interned::new("intern-test-kept").0));
+    }
+}
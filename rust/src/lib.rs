@@ -2,6 +2,12 @@ mod elements;
 mod renderer;
 mod window;
 mod assets;
+mod diff;
+mod dispatch;
+mod intern;
+mod protocol;
+mod stylesheet;
+mod virtual_list;
 
 use pyo3::prelude::*;
 
@@ -10,6 +16,7 @@ use pyo3::prelude::*;
 fn wry_py(m: &Bound<'_, PyModule>) -> PyResult<()> {
     // Classes
     m.add_class::<window::UiWindow>()?;
+    m.add_class::<window::UpdateBatch>()?;
     m.add_class::<elements::Element>()?;
     m.add_class::<elements::ElementBuilder>()?;
     m.add_class::<assets::AssetCatalog>()?;
@@ -23,6 +30,7 @@ fn wry_py(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(elements::checkbox, m)?)?;
     m.add_function(wrap_pyfunction!(elements::radio, m)?)?;
     m.add_function(wrap_pyfunction!(elements::select, m)?)?;
+    m.add_function(wrap_pyfunction!(elements::virtual_list, m)?)?;
 
     Ok(())
 }
@@ -0,0 +1,261 @@
+use crate::assets;
+use parking_lot::Mutex;
+use percent_encoding::percent_decode_str;
+use std::borrow::Cow;
+use std::collections::HashMap;
+use std::panic::{self, AssertUnwindSafe};
+use std::sync::{Arc, OnceLock, mpsc};
+use std::thread;
+use std::time::{Duration, Instant};
+use wry::http::{Request, Response, StatusCode, header};
+
+/// Custom protocol the webview fetches large payloads and catalog assets from
+pub const SCHEME: &str = "wry";
+
+/// Update JSON larger than this is fetched by the page instead of being inlined in a
+/// script, since WebKit parses JSON far faster than it compiles script source.
+pub const INLINE_PAYLOAD_LIMIT: usize = 32 * 1024;
+
+/// URL of a path on the custom protocol, as the webview sees it.
+///
+/// WebView2 serves custom protocols from http://<scheme>.localhost instead of <scheme>://.
+pub fn url(path: &str) -> String {
+    if cfg!(any(target_os = "windows", target_os = "android")) {
+        format!("http://{}.localhost/{}", SCHEME, path)
+    } else {
+        format!("{}://localhost/{}", SCHEME, path)
+    }
+}
+
+/// How long a payload waits for the page to fetch it. The page fetches a payload as
+/// soon as the script naming it runs, so one left this long was orphaned by a reload,
+/// a navigation or a failed fetch.
+const PAYLOAD_TTL: Duration = Duration::from_secs(60);
+
+/// Update payloads waiting for the page to fetch them. Each is served once, and is
+/// dropped once it's older than `PAYLOAD_TTL`, except the chunks of a streamed page.
+#[derive(Default)]
+pub struct Payloads {
+    next_id: u64,
+    waiting: HashMap<u64, (Option<Instant>, String)>, // Stashed at, unless kept until fetched
+}
+
+impl Payloads {
+    pub fn stash(&mut self, json: String) -> u64 {
+        self.stash_at(json, Instant::now())
+    }
+
+    /// Stash a chunk of the initial page. The page fetches those one at a time as it
+    /// renders them, however long that takes, so they are kept until fetched or until
+    /// the next page clears them.
+    pub fn stash_chunk(&mut self, json: String) -> u64 {
+        self.insert(None, json)
+    }
+
+    fn stash_at(&mut self, json: String, now: Instant) -> u64 {
+        self.waiting.retain(|_, (stashed, _)| {
+            stashed.is_none_or(|stashed| now.duration_since(stashed) < PAYLOAD_TTL)
+        });
+        self.insert(Some(now), json)
+    }
+
+    fn insert(&mut self, stashed: Option<Instant>, json: String) -> u64 {
+        self.next_id += 1;
+        self.waiting.insert(self.next_id, (stashed, json));
+        self.next_id
+    }
+
+    pub fn take(&mut self, id: u64) -> Option<String> {
+        self.waiting.remove(&id).map(|(_, json)| json)
+    }
+
+    /// Drop every waiting payload, for when the page that would fetch them is gone.
+    pub fn clear(&mut self) {
+        self.waiting.clear();
+    }
+
+    pub fn len(&self) -> usize {
+        self.waiting.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.waiting.is_empty()
+    }
+}
+
+/// Threads that load catalog assets for the custom protocol
+const ASSET_LOADERS: usize = 2;
+
+type Load = Box<dyn FnOnce() + Send>;
+
+/// Answer a request made by the page on the custom protocol, passing the response to
+/// `respond`.
+///
+/// Payloads are already in memory and are answered right away. An asset may need a file
+/// mapped or an archive entry inflated and its bytes copied, so it is loaded on a loader
+/// thread and the thread painting the page carries on meanwhile.
+pub fn handle_async(
+    request: Request<Vec<u8>>,
+    payloads: &Arc<Mutex<Payloads>>,
+    respond: impl FnOnce(Response<Cow<'static, [u8]>>) + Send + 'static,
+) {
+    if request.uri().path().starts_with("/asset/") {
+        let payloads = payloads.clone();
+        load_in_background(Box::new(move || respond(handle(&request, &payloads))));
+    } else {
+        respond(handle(&request, payloads));
+    }
+}
+
+/// Run `load` on one of the asset loader threads, which start on first use.
+fn load_in_background(load: Load) {
+    static LOADS: OnceLock<mpsc::Sender<Load>> = OnceLock::new();
+    let loads = LOADS.get_or_init(|| {
+        let (sender, receiver) = mpsc::channel::<Load>();
+        let receiver = Arc::new(Mutex::new(receiver));
+        for index in 0..ASSET_LOADERS {
+            let receiver = receiver.clone();
+            thread::Builder::new()
+                .name(format!("wry-assets-{}", index))
+                .spawn(move || {
+                    loop {
+                        let Ok(load) = receiver.lock().recv() else {
+                            return;
+                        };
+                        // Keep the thread for the next request even if this one panics
+                        let _ = panic::catch_unwind(AssertUnwindSafe(load));
+                    }
+                })
+                .expect("failed to spawn asset loader");
+        }
+        sender
+    });
+    if let Err(mpsc::SendError(load)) = loads.send(load) {
+        load();
+    }
+}
+
+/// Answer a request made by the page on the custom protocol.
+pub fn handle(
+    request: &Request<Vec<u8>>,
+    payloads: &Arc<Mutex<Payloads>>,
+) -> Response<Cow<'static, [u8]>> {
+    let path = request.uri().path().trim_start_matches('/');
+    if let Some(id) = path.strip_prefix("payload/") {
+        if let Some(json) = id.parse().ok().and_then(|id| payloads.lock().take(id)) {
+            return respond(
+                StatusCode::OK,
+                "application/json",
+                NO_STORE,
+                json.into_bytes(),
+            );
+        }
+    } else if let Some(name) = path.strip_prefix("asset/") {
+        let name = percent_decode_str(name).decode_utf8_lossy();
+        if let Some((bytes, mime)) = assets::get_asset(&name) {
+            return respond(StatusCode::OK, mime, IMMUTABLE, bytes.to_vec());
+        }
+    }
+    respond(
+        StatusCode::NOT_FOUND,
+        "text/plain",
+        NO_STORE,
+        b"not found".to_vec(),
+    )
+}
+
+const NO_STORE: &str = "no-store";
+// Asset URLs carry the asset's version, so a URL's content never changes
+const IMMUTABLE: &str = "public, max-age=31536000, immutable";
+
+fn respond(
+    status: StatusCode,
+    mime: &str,
+    cache: &str,
+    body: Vec<u8>,
+) -> Response<Cow<'static, [u8]>> {
+    Response::builder()
+        .status(status)
+        .header(header::CONTENT_TYPE, mime)
+        .header(header::CACHE_CONTROL, cache)
+        // The page is loaded from an HTML string, so it has a different origin
+        .header(header::ACCESS_CONTROL_ALLOW_ORIGIN, "*")
+        .body(Cow::Owned(body))
+        .unwrap()
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn get(path: &str, payloads: &Arc<Mutex<Payloads>>) -> Response<Cow<'static, [u8]>> {
+        let request = Request::builder().uri(url(path)).body(Vec::new()).unwrap();
+        handle(&request, payloads)
+    }
+
+    #[test]
+    fn test_payload_is_served_once() {
+        let payloads = Arc::new(Mutex::new(Payloads::default()));
+        let id = payloads.lock().stash("{\"ops\":[]}".to_string());
+
+        let response = get(&format!("payload/{}", id), &payloads);
+        assert_eq!(response.status(), StatusCode::OK);
+        assert_eq!(response.headers()[header::CONTENT_TYPE], "application/json");
+        assert_eq!(response.body().as_ref(), b"{\"ops\":[]}");
+
+        assert_eq!(
+            get(&format!("payload/{}", id), &payloads).status(),
+            StatusCode::NOT_FOUND
+        );
+    }
+
+    #[test]
+    fn test_unfetched_payloads_expire() {
+        let mut payloads = Payloads::default();
+        let start = Instant::now();
+        let orphan = payloads.stash_at("{}".to_string(), start);
+        let chunk = payloads.stash_chunk("{}".to_string());
+        let recent = payloads.stash_at("{}".to_string(), start + PAYLOAD_TTL / 2);
+
+        let fresh = payloads.stash_at("{}".to_string(), start + PAYLOAD_TTL);
+        assert_eq!(payloads.len(), 3);
+        assert_eq!(payloads.take(orphan), None);
+        assert!(payloads.take(recent).is_some());
+        assert!(payloads.take(fresh).is_some());
+        // Chunks of a streamed page wait however long the page takes to get to them
+        assert!(payloads.take(chunk).is_some());
+    }
+
+    #[test]
+    fn test_assets_are_answered_off_the_calling_thread() {
+        let payloads = Arc::new(Mutex::new(Payloads::default()));
+        let id = payloads.lock().stash("{}".to_string());
+        let (sender, receiver) = mpsc::channel();
+        for path in [format!("payload/{}", id), "asset/missing.png".to_string()] {
+            let request = Request::builder().uri(url(&path)).body(Vec::new()).unwrap();
+            let sender = sender.clone();
+            handle_async(request, &payloads, move |response| {
+                sender
+                    .send((thread::current().id(), response.status()))
+                    .unwrap();
+            });
+        }
+
+        let caller = thread::current().id();
+        let (payload_thread, status) = receiver.recv().unwrap();
+        assert_eq!((payload_thread, status), (caller, StatusCode::OK));
+        let (asset_thread, status) = receiver.recv().unwrap();
+        assert_ne!(asset_thread, caller);
+        assert_eq!(status, StatusCode::NOT_FOUND);
+    }
+
+    #[test]
+    fn test_unknown_paths_are_not_found() {
+        let payloads = Arc::new(Mutex::new(Payloads::default()));
+        assert_eq!(
+            get("payload/abc", &payloads).status(),
+            StatusCode::NOT_FOUND
+        );
+        assert_eq!(get("elsewhere", &payloads).status(), StatusCode::NOT_FOUND);
+    }
+}
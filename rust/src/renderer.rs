@@ -1,54 +1,225 @@
+use crate::diff::{PatchMessage, PatchOp};
 use crate::elements::ElementDef;
+use crate::stylesheet::{contain_declarations, StyleSheet};
 use percent_encoding::utf8_percent_encode;
 use percent_encoding::NON_ALPHANUMERIC;
+use std::borrow::Cow;
+use std::collections::{HashMap, HashSet, VecDeque};
+use std::fmt::{self, Write};
 use std::path::Path;
 use crate::assets;
 
-/// Assign stable path-based IDs to elements for consistent DOM matching
-fn assign_stable_ids(element: &mut ElementDef, path: &str) {
-    element.id = path.to_string();
+/// Assign stable path-based IDs to elements for consistent DOM matching.
+///
+/// When every child of a node has a key and no key repeats, the children take their
+/// IDs from their keys rather than their indices, so a node keeps its ID (and DOM
+/// element) when its siblings are inserted, removed or reordered. Otherwise all of them
+/// use their index, which is how the diff matches them.
+pub fn assign_stable_ids(element: &mut ElementDef, path: &str) {
+    // Room for a few levels of child paths before the buffer has to grow
+    let mut buf = String::with_capacity(path.len() + 64);
+    buf.push_str(path);
+    assign_ids(element, &mut buf);
+}
+
+/// Give a subtree its IDs, building each child's path on the end of `path`.
+/// A node whose ID is already long enough reuses its allocation.
+fn assign_ids(element: &mut ElementDef, path: &mut String) {
+    element.id.clone_from(path);
+    let len = path.len();
+    let keyed = has_unique_keys(&element.children);
     for (i, child) in element.children.iter_mut().enumerate() {
-        assign_stable_ids(child, &format!("{}-{}", path, i));
+        match child.key {
+            Some(ref key) if keyed => {
+                path.push_str("-k");
+                encode_key(path, key);
+            }
+            _ => {
+                let _ = write!(path, "-{}", i);
+            }
+        }
+        assign_ids(child, path);
+        path.truncate(len);
     }
 }
 
-/// Render an ElementDef tree to HTML string
-pub fn render_to_html(element: &ElementDef) -> String {
-    let mut elem = element.clone();
-    assign_stable_ids(&mut elem, "r");
-    
-    // Collect all state styles into a single style block
-    let state_css = collect_state_styles(&elem);
-    let style_block = if state_css.is_empty() {
-        String::new()
-    } else {
-        format!("<style id=\"wry-state-styles\">{}</style>", state_css)
-    };
-    
-    format!("{}{}", style_block, render_element(&elem))
+/// True when every node in `children` has a key and no key repeats. An empty list counts
+/// as keyed.
+pub fn has_unique_keys(children: &[ElementDef]) -> bool {
+    if !children.iter().all(|c| c.key.is_some()) {
+        return false;
+    }
+    let mut seen = HashSet::with_capacity(children.len());
+    children.iter().all(|c| c.key.as_deref().is_some_and(|k| seen.insert(k)))
 }
 
-/// Serialize an ElementDef tree to JSON for DOM patching
-pub fn render_to_json(element: &ElementDef) -> String {
+/// Replace the builder-minted callback IDs in a tree with IDs derived from position.
+///
+/// Each handler becomes `<element id>:<event>`, and `bindings` maps that stable ID back
+/// to the minted one under which the Python callable is registered. Re-rendering the same
+/// handlers in the same place therefore serializes identically and diffs to nothing.
+/// Run this after assign_stable_ids().
+pub fn bind_callbacks(element: &mut ElementDef, bindings: &mut HashMap<String, String>) {
+    let id = element.id.clone();
+    for (event, slot) in element.callback_slots_mut() {
+        if let Some(minted) = slot.take() {
+            let stable = format!("{}:{}", id, event);
+            bindings.insert(stable.clone(), minted);
+            *slot = Some(stable);
+        }
+    }
+    for child in element.children.iter_mut() {
+        bind_callbacks(child, bindings);
+    }
+}
+
+/// Append a user key to `out`, encoded so it is safe inside an HTML id and a CSS selector.
+///
+/// Alphanumerics pass through, '_' is doubled and anything else becomes `_<hex>_`,
+/// which keeps distinct keys distinct.
+fn encode_key(out: &mut String, key: &str) {
+    for c in key.chars() {
+        if c.is_ascii_alphanumeric() {
+            out.push(c);
+        } else if c == '_' {
+            out.push_str("__");
+        } else {
+            let _ = write!(out, "_{:x}_", c as u32);
+        }
+    }
+}
+
+/// A tree split into the HTML the page is built with and the rest of it
+pub struct StreamedRender {
+    /// The first nodes in document order
+    pub html: String,
+    /// Rules for the style classes used anywhere in the tree
+    pub css: String,
+    /// `applyPatch()` payloads that insert the remaining nodes, in order
+    pub chunks: Vec<String>,
+}
+
+/// Render a tree whose IDs have already been assigned, `chunk_nodes` nodes at a time.
+///
+/// The page shows the first chunk as soon as it is parsed, and each following chunk
+/// inserts the next nodes in document order, so the first paint costs the same however
+/// large the tree is. Every node in a chunk hangs off a node of an earlier chunk or an
+/// earlier insert of the same chunk, and is appended after the siblings already there.
+///
+/// The rules for every class registered in `sheet` along the way go into the page too.
+pub fn render_tree_streamed(
+    elem: &ElementDef,
+    chunk_nodes: usize,
+    sheet: &mut StyleSheet,
+) -> StreamedRender {
+    let mut budget = chunk_nodes.max(1);
+    let mut rest = Vec::new();
+    let mut writer = HtmlWriter::new(sheet, count_nodes(elem, budget));
+    writer.element(elem, &mut budget, &mut rest);
+    let html = writer.out;
+
+    // Only the nodes that are streamed get copied, since they go out as patch ops
+    let mut pending: VecDeque<(String, Cow<ElementDef>)> = rest
+        .into_iter()
+        .map(|(parent, node)| (parent.to_string(), Cow::Borrowed(node)))
+        .collect();
+    let mut chunks = Vec::new();
+    while !pending.is_empty() {
+        let mut budget = chunk_nodes.max(1);
+        let mut ops = Vec::new();
+        while budget > 0 {
+            let Some((parent, node)) = pending.pop_front() else {
+                break;
+            };
+            let mut rest = Vec::new();
+            let mut node = take_prefix(node.into_owned(), &mut budget, &mut rest);
+            prepare_node(&mut node, sheet);
+            ops.push(PatchOp::Insert {
+                parent,
+                before: None,
+                node,
+            });
+            // What's left of this subtree comes before anything queued after it
+            for (parent, node) in rest.into_iter().rev() {
+                pending.push_front((parent, Cow::Owned(node)));
+            }
+        }
+        let message = PatchMessage { ops: &ops };
+        chunks.push(serde_json::to_string(&message).unwrap_or_default());
+    }
+
+    let css = sheet.take_rules().join("\n");
+    StreamedRender { html, css, chunks }
+}
+
+/// Keep the first `budget` nodes of a subtree in document order.
+///
+/// The cut-off subtrees are appended to `rest` with their parent's ID, in document order.
+fn take_prefix(
+    mut node: ElementDef,
+    budget: &mut usize,
+    rest: &mut Vec<(String, ElementDef)>,
+) -> ElementDef {
+    *budget -= 1;
+    let children = std::mem::take(&mut node.children);
+    let mut children = children.into_iter();
+    while *budget > 0 {
+        let Some(child) = children.next() else {
+            break;
+        };
+        let child = take_prefix(child, budget, rest);
+        node.children.push(child);
+    }
+    rest.extend(children.map(|child| (node.id.clone(), child)));
+    node
+}
+
+/// Ready a subtree to be sent to the page as JSON, as the HTML writer would render it:
+/// image sources and url()s in raw styles are resolved, and styles replaced by classes.
+pub fn prepare_node(node: &mut ElementDef, sheet: &mut StyleSheet) {
+    resolve_assets(node);
+    sheet.classify(node);
+}
+
+fn resolve_assets(node: &mut ElementDef) {
+    if node.element_type == "image" {
+        let src = resolve_local_asset(node.text_content.as_deref().unwrap_or(""));
+        node.text_content = Some(src);
+    }
+    if let Some(raw) = node.style.as_mut() {
+        *raw = rewrite_css_urls(raw);
+    }
+    for child in node.children.iter_mut() {
+        resolve_assets(child);
+    }
+}
+
+/// Serialize an ElementDef tree to JSON for DOM patching, styles replaced by classes
+pub fn render_to_json(element: &ElementDef, sheet: &mut StyleSheet) -> String {
     let mut elem = element.clone();
     assign_stable_ids(&mut elem, "r");
+    prepare_node(&mut elem, sheet);
     serde_json::to_string(&elem).unwrap_or_default()
 }
 
-/// Serialize an ElementDef to JSON without reassigning IDs (for partial updates)
-pub fn render_to_json_partial(element: &ElementDef) -> String {
-    serde_json::to_string(element).unwrap_or_default()
-}
+/// Hover/focus rules of the nodes in a tree that have any, by node ID
+pub type StateRules = HashMap<String, Vec<String>>;
 
-/// Collect all hover/focus CSS rules from an element tree into a single CSS string
-fn collect_state_styles(element: &ElementDef) -> String {
-    let mut css = String::new();
-    collect_state_styles_recursive(element, &mut css);
-    css
+/// Collect the hover/focus rules of every node in a tree into `rules`
+pub fn collect_state_rules(element: &ElementDef, rules: &mut StateRules) {
+    let node_rules = state_rules(element);
+    if !node_rules.is_empty() {
+        rules.insert(element.id.clone(), node_rules);
+    }
+    for child in &element.children {
+        collect_state_rules(child, rules);
+    }
 }
 
-fn collect_state_styles_recursive(el: &ElementDef, css: &mut String) {
-    let id = escape_html(el.user_id.as_deref().unwrap_or(&el.id));
+/// The `:hover` and `:focus` rules of a single node, in that order
+fn state_rules(el: &ElementDef) -> Vec<String> {
+    let selector = css_id_selector(el.user_id.as_deref().unwrap_or(&el.id));
+    let mut rules = Vec::new();
 
     // Hover styles
     let mut hover_styles = Vec::new();
@@ -67,8 +238,12 @@ fn collect_state_styles_recursive(el: &ElementDef, css: &mut String) {
     if let Some(scale) = el.hover_scale {
         hover_styles.push(format!("transform: scale({}) !important", scale));
     }
+    // Buttons keep the pointer cursor on hover
+    if el.element_type == "button" {
+        hover_styles.push("cursor: pointer !important".to_string());
+    }
     if !hover_styles.is_empty() {
-        css.push_str(&format!("#{}:hover {{ {} }}", id, hover_styles.join("; ")));
+        rules.push(format!("{}:hover {{ {} }}", selector, contain_declarations(&hover_styles.join("; "))));
     }
 
     // Focus styles
@@ -82,14 +257,31 @@ fn collect_state_styles_recursive(el: &ElementDef, css: &mut String) {
     if let Some(ref bc) = el.focus_border_color {
         focus_styles.push(format!("border-color: {} !important", bc));
     }
+    // Buttons and inputs never show the default focus outline
+    if matches!(el.element_type.as_str(), "button" | "input" | "select") {
+        focus_styles.push("outline: none !important".to_string());
+    }
     if !focus_styles.is_empty() {
-        css.push_str(&format!("#{}:focus {{ {} }}", id, focus_styles.join("; ")));
+        rules.push(format!("{}:focus {{ {} }}", selector, contain_declarations(&focus_styles.join("; "))));
     }
 
-    // Recurse into children
-    for child in &el.children {
-        collect_state_styles_recursive(child, css);
+    rules
+}
+
+/// `#id` selector for an element ID, escaping what CSS wouldn't read as part of the name
+fn css_id_selector(id: &str) -> String {
+    let mut out = String::from("#");
+    for (i, c) in id.chars().enumerate() {
+        if c.is_ascii_digit() && i == 0 {
+            out.push_str(&format!("\\{:x} ", c as u32));
+        } else if c.is_ascii_alphanumeric() || c == '-' || c == '_' || !c.is_ascii() {
+            out.push(c);
+        } else {
+            out.push('\\');
+            out.push(c);
+        }
     }
+    out
 }
 
 fn percent_encode_path(p: &Path) -> String {
@@ -112,19 +304,19 @@ fn resolve_local_asset(path_str: &str) -> String {
         return path_str.to_string();
     }
 
-    // asset: prefix for explicit AssetCatalog lookup
+    // asset: prefix for explicit AssetCatalog lookup, served over the custom protocol
     if let Some(name) = path_str.strip_prefix("asset:") {
-        if let Some(uri) = assets::get_asset_data_uri(name) {
+        if let Some(uri) = assets::get_asset_url(name) {
             return uri;
         }
     }
 
     // Check AssetCatalog by name or basename
-    if let Some(uri) = assets::get_asset_data_uri(path_str) {
+    if let Some(uri) = assets::get_asset_url(path_str) {
         return uri;
     }
     if let Some(basename) = Path::new(path_str).file_name().and_then(|s| s.to_str()) {
-        if let Some(uri) = assets::get_asset_data_uri(basename) {
+        if let Some(uri) = assets::get_asset_url(basename) {
             return uri;
         }
     }
@@ -164,786 +356,1014 @@ fn rewrite_css_urls(css: &str) -> String {
     out
 }
 
-// Build border-radius considering per-corner values
-fn build_border_radius_style(el: &ElementDef) -> Option<String> {
-    let tl = el.border_radius_top_left.or(el.border_radius);
-    let tr = el.border_radius_top_right.or(el.border_radius);
-    let br = el.border_radius_bottom_right.or(el.border_radius);
-    let bl = el.border_radius_bottom_left.or(el.border_radius);
-
-    if tl.is_none() && tr.is_none() && br.is_none() && bl.is_none() {
-        None
-    } else {
-        let tl_v = tl.unwrap_or(0.0);
-        let tr_v = tr.unwrap_or(tl_v);
-        let br_v = br.unwrap_or(tl_v);
-        let bl_v = bl.unwrap_or(tr_v);
-        Some(format!("border-radius: {}px {}px {}px {}px", tl_v, tr_v, br_v, bl_v))
-    }
+/// Rough size of a node's HTML, used to size the buffer up front
+const HTML_BYTES_PER_NODE: usize = 160;
+
+/// Writes the HTML for a tree into a single buffer.
+///
+/// A node's declarations are collected in a second buffer that every node reuses, so a
+/// node whose style already has a class is written without allocating.
+struct HtmlWriter<'s> {
+    out: String,
+    style: String,
+    sheet: &'s mut StyleSheet,
 }
 
-// Build per-side border styles
-fn build_border_sides_styles(el: &ElementDef) -> Vec<String> {
-    let mut out = Vec::new();
-
-    if let Some(w) = el.border_width_top {
-        let color = el.border_color_top.as_deref().or(el.border_color.as_deref()).unwrap_or("#333");
-        out.push(format!("border-top: {}px solid {}", w, color));
-    }
-    if let Some(w) = el.border_width_right {
-        let color = el.border_color_right.as_deref().or(el.border_color.as_deref()).unwrap_or("#333");
-        out.push(format!("border-right: {}px solid {}", w, color));
-    }
-    if let Some(w) = el.border_width_bottom {
-        let color = el.border_color_bottom.as_deref().or(el.border_color.as_deref()).unwrap_or("#333");
-        out.push(format!("border-bottom: {}px solid {}", w, color));
-    }
-    if let Some(w) = el.border_width_left {
-        let color = el.border_color_left.as_deref().or(el.border_color.as_deref()).unwrap_or("#333");
-        out.push(format!("border-left: {}px solid {}", w, color));
+impl<'s> HtmlWriter<'s> {
+    fn new(sheet: &'s mut StyleSheet, nodes: usize) -> Self {
+        HtmlWriter {
+            out: String::with_capacity(nodes * HTML_BYTES_PER_NODE),
+            style: String::with_capacity(256),
+            sheet,
+        }
     }
 
-    out
-}
-
-/// Build event handler attributes for an element
-fn build_event_attrs(el: &ElementDef) -> String {
-    let mut attrs = String::new();
-
-    if let Some(ref cb_id) = el.on_click {
-        attrs.push_str(&format!(" onclick=\"handleClick('{}')\"", escape_html(cb_id)));
-    }
-    if let Some(ref cb_id) = el.on_mouse_enter {
-        attrs.push_str(&format!(" onmouseenter=\"handleMouseEvent('{}', 'mouse_enter')\"", escape_html(cb_id)));
-    }
-    if let Some(ref cb_id) = el.on_mouse_leave {
-        attrs.push_str(&format!(" onmouseleave=\"handleMouseEvent('{}', 'mouse_leave')\"", escape_html(cb_id)));
-    }
-    if let Some(ref cb_id) = el.on_mouse_down {
-        attrs.push_str(&format!(" onmousedown=\"handleMouseEvent('{}', 'mouse_down')\"", escape_html(cb_id)));
-    }
-    if let Some(ref cb_id) = el.on_mouse_up {
-        attrs.push_str(&format!(" onmouseup=\"handleMouseEvent('{}', 'mouse_up')\"", escape_html(cb_id)));
+    /// Write `el` and as many of its descendants as `budget` allows, in document order.
+    ///
+    /// The children left out are appended to `rest` with their parent's ID, in document order.
+    fn element<'t>(
+        &mut self,
+        el: &'t ElementDef,
+        budget: &mut usize,
+        rest: &mut Vec<(&'t str, &'t ElementDef)>,
+    ) {
+        *budget -= 1;
+        self.style.clear();
+        match el.element_type.as_str() {
+            "text" => self.text(el),
+            "button" => self.button(el),
+            "image" => self.image(el),
+            "input" => self.input(el),
+            "checkbox" => self.checkbox(el),
+            "radio" => self.radio(el),
+            "select" => self.select(el),
+            _ => return self.div(el, budget, rest),
+        }
+        // Only divs write out their children; anything under another element goes
+        // out with the streamed chunks, which the page renders under any element
+        rest.extend(el.children.iter().map(|child| (el.id.as_str(), child)));
     }
 
-    attrs
-}
-
-fn render_element(el: &ElementDef) -> String {
-    match el.element_type.as_str() {
-        "text" => render_text(el),
-        "button" => render_button(el),
-        "image" => render_image(el),
-        "input" => render_input(el),
-        "checkbox" => render_checkbox(el),
-        "radio" => render_radio(el),
-        "select" => render_select(el),
-        _ => render_div(el),
+    /// Add a declaration to the node's style
+    fn decl(&mut self, declaration: fmt::Arguments) {
+        if !self.style.is_empty() {
+            self.style.push_str("; ");
+        }
+        let _ = self.style.write_fmt(declaration);
     }
-}
-
-/// Get the element ID to use in HTML (user_id if set, otherwise internal id)
-fn get_element_id(el: &ElementDef) -> &str {
-    el.user_id.as_deref().unwrap_or(&el.id)
-}
 
-/// Build data-id attribute for internal element tracking
-fn build_data_id_attr(el: &ElementDef) -> String {
-    format!(" data-wry-id=\"{}\"", escape_html(&el.id))
-}
-
-fn render_div(el: &ElementDef) -> String {
-    let mut classes = Vec::new();
-    let mut styles = Vec::new();
-
-    for class in &el.class_names {
-        classes.push(class.as_str());
+    /// Add border-radius from the per-corner radii, falling back to the shared one
+    fn border_radius(&mut self, el: &ElementDef) {
+        if let Some([tl, tr, br, bl]) = corner_radii(el) {
+            self.decl(format_args!("border-radius: {}px {}px {}px {}px", tl, tr, br, bl));
+        }
     }
 
-    if el.size_full {
-        classes.push("size-full");
+    /// Add the per-side borders
+    fn border_sides(&mut self, el: &ElementDef) {
+        let sides = [
+            ("border-top", el.border_width_top, &el.border_color_top),
+            ("border-right", el.border_width_right, &el.border_color_right),
+            ("border-bottom", el.border_width_bottom, &el.border_color_bottom),
+            ("border-left", el.border_width_left, &el.border_color_left),
+        ];
+        for (name, width, color) in sides {
+            if let Some(w) = width {
+                let color = color.as_deref().or(el.border_color.as_deref()).unwrap_or("#333");
+                self.decl(format_args!("{}: {}px solid {}", name, w, color));
+            }
+        }
     }
 
-    match el.flex_direction.as_deref() {
-        Some("column") => classes.push("flex-col"),
-        Some("row") => classes.push("flex-row"),
-        _ => {}
+    /// Open a tag with the element's ID, its data-id (and data-key) attributes for internal
+    /// element tracking, and the placement of virtual lists and their rows
+    fn open(&mut self, tag: &str, el: &ElementDef) {
+        let out = &mut self.out;
+        out.push('<');
+        out.push_str(tag);
+        out.push_str(" id=\"");
+        escape_into(out, get_element_id(el));
+        out.push_str("\" data-wry-id=\"");
+        escape_into(out, &el.id);
+        out.push('"');
+        if let Some(ref key) = el.key {
+            out.push_str(" data-wry-key=\"");
+            escape_into(out, key);
+            out.push('"');
+        }
+        let row_height = f64::from(el.row_height.unwrap_or(0.0));
+        if let Some(index) = el.row_index {
+            let _ = write!(out, " style=\"top: {}px; height: {}px\"", index as f64 * row_height, row_height);
+        } else if let Some(ref render_row) = el.render_row {
+            out.push_str(" data-wry-rows=\"");
+            escape_into(out, render_row);
+            let height = el.row_count.unwrap_or(0) as f64 * row_height;
+            let _ = write!(out, "\" style=\"--wry-list-height: {}px\"", height);
+        }
     }
 
-    match el.align_items.as_deref() {
-        Some("center") => classes.push("items-center"),
-        Some("start") | Some("flex-start") => classes.push("items-start"),
-        Some("end") | Some("flex-end") => classes.push("items-end"),
-        _ => {}
+    /// Write the class attribute from a node's own classes plus the shared class for its style
+    fn classes<'a>(&mut self, names: impl IntoIterator<Item = &'a str>) {
+        let style_class = self.sheet.class_for(&self.style);
+        let mut empty = true;
+        for name in names {
+            self.out.push_str(if empty { " class=\"" } else { " " });
+            escape_into(&mut self.out, name);
+            empty = false;
+        }
+        if let Some(style_class) = style_class {
+            self.out.push_str(if empty { " class=\"" } else { " " });
+            escape_into(&mut self.out, &style_class);
+            empty = false;
+        }
+        if !empty {
+            self.out.push('"');
+        }
     }
 
-    match el.justify_content.as_deref() {
-        Some("center") => classes.push("justify-center"),
-        Some("space-between") => classes.push("justify-between"),
-        Some("start") | Some("flex-start") => classes.push("justify-start"),
-        Some("end") | Some("flex-end") => classes.push("justify-end"),
-        _ => {}
+    /// Write an event handler attribute, `handler` being the JS call up to the callback ID
+    fn handler(&mut self, attr: &str, handler: &str, cb_id: &str, rest: &str) {
+        let out = &mut self.out;
+        out.push(' ');
+        out.push_str(attr);
+        out.push_str("=\"");
+        out.push_str(handler);
+        out.push_str("('");
+        escape_into(out, cb_id);
+        out.push('\'');
+        out.push_str(rest);
+        out.push_str(")\"");
+    }
+
+    /// Write the mouse event handler attributes of an element
+    fn event_attrs(&mut self, el: &ElementDef) {
+        if let Some(ref cb_id) = el.on_click {
+            self.handler("onclick", "handleClick", cb_id, "");
+        }
+        if let Some(ref cb_id) = el.on_mouse_enter {
+            self.handler("onmouseenter", "handleMouseEvent", cb_id, ", 'mouse_enter'");
+        }
+        if let Some(ref cb_id) = el.on_mouse_leave {
+            self.handler("onmouseleave", "handleMouseEvent", cb_id, ", 'mouse_leave'");
+        }
+        if let Some(ref cb_id) = el.on_mouse_down {
+            self.handler("onmousedown", "handleMouseEvent", cb_id, ", 'mouse_down'");
+        }
+        if let Some(ref cb_id) = el.on_mouse_up {
+            self.handler("onmouseup", "handleMouseEvent", cb_id, ", 'mouse_up'");
+        }
+        if let Some(ref cb_id) = el.on_mouse_move {
+            self.handler("onmousemove", "handleMouseMove", cb_id, ", event, this");
+        }
     }
 
-    if el.display_grid {
-        styles.push("display: grid".to_string());
-    }
-    if let Some(ref cols) = el.grid_template_columns {
-        styles.push(format!("grid-template-columns: {}", cols));
-    }
-    if let Some(ref rows) = el.grid_template_rows {
-        styles.push(format!("grid-template-rows: {}", rows));
-    }
-    if let Some(ref col) = el.grid_column {
-        styles.push(format!("grid-column: {}", col));
-    }
-    if let Some(ref row) = el.grid_row {
-        styles.push(format!("grid-row: {}", row));
-    }
-    if let Some(ref pi) = el.place_items {
-        styles.push(format!("place-items: {}", pi));
+    /// Write ` name="value"` with the value escaped
+    fn attr(&mut self, name: &str, value: &str) {
+        self.out.push(' ');
+        self.out.push_str(name);
+        self.out.push_str("=\"");
+        escape_into(&mut self.out, value);
+        self.out.push('"');
     }
 
-    if let Some(w) = el.width {
-        styles.push(format!("width: {}px", w));
-    }
-    if let Some(h) = el.height {
-        styles.push(format!("height: {}px", h));
-    }
-    if let Some(mw) = el.min_width {
-        styles.push(format!("min-width: {}px", mw));
-    }
-    if let Some(mw) = el.max_width {
-        styles.push(format!("max-width: {}px", mw));
-    }
-    if let Some(mh) = el.min_height {
-        styles.push(format!("min-height: {}px", mh));
-    }
-    if let Some(mh) = el.max_height {
-        styles.push(format!("max-height: {}px", mh));
-    }
-    if let Some(g) = el.gap {
-        styles.push(format!("gap: {}px", g));
-    }
-    if let Some(ref fw) = el.flex_wrap {
-        styles.push(format!("flex-wrap: {}", fw));
-    }
-    if let Some(fg) = el.flex_grow {
-        styles.push(format!("flex-grow: {}", fg));
-    }
-    if let Some(fs) = el.flex_shrink {
-        styles.push(format!("flex-shrink: {}", fs));
-    }
-    if let Some(ref fb) = el.flex_basis {
-        styles.push(format!("flex-basis: {}", fb));
-    }
-    if let Some(ref align_self) = el.align_self {
-        styles.push(format!("align-self: {}", align_self));
-    }
-    if let Some(p) = el.padding {
-        styles.push(format!("padding: {}px", p));
+    /// Write escaped text content, if any
+    fn content(&mut self, text: Option<&str>) {
+        if let Some(text) = text {
+            escape_into(&mut self.out, text);
+        }
     }
 
-    if let Some(pt) = el.padding_top {
-        styles.push(format!("padding-top: {}px", pt));
-    }
-    if let Some(pr) = el.padding_right {
-        styles.push(format!("padding-right: {}px", pr));
-    }
-    if let Some(pb) = el.padding_bottom {
-        styles.push(format!("padding-bottom: {}px", pb));
-    }
-    if let Some(pl) = el.padding_left {
-        styles.push(format!("padding-left: {}px", pl));
-    }
-    if let Some(m) = el.margin {
-        styles.push(format!("margin: {}px", m));
-    }
-    if let Some(ref bg) = el.background_color {
-        styles.push(format!("background-color: {}", bg));
-    }
-    if let Some(ref tc) = el.text_color {
-        styles.push(format!("color: {}", tc));
-    }
+    fn div<'t>(
+        &mut self,
+        el: &'t ElementDef,
+        budget: &mut usize,
+        rest: &mut Vec<(&'t str, &'t ElementDef)>,
+    ) {
+        let flags = [
+            el.size_full.then_some("size-full"),
+            (el.element_type == "virtual_list").then_some("wry-vlist"),
+            match el.flex_direction.as_deref() {
+                Some("column") => Some("flex-col"),
+                Some("row") => Some("flex-row"),
+                _ => None,
+            },
+            match el.align_items.as_deref() {
+                Some("center") => Some("items-center"),
+                Some("start") | Some("flex-start") => Some("items-start"),
+                Some("end") | Some("flex-end") => Some("items-end"),
+                _ => None,
+            },
+            match el.justify_content.as_deref() {
+                Some("center") => Some("justify-center"),
+                Some("space-between") => Some("justify-between"),
+                Some("start") | Some("flex-start") => Some("justify-start"),
+                Some("end") | Some("flex-end") => Some("justify-end"),
+                _ => None,
+            },
+        ];
+
+        if el.display_grid {
+            self.decl(format_args!("display: grid"));
+        }
+        let grid = [
+            ("grid-template-columns", &el.grid_template_columns),
+            ("grid-template-rows", &el.grid_template_rows),
+            ("grid-column", &el.grid_column),
+            ("grid-row", &el.grid_row),
+            ("place-items", &el.place_items),
+        ];
+        for (name, value) in grid {
+            if let Some(v) = value {
+                self.decl(format_args!("{}: {}", name, v));
+            }
+        }
+        let lengths = [
+            ("width", el.width),
+            ("height", el.height),
+            ("min-width", el.min_width),
+            ("max-width", el.max_width),
+            ("min-height", el.min_height),
+            ("max-height", el.max_height),
+            ("gap", el.gap),
+        ];
+        for (name, value) in lengths {
+            if let Some(v) = value {
+                self.decl(format_args!("{}: {}px", name, v));
+            }
+        }
+        if let Some(ref fw) = el.flex_wrap {
+            self.decl(format_args!("flex-wrap: {}", fw));
+        }
+        if let Some(fg) = el.flex_grow {
+            self.decl(format_args!("flex-grow: {}", fg));
+        }
+        if let Some(fs) = el.flex_shrink {
+            self.decl(format_args!("flex-shrink: {}", fs));
+        }
+        if let Some(ref fb) = el.flex_basis {
+            self.decl(format_args!("flex-basis: {}", fb));
+        }
+        if let Some(ref align_self) = el.align_self {
+            self.decl(format_args!("align-self: {}", align_self));
+        }
+        let padding = [
+            ("padding", el.padding),
+            ("padding-top", el.padding_top),
+            ("padding-right", el.padding_right),
+            ("padding-bottom", el.padding_bottom),
+            ("padding-left", el.padding_left),
+            ("margin", el.margin),
+        ];
+        for (name, value) in padding {
+            if let Some(v) = value {
+                self.decl(format_args!("{}: {}px", name, v));
+            }
+        }
+        if let Some(ref bg) = el.background_color {
+            self.decl(format_args!("background-color: {}", bg));
+        }
+        if let Some(ref tc) = el.text_color {
+            self.decl(format_args!("color: {}", tc));
+        }
+        let margins = [
+            ("margin-top", el.margin_top),
+            ("margin-right", el.margin_right),
+            ("margin-bottom", el.margin_bottom),
+            ("margin-left", el.margin_left),
+        ];
+        for (name, value) in margins {
+            if let Some(v) = value {
+                self.decl(format_args!("{}: {}px", name, v));
+            }
+        }
 
-    if let Some(mt) = el.margin_top {
-        styles.push(format!("margin-top: {}px", mt));
-    }
-    if let Some(mr) = el.margin_right {
-        styles.push(format!("margin-right: {}px", mr));
-    }
-    if let Some(mb) = el.margin_bottom {
-        styles.push(format!("margin-bottom: {}px", mb));
-    }
-    if let Some(ml) = el.margin_left {
-        styles.push(format!("margin-left: {}px", ml));
-    }
+        self.border_radius(el);
+        if has_border_sides(el) {
+            self.border_sides(el);
+        } else if let Some(bw) = el.border_width {
+            let bc = el.border_color.as_deref().unwrap_or("#333");
+            self.decl(format_args!("border: {}px solid {}", bw, bc));
+        }
 
-    if let Some(br_style) = build_border_radius_style(el) {
-        styles.push(br_style);
-    } else if let Some(br) = el.border_radius {
-        styles.push(format!("border-radius: {}px", br));
-    }
+        let keywords = [
+            ("overflow", &el.overflow),
+            ("text-align", &el.text_align),
+            ("word-wrap", &el.word_wrap),
+            ("position", &el.position),
+        ];
+        for (name, value) in keywords {
+            if let Some(v) = value {
+                self.decl(format_args!("{}: {}", name, v));
+            }
+        }
+        let offsets = [
+            ("top", el.top),
+            ("right", el.right),
+            ("bottom", el.bottom),
+            ("left", el.left),
+        ];
+        for (name, value) in offsets {
+            if let Some(v) = value {
+                self.decl(format_args!("{}: {}px", name, v));
+            }
+        }
+        if let Some(fs) = el.font_size {
+            self.decl(format_args!("font-size: {}px", fs));
+        }
+        if let Some(ref fw) = el.font_weight {
+            self.decl(format_args!("font-weight: {}", fw));
+        }
+        if let Some(ref transition) = el.transition {
+            self.decl(format_args!("transition: {}", transition));
+        }
+        if let Some(opacity) = el.opacity {
+            self.decl(format_args!("opacity: {}", opacity));
+        }
+        if let Some(ref cursor) = el.cursor {
+            self.decl(format_args!("cursor: {}", cursor));
+        }
+        if let Some(ref raw) = el.style {
+            self.decl(format_args!("{}", rewrite_css_urls(raw)));
+        }
 
-    let side_border_styles = build_border_sides_styles(el);
-    if !side_border_styles.is_empty() {
-        styles.extend(side_border_styles);
-    } else if let Some(bw) = el.border_width {
-        let bc = el.border_color.as_deref().unwrap_or("#333");
-        styles.push(format!("border: {}px solid {}", bw, bc));
+        self.open("div", el);
+        let class_names = el.class_names.iter().map(|c| c.as_str());
+        self.classes(class_names.chain(flags.into_iter().flatten()));
+        self.event_attrs(el);
+        self.out.push('>');
+        self.content(el.text_content.as_deref());
+
+        let mut children = el.children.iter();
+        while *budget > 0 {
+            let Some(child) = children.next() else {
+                break;
+            };
+            self.element(child, budget, rest);
+        }
+        rest.extend(children.map(|child| (el.id.as_str(), child)));
+        self.out.push_str("</div>");
     }
 
-    if let Some(ref overflow) = el.overflow {
-        styles.push(format!("overflow: {}", overflow));
-    }
-    if let Some(ref text_align) = el.text_align {
-        styles.push(format!("text-align: {}", text_align));
-    }
-    if let Some(ref word_wrap) = el.word_wrap {
-        styles.push(format!("word-wrap: {}", word_wrap));
-    }
-    if let Some(ref position) = el.position {
-        styles.push(format!("position: {}", position));
-    }
-    if let Some(top) = el.top {
-        styles.push(format!("top: {}px", top));
-    }
-    if let Some(right) = el.right {
-        styles.push(format!("right: {}px", right));
-    }
-    if let Some(bottom) = el.bottom {
-        styles.push(format!("bottom: {}px", bottom));
-    }
-    if let Some(left) = el.left {
-        styles.push(format!("left: {}px", left));
-    }
-    if let Some(fs) = el.font_size {
-        styles.push(format!("font-size: {}px", fs));
-    }
-    if let Some(ref fw) = el.font_weight {
-        styles.push(format!("font-weight: {}", fw));
-    }
-    if let Some(ref transition) = el.transition {
-        styles.push(format!("transition: {}", transition));
-    }
-    if let Some(opacity) = el.opacity {
-        styles.push(format!("opacity: {}", opacity));
-    }
-    if let Some(ref cursor) = el.cursor {
-        styles.push(format!("cursor: {}", cursor));
-    }
+    fn text(&mut self, el: &ElementDef) {
+        if let Some(ref tc) = el.text_color {
+            self.decl(format_args!("color: {}", tc));
+        }
+        if let Some(fs) = el.font_size {
+            self.decl(format_args!("font-size: {}px", fs));
+        }
+        if let Some(ref fw) = el.font_weight {
+            self.decl(format_args!("font-weight: {}", fw));
+        }
+        if let Some(ref text_align) = el.text_align {
+            self.decl(format_args!("text-align: {}", text_align));
+        }
+        if let Some(ref word_wrap) = el.word_wrap {
+            self.decl(format_args!("word-wrap: {}", word_wrap));
+        }
+        if let Some(p) = el.padding {
+            self.decl(format_args!("padding: {}px", p));
+        }
+        if let Some(ref transition) = el.transition {
+            self.decl(format_args!("transition: {}", transition));
+        }
 
-    if let Some(ref raw) = el.style {
-        let rewritten = rewrite_css_urls(raw);
-        styles.push(escape_html(&rewritten));
+        self.open("span", el);
+        self.classes(el.class_names.iter().map(|c| c.as_str()));
+        self.event_attrs(el);
+        self.out.push('>');
+        self.content(el.text_content.as_deref());
+        self.out.push_str("</span>");
     }
 
-    let class_attr = if classes.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", classes.join(" "))
-    };
+    fn button(&mut self, el: &ElementDef) {
+        let radii = corner_radii(el);
+        let border_sides = has_border_sides(el);
 
-    let style_attr = if styles.is_empty() {
-        String::new()
-    } else {
-        format!(" style=\"{}\"", styles.join("; "))
-    };
-
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-
-    let children_html: String = el.children.iter().map(render_element).collect();
-    let text_content = el.text_content.as_ref().map(|t| escape_html(t)).unwrap_or_default();
-
-    format!(
-        "<div id=\"{}\"{}{}{}{}>{}{}</div>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        style_attr,
-        event_attrs,
-        text_content,
-        children_html
-    )
-}
+        // Defaults, each left out when the element sets its own value
+        if el.cursor.is_none() {
+            self.decl(format_args!("cursor: pointer"));
+        }
+        if el.padding.is_none() {
+            self.decl(format_args!("padding: 8px 16px"));
+        }
+        if !border_sides && el.border_width.is_none() {
+            self.decl(format_args!("border: none"));
+        }
+        if radii.is_none() {
+            self.decl(format_args!("border-radius: 6px"));
+        }
+        if el.background_color.is_none() {
+            self.decl(format_args!("background: #3b82f6"));
+        }
+        if el.text_color.is_none() {
+            self.decl(format_args!("color: white"));
+        }
+        if el.font_size.is_none() {
+            self.decl(format_args!("font-size: 14px"));
+        }
+        self.decl(format_args!("outline: none"));
 
-fn render_text(el: &ElementDef) -> String {
-    let mut styles = Vec::new();
+        if let Some(ref bg) = el.background_color {
+            self.decl(format_args!("background: {}", bg));
+        }
+        if let Some(ref tc) = el.text_color {
+            self.decl(format_args!("color: {}", tc));
+        }
+        self.border_radius(el);
+        if let Some(fs) = el.font_size {
+            self.decl(format_args!("font-size: {}px", fs));
+        }
+        if let Some(p) = el.padding {
+            self.decl(format_args!("padding: {}px", p));
+        }
+        if border_sides {
+            self.border_sides(el);
+        } else if let Some(bw) = el.border_width {
+            let bc = el.border_color.as_deref().unwrap_or("#333");
+            self.decl(format_args!("border: {}px solid {}", bw, bc));
+        }
+        if let Some(ref cursor) = el.cursor {
+            self.decl(format_args!("cursor: {}", cursor));
+        }
+        if let Some(ref transition) = el.transition {
+            self.decl(format_args!("transition: {}", transition));
+        }
+        if let Some(opacity) = el.opacity {
+            self.decl(format_args!("opacity: {}", opacity));
+        }
+        if let Some(ref raw) = el.style {
+            self.decl(format_args!("{}", rewrite_css_urls(raw)));
+        }
 
-    if let Some(ref tc) = el.text_color {
-        styles.push(format!("color: {}", tc));
-    }
-    if let Some(fs) = el.font_size {
-        styles.push(format!("font-size: {}px", fs));
-    }
-    if let Some(ref fw) = el.font_weight {
-        styles.push(format!("font-weight: {}", fw));
-    }
-    if let Some(ref text_align) = el.text_align {
-        styles.push(format!("text-align: {}", text_align));
-    }
-    if let Some(ref word_wrap) = el.word_wrap {
-        styles.push(format!("word-wrap: {}", word_wrap));
-    }
-    if let Some(p) = el.padding {
-        styles.push(format!("padding: {}px", p));
-    }
-    if let Some(ref transition) = el.transition {
-        styles.push(format!("transition: {}", transition));
+        self.open("button", el);
+        self.classes(el.class_names.iter().map(|c| c.as_str()));
+        self.event_attrs(el);
+        self.out.push('>');
+        self.content(el.text_content.as_deref());
+        self.out.push_str("</button>");
     }
 
-    let style_attr = if styles.is_empty() {
-        String::new()
-    } else {
-        format!(" style=\"{}\"", styles.join("; "))
-    };
+    fn image(&mut self, el: &ElementDef) {
+        if let Some(w) = el.width {
+            self.decl(format_args!("width: {}px", w));
+        }
+        if let Some(h) = el.height {
+            self.decl(format_args!("height: {}px", h));
+        }
+        self.border_radius(el);
+        if let Some(ref of) = el.object_fit {
+            self.decl(format_args!("object-fit: {}", of));
+        }
+        if let Some(ref transition) = el.transition {
+            self.decl(format_args!("transition: {}", transition));
+        }
+        if let Some(opacity) = el.opacity {
+            self.decl(format_args!("opacity: {}", opacity));
+        }
+        if let Some(ref cursor) = el.cursor {
+            self.decl(format_args!("cursor: {}", cursor));
+        }
+        self.border_sides(el);
+
+        self.open("img", el);
+        self.classes(el.class_names.iter().map(|c| c.as_str()));
+        let src = resolve_local_asset(el.text_content.as_deref().unwrap_or(""));
+        self.out.push_str("src=\"");
+        escape_into(&mut self.out, &src);
+        self.out.push('"');
+        if let Some(ref alt) = el.alt {
+            self.attr("alt", alt);
+        }
+        self.event_attrs(el);
+        self.out.push_str("/>");
+    }
 
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-    let text = el.text_content.as_ref().map(|t| escape_html(t)).unwrap_or_default();
+    fn input(&mut self, el: &ElementDef) {
+        let radii = corner_radii(el);
+        let border_sides = has_border_sides(el);
 
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    format!(
-        "<span id=\"{}\"{}{}{}{}>{}</span>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        style_attr,
-        event_attrs,
-        text
-    )
-}
+        // Defaults, each left out when the element sets its own value
+        if el.padding.is_none() {
+            self.decl(format_args!("padding: 8px 12px"));
+        }
+        if !border_sides && el.border_width.is_none() {
+            self.decl(format_args!("border: 1px solid #555"));
+        }
+        if radii.is_none() {
+            self.decl(format_args!("border-radius: 4px"));
+        }
+        if el.background_color.is_none() {
+            self.decl(format_args!("background: #2a2a3a"));
+        }
+        if el.text_color.is_none() {
+            self.decl(format_args!("color: white"));
+        }
+        self.decl(format_args!("font-size: 14px"));
+        self.decl(format_args!("outline: none"));
 
-fn render_button(el: &ElementDef) -> String {
-    let mut styles = vec![
-        "cursor: pointer".to_string(),
-        "padding: 8px 16px".to_string(),
-        "border: none".to_string(),
-        "border-radius: 6px".to_string(),
-        "background: #3b82f6".to_string(),
-        "color: white".to_string(),
-        "font-size: 14px".to_string(),
-        "outline: none".to_string(),
-    ];
+        if let Some(w) = el.width {
+            self.decl(format_args!("width: {}px", w));
+        }
+        if let Some(h) = el.height {
+            self.decl(format_args!("height: {}px", h));
+        }
+        if let Some(ref bg) = el.background_color {
+            self.decl(format_args!("background: {}", bg));
+        }
+        if let Some(ref tc) = el.text_color {
+            self.decl(format_args!("color: {}", tc));
+        }
+        self.border_radius(el);
+        if let Some(p) = el.padding {
+            self.decl(format_args!("padding: {}px", p));
+        }
+        if border_sides {
+            self.border_sides(el);
+        } else if let Some(bw) = el.border_width {
+            let bc = el.border_color.as_deref().unwrap_or("#555");
+            self.decl(format_args!("border: {}px solid {}", bw, bc));
+        }
+        if let Some(ref cursor) = el.cursor {
+            self.decl(format_args!("cursor: {}", cursor));
+        }
+        if let Some(ref transition) = el.transition {
+            self.decl(format_args!("transition: {}", transition));
+        }
 
-    if let Some(ref bg) = el.background_color {
-        styles.retain(|s| !s.starts_with("background:"));
-        styles.push(format!("background: {}", bg));
-    }
-    if let Some(ref tc) = el.text_color {
-        styles.retain(|s| !s.starts_with("color:"));
-        styles.push(format!("color: {}", tc));
-    }
-    if let Some(br_style) = build_border_radius_style(el) {
-        styles.retain(|s| !s.starts_with("border-radius:"));
-        styles.push(br_style);
-    } else if let Some(br) = el.border_radius {
-        styles.retain(|s| !s.starts_with("border-radius:"));
-        styles.push(format!("border-radius: {}px", br));
-    }
-    if let Some(fs) = el.font_size {
-        styles.retain(|s| !s.starts_with("font-size:"));
-        styles.push(format!("font-size: {}px", fs));
-    }
-    if let Some(p) = el.padding {
-        styles.retain(|s| !s.starts_with("padding:"));
-        styles.push(format!("padding: {}px", p));
+        self.open("input", el);
+        self.classes(el.class_names.iter().map(|c| c.as_str()));
+        self.out.push_str("type=\"text\"");
+        if let Some(ref cb_id) = el.on_input {
+            let timing = format_args!(
+                ", this.value, {}, {}",
+                el.input_debounce_ms.unwrap_or(0),
+                el.input_throttle_ms.unwrap_or(0)
+            );
+            self.out.push_str(" oninput=\"handleInput('");
+            escape_into(&mut self.out, cb_id);
+            self.out.push('\'');
+            let _ = self.out.write_fmt(timing);
+            self.out.push_str(")\"");
+        }
+        self.event_attrs(el);
+        if let Some(ref value) = el.value {
+            self.attr("value", value);
+        }
+        if let Some(ref placeholder) = el.placeholder {
+            self.attr("placeholder", placeholder);
+        }
+        self.out.push_str("/>");
+    }
+
+    fn checkbox(&mut self, el: &ElementDef) {
+        self.toggle(el, "checkbox", ", this.checked");
+    }
+
+    fn radio(&mut self, el: &ElementDef) {
+        self.toggle(el, "radio", ", this.value");
+    }
+
+    /// A checkbox or radio input inside a label. `changed` is what the change handler
+    /// passes after the callback ID.
+    fn toggle(&mut self, el: &ElementDef, input_type: &str, changed: &str) {
+        let accent_color = el.background_color.as_deref().unwrap_or("#3b82f6");
+        let cursor_style = el.cursor.as_deref().unwrap_or("pointer");
+        self.decl(format_args!("display: flex"));
+        self.decl(format_args!("align-items: center"));
+        self.decl(format_args!("cursor: {}", cursor_style));
+
+        self.open("label", el);
+        self.classes(el.class_names.iter().map(|c| c.as_str()));
+        self.event_attrs(el);
+        let out = &mut self.out;
+        let _ = write!(out, "><input type=\"{}\" style=\"width: 18px; height: 18px; accent-color: ", input_type);
+        escape_into(out, accent_color);
+        out.push_str("; cursor: ");
+        escape_into(out, cursor_style);
+        out.push('"');
+        if input_type == "radio" {
+            if let Some(ref group) = el.radio_group {
+                self.attr("name", group);
+            }
+            if let Some(ref value) = el.value {
+                self.attr("value", value);
+            }
+        }
+        if el.checked.unwrap_or(false) {
+            self.out.push_str(" checked");
+        }
+        if let Some(ref cb_id) = el.on_change {
+            self.handler("onchange", "handleChange", cb_id, changed);
+        }
+        self.out.push_str("/>");
+        if let Some(ref label) = el.label {
+            self.out.push_str("<span style=\"margin-left: 8px\">");
+            escape_into(&mut self.out, label);
+            self.out.push_str("</span>");
+        }
+        self.out.push_str("</label>");
     }
 
-    let side_border_styles = build_border_sides_styles(el);
-    if !side_border_styles.is_empty() {
-        styles.retain(|s| !s.starts_with("border:"));
-        styles.extend(side_border_styles);
-    } else if let Some(bw) = el.border_width {
-        styles.retain(|s| !s.starts_with("border:"));
-        let bc = el.border_color.as_deref().unwrap_or("#333");
-        styles.push(format!("border: {}px solid {}", bw, bc));
-    }
+    fn select(&mut self, el: &ElementDef) {
+        self.decl(format_args!("padding: 8px 12px"));
+        self.decl(format_args!("font-size: 14px"));
+        if el.cursor.is_none() {
+            self.decl(format_args!("cursor: pointer"));
+        }
+        self.decl(format_args!("outline: none"));
 
-    if let Some(ref cursor) = el.cursor {
-        styles.retain(|s| !s.starts_with("cursor:"));
-        styles.push(format!("cursor: {}", cursor));
-    }
-    if let Some(ref transition) = el.transition {
-        styles.push(format!("transition: {}", transition));
-    }
-    if let Some(opacity) = el.opacity {
-        styles.push(format!("opacity: {}", opacity));
-    }
+        if let Some(w) = el.width {
+            self.decl(format_args!("width: {}px", w));
+        }
+        if let Some(ref bg) = el.background_color {
+            self.decl(format_args!("background: {}", bg));
+        }
+        if let Some(ref tc) = el.text_color {
+            self.decl(format_args!("color: {}", tc));
+        }
+        if let Some(br) = el.border_radius {
+            self.decl(format_args!("border-radius: {}px", br));
+        }
+        if let Some(bw) = el.border_width {
+            let bc = el.border_color.as_deref().unwrap_or("#333");
+            self.decl(format_args!("border: {}px solid {}", bw, bc));
+        }
+        if let Some(ref cursor) = el.cursor {
+            self.decl(format_args!("cursor: {}", cursor));
+        }
+        if let Some(ref transition) = el.transition {
+            self.decl(format_args!("transition: {}", transition));
+        }
+        if let Some(ref raw) = el.style {
+            self.decl(format_args!("{}", raw));
+        }
 
-    if let Some(ref raw) = el.style {
-        let rewritten = rewrite_css_urls(raw);
-        styles.push(escape_html(&rewritten));
+        self.open("select", el);
+        self.classes(el.class_names.iter().map(|c| c.as_str()));
+        if let Some(ref cb_id) = el.on_change {
+            self.handler("onchange", "handleChange", cb_id, ", this.value");
+        }
+        self.event_attrs(el);
+        self.out.push('>');
+        for opt in &el.options {
+            self.out.push_str("<option");
+            self.attr("value", &opt.value);
+            if el.selected.as_deref() == Some(opt.value.as_str()) {
+                self.out.push_str(" selected");
+            }
+            self.out.push('>');
+            escape_into(&mut self.out, &opt.label);
+            self.out.push_str("</option>");
+        }
+        self.out.push_str("</select>");
     }
-
-    let style_attr = format!(" style=\"{}\"", styles.join("; "));
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-    let text = el.text_content.as_ref().map(|t| escape_html(t)).unwrap_or_default();
-
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    format!(
-        "<button id=\"{}\"{}{}{}{}>{}</button>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        style_attr,
-        event_attrs,
-        text
-    )
 }
 
-fn render_image(el: &ElementDef) -> String {
-    let mut styles = Vec::new();
-
-    if let Some(w) = el.width {
-        styles.push(format!("width: {}px", w));
-    }
-    if let Some(h) = el.height {
-        styles.push(format!("height: {}px", h));
-    }
-    if let Some(br_style) = build_border_radius_style(el) {
-        styles.push(br_style);
-    } else if let Some(br) = el.border_radius {
-        styles.push(format!("border-radius: {}px", br));
-    }
-    if let Some(ref of) = el.object_fit {
-        styles.push(format!("object-fit: {}", of));
-    }
-    if let Some(ref transition) = el.transition {
-        styles.push(format!("transition: {}", transition));
-    }
-    if let Some(opacity) = el.opacity {
-        styles.push(format!("opacity: {}", opacity));
-    }
-    if let Some(ref cursor) = el.cursor {
-        styles.push(format!("cursor: {}", cursor));
-    }
-
-    let side_border_styles = build_border_sides_styles(el);
-    if !side_border_styles.is_empty() {
-        styles.retain(|s| !s.starts_with("border:"));
-        styles.extend(side_border_styles);
-    }
-
-    let style_attr = if styles.is_empty() {
-        String::new()
-    } else {
-        format!(" style=\"{}\"", styles.join("; "))
-    };
-
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-
-    let raw_src = el.text_content.as_ref().map(|t| t.as_str()).unwrap_or("");
-    let resolved_src = resolve_local_asset(raw_src);
-    let src = escape_html(&resolved_src);
-    let alt_attr = el.alt.as_ref()
-        .map(|a| format!(" alt=\"{}\"", escape_html(a)))
-        .unwrap_or_default();
-
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    format!(
-        "<img id=\"{}\"{}{}src=\"{}\"{}{}{}/>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        src,
-        alt_attr,
-        style_attr,
-        event_attrs
-    )
+/// The element ID to use in HTML (user_id if set, otherwise internal id)
+fn get_element_id(el: &ElementDef) -> &str {
+    el.user_id.as_deref().unwrap_or(&el.id)
 }
 
-fn render_input(el: &ElementDef) -> String {
-    let mut styles = vec![
-        "padding: 8px 12px".to_string(),
-        "border: 1px solid #555".to_string(),
-        "border-radius: 4px".to_string(),
-        "background: #2a2a3a".to_string(),
-        "color: white".to_string(),
-        "font-size: 14px".to_string(),
-        "outline: none".to_string(),
-    ];
+/// Corner radii (top-left, top-right, bottom-right, bottom-left) if any are set, with
+/// unset corners taking the shared radius or a neighbour's
+fn corner_radii(el: &ElementDef) -> Option<[f32; 4]> {
+    let tl = el.border_radius_top_left.or(el.border_radius);
+    let tr = el.border_radius_top_right.or(el.border_radius);
+    let br = el.border_radius_bottom_right.or(el.border_radius);
+    let bl = el.border_radius_bottom_left.or(el.border_radius);
 
-    if let Some(w) = el.width {
-        styles.push(format!("width: {}px", w));
-    }
-    if let Some(h) = el.height {
-        styles.push(format!("height: {}px", h));
-    }
-    if let Some(ref bg) = el.background_color {
-        styles.retain(|s| !s.starts_with("background:"));
-        styles.push(format!("background: {}", bg));
-    }
-    if let Some(ref tc) = el.text_color {
-        styles.retain(|s| !s.starts_with("color:"));
-        styles.push(format!("color: {}", tc));
-    }
-    if let Some(br_style) = build_border_radius_style(el) {
-        styles.retain(|s| !s.starts_with("border-radius:"));
-        styles.push(br_style);
-    } else if let Some(br) = el.border_radius {
-        styles.retain(|s| !s.starts_with("border-radius:"));
-        styles.push(format!("border-radius: {}px", br));
-    }
-    if let Some(p) = el.padding {
-        styles.retain(|s| !s.starts_with("padding:"));
-        styles.push(format!("padding: {}px", p));
+    if tl.is_none() && tr.is_none() && br.is_none() && bl.is_none() {
+        None
+    } else {
+        let tl_v = tl.unwrap_or(0.0);
+        let tr_v = tr.unwrap_or(tl_v);
+        let br_v = br.unwrap_or(tl_v);
+        let bl_v = bl.unwrap_or(tr_v);
+        Some([tl_v, tr_v, br_v, bl_v])
     }
+}
 
-    let side_border_styles = build_border_sides_styles(el);
-    if !side_border_styles.is_empty() {
-        styles.retain(|s| !s.starts_with("border:"));
-        styles.extend(side_border_styles);
-    } else if let Some(bw) = el.border_width {
-        styles.retain(|s| !s.starts_with("border:"));
-        let bc = el.border_color.as_deref().unwrap_or("#555");
-        styles.push(format!("border: {}px solid {}", bw, bc));
-    }
+/// Whether any side has a border of its own
+fn has_border_sides(el: &ElementDef) -> bool {
+    el.border_width_top.is_some()
+        || el.border_width_right.is_some()
+        || el.border_width_bottom.is_some()
+        || el.border_width_left.is_some()
+}
 
-    if let Some(ref cursor) = el.cursor {
-        styles.push(format!("cursor: {}", cursor));
-    }
-    if let Some(ref transition) = el.transition {
-        styles.push(format!("transition: {}", transition));
+/// Number of nodes in a tree, counting no further than `limit`
+fn count_nodes(el: &ElementDef, limit: usize) -> usize {
+    let mut count = 1;
+    for child in &el.children {
+        if count >= limit {
+            break;
+        }
+        count += count_nodes(child, limit - count);
     }
-
-    let style_attr = format!(" style=\"{}\"", styles.join("; "));
-
-    let oninput_attr = if let Some(ref cb_id) = el.on_input {
-        format!(" oninput=\"handleInput('{}', this.value)\"", escape_html(cb_id))
-    } else {
-        String::new()
-    };
-
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-
-    let value_attr = el.value.as_ref()
-        .map(|v| format!(" value=\"{}\"", escape_html(v)))
-        .unwrap_or_default();
-
-    let placeholder_attr = el.placeholder.as_ref()
-        .map(|p| format!(" placeholder=\"{}\"", escape_html(p)))
-        .unwrap_or_default();
-
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    format!(
-        "<input id=\"{}\"{}{}type=\"text\"{}{}{}{}{}/>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        style_attr,
-        oninput_attr,
-        event_attrs,
-        value_attr,
-        placeholder_attr
-    )
+    count
 }
 
-fn render_checkbox(el: &ElementDef) -> String {
-    let checked_attr = if el.checked.unwrap_or(false) { " checked" } else { "" };
-
-    let onchange_attr = if let Some(ref cb_id) = el.on_change {
-        format!(" onchange=\"handleChange('{}', this.checked)\"", escape_html(cb_id))
-    } else {
-        String::new()
-    };
-
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-
-    let label_html = el.label.as_ref()
-        .map(|l| format!("<span style=\"margin-left: 8px\">{}</span>", escape_html(l)))
-        .unwrap_or_default();
-
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    let accent_color = el.background_color.as_deref().unwrap_or("#3b82f6");
-    let cursor_style = el.cursor.as_deref().unwrap_or("pointer");
-    let input_style = format!(
-        "width: 18px; height: 18px; accent-color: {}; cursor: {}",
-        accent_color,
-        cursor_style
-    );
-
-    format!(
-        "<label id=\"{}\"{}{}style=\"display: flex; align-items: center; cursor: {}\"{}><input type=\"checkbox\" style=\"{}\"{}{}/>{}</label>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        cursor_style,
-        event_attrs,
-        input_style,
-        checked_attr,
-        onchange_attr,
-        label_html
-    )
+/// Append `s` to `out` with HTML special characters escaped, in one pass
+fn escape_into(out: &mut String, s: &str) {
+    let mut start = 0;
+    for (i, b) in s.bytes().enumerate() {
+        let entity = match b {
+            b'&' => "&amp;",
+            b'<' => "&lt;",
+            b'>' => "&gt;",
+            b'"' => "&quot;",
+            b'\'' => "&#39;",
+            _ => continue,
+        };
+        out.push_str(&s[start..i]);
+        out.push_str(entity);
+        start = i + 1;
+    }
+    out.push_str(&s[start..]);
 }
 
-fn render_radio(el: &ElementDef) -> String {
-    let checked_attr = if el.checked.unwrap_or(false) { " checked" } else { "" };
-
-    let name_attr = el.radio_group.as_ref()
-        .map(|g| format!(" name=\"{}\"", escape_html(g)))
-        .unwrap_or_default();
-
-    let value_attr = el.value.as_ref()
-        .map(|v| format!(" value=\"{}\"", escape_html(v)))
-        .unwrap_or_default();
-
-    let onchange_attr = if let Some(ref cb_id) = el.on_change {
-        format!(" onchange=\"handleChange('{}', this.value)\"", escape_html(cb_id))
-    } else {
-        String::new()
-    };
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use std::alloc::{GlobalAlloc, Layout, System};
+    use std::cell::Cell;
 
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
+    /// Counts the allocations made on each thread, so tests can measure their own
+    struct CountingAlloc;
 
-    let label_html = el.label.as_ref()
-        .map(|l| format!("<span style=\"margin-left: 8px\">{}</span>", escape_html(l)))
-        .unwrap_or_default();
+    thread_local! {
+        static ALLOCATIONS: Cell<usize> = const { Cell::new(0) };
+    }
 
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    let accent_color = el.background_color.as_deref().unwrap_or("#3b82f6");
-    let cursor_style = el.cursor.as_deref().unwrap_or("pointer");
-    let input_style = format!(
-        "width: 18px; height: 18px; accent-color: {}; cursor: {}",
-        accent_color,
-        cursor_style
-    );
-
-    format!(
-        "<label id=\"{}\"{}{}style=\"display: flex; align-items: center; cursor: {}\"{}><input type=\"radio\" style=\"{}\"{}{}{}{}/>{}</label>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        cursor_style,
-        event_attrs,
-        input_style,
-        name_attr,
-        value_attr,
-        checked_attr,
-        onchange_attr,
-        label_html
-    )
-}
+    unsafe impl GlobalAlloc for CountingAlloc {
+        unsafe fn alloc(&self, layout: Layout) -> *mut u8 {
+            let _ = ALLOCATIONS.try_with(|n| n.set(n.get() + 1));
+            unsafe { System.alloc(layout) }
+        }
 
-fn render_select(el: &ElementDef) -> String {
-    let mut styles = vec![
-        "padding: 8px 12px".to_string(),
-        "font-size: 14px".to_string(),
-        "cursor: pointer".to_string(),
-        "outline: none".to_string(),
-    ];
+        unsafe fn dealloc(&self, ptr: *mut u8, layout: Layout) {
+            unsafe { System.dealloc(ptr, layout) }
+        }
 
-    if let Some(w) = el.width {
-        styles.push(format!("width: {}px", w));
-    }
-    if let Some(ref bg) = el.background_color {
-        styles.retain(|s| !s.starts_with("background:"));
-        styles.push(format!("background: {}", bg));
-    }
-    if let Some(ref tc) = el.text_color {
-        styles.retain(|s| !s.starts_with("color:"));
-        styles.push(format!("color: {}", tc));
-    }
-    if let Some(br) = el.border_radius {
-        styles.retain(|s| !s.starts_with("border-radius:"));
-        styles.push(format!("border-radius: {}px", br));
-    }
-    if let Some(bw) = el.border_width {
-        let bc = el.border_color.as_deref().unwrap_or("#333");
-        styles.push(format!("border: {}px solid {}", bw, bc));
-    }
-    if let Some(ref cursor) = el.cursor {
-        styles.retain(|s| !s.starts_with("cursor:"));
-        styles.push(format!("cursor: {}", cursor));
-    }
-    if let Some(ref transition) = el.transition {
-        styles.push(format!("transition: {}", transition));
+        unsafe fn realloc(&self, ptr: *mut u8, layout: Layout, new_size: usize) -> *mut u8 {
+            let _ = ALLOCATIONS.try_with(|n| n.set(n.get() + 1));
+            unsafe { System.realloc(ptr, layout, new_size) }
+        }
     }
 
-    if let Some(ref raw) = el.style {
-        styles.push(raw.clone());
+    #[global_allocator]
+    static GLOBAL: CountingAlloc = CountingAlloc;
+
+    /// Allocations made on this thread while running `f`
+    fn allocations<T>(f: impl FnOnce() -> T) -> (T, usize) {
+        let before = ALLOCATIONS.with(|n| n.get());
+        let result = f();
+        (result, ALLOCATIONS.with(|n| n.get()) - before)
+    }
+
+    /// A table of `rows` styled rows with four cells each
+    fn table(rows: usize) -> ElementDef {
+        let rows = (0..rows)
+            .map(|r| {
+                let cells = (0..4)
+                    .map(|c| {
+                        let mut cell = text(&format!("cell {} & {}", r, c));
+                        cell.text_color = Some("#1e293b".into());
+                        cell.font_size = Some(13.0);
+                        cell
+                    })
+                    .collect();
+                let mut row = div(cells);
+                row.flex_direction = Some("row".into());
+                row.padding = Some(4.0);
+                row.key = Some(format!("row-{}", r));
+                row
+            })
+            .collect();
+        let mut tree = div(rows);
+        assign_stable_ids(&mut tree, "r");
+        tree
+    }
+
+    fn text(content: &str) -> ElementDef {
+        let mut el = ElementDef::default();
+        el.element_type = "text".to_string();
+        el.text_content = Some(content.to_string());
+        el
+    }
+
+    fn div(children: Vec<ElementDef>) -> ElementDef {
+        let mut el = ElementDef::default();
+        el.children = children;
+        el
+    }
+
+    fn find<'a>(node: &'a mut ElementDef, id: &str) -> Option<&'a mut ElementDef> {
+        if node.id == id {
+            return Some(node);
+        }
+        node.children.iter_mut().find_map(|c| find(c, id))
+    }
+
+    fn render_element(el: &ElementDef, sheet: &mut StyleSheet) -> String {
+        let mut writer = HtmlWriter::new(sheet, 0);
+        let mut budget = usize::MAX;
+        writer.element(el, &mut budget, &mut Vec::new());
+        writer.out
+    }
+
+    fn count(node: &ElementDef) -> usize {
+        1 + node.children.iter().map(count).sum::<usize>()
+    }
+
+    #[test]
+    fn test_streamed_chunks_rebuild_the_tree() {
+        let rows = (0..30)
+            .map(|i| div(vec![text(&i.to_string()), div(vec![text("a"), text("b")])]))
+            .collect();
+        let mut tree = div(vec![div(rows), text("footer")]);
+        assign_stable_ids(&mut tree, "r");
+
+        let streamed = render_tree_streamed(&tree, 25, &mut StyleSheet::default());
+        assert!(streamed.html.contains("data-wry-id=\"r-0-4-1\""));
+        assert!(!streamed.html.contains("data-wry-id=\"r-0-4-1-0\""));
+        assert!(!streamed.html.contains("footer"));
+        assert_eq!(streamed.chunks.len(), (count(&tree) + 24) / 25 - 1);
+
+        // Replaying the inserts onto the first chunk gives back the whole tree
+        let mut budget = 25;
+        let mut rebuilt = take_prefix(tree.clone(), &mut budget, &mut Vec::new());
+        for chunk in &streamed.chunks {
+            let message: serde_json::Value = serde_json::from_str(chunk).unwrap();
+            let ops = message["ops"].as_array().unwrap();
+            assert!(ops.iter().map(|op| count_json(&op["node"])).sum::<usize>() <= 25);
+            for op in ops {
+                assert_eq!(op["op"], "insert");
+                assert!(op["before"].is_null());
+                let node: ElementDef = serde_json::from_value(op["node"].clone()).unwrap();
+                let parent = find(&mut rebuilt, op["parent"].as_str().unwrap()).unwrap();
+                parent.children.push(node);
+            }
+        }
+        assert_eq!(rebuilt, tree);
+    }
+
+    #[test]
+    fn test_streamed_images_resolve_like_the_first_chunk() {
+        let path = std::env::temp_dir().join(format!("wry-renderer-{}.png", std::process::id()));
+        std::fs::write(&path, b"png").unwrap();
+        let src = path.to_string_lossy().to_string();
+        let mut image = ElementDef::default();
+        image.element_type = "image".to_string();
+        image.text_content = Some(src.clone());
+        image.style = Some(format!("background: url('{}')", src));
+        let mut tree = div(vec![image; 4]);
+        assign_stable_ids(&mut tree, "r");
+
+        let streamed = render_tree_streamed(&tree, 2, &mut StyleSheet::default());
+        let url = resolve_local_asset(&src);
+        assert!(url.starts_with("file:///"));
+        assert!(streamed.html.contains(&format!("src=\"{}\"", url)));
+        assert_eq!(streamed.chunks.len(), 2);
+        for chunk in &streamed.chunks {
+            let message: serde_json::Value = serde_json::from_str(chunk).unwrap();
+            let node = &message["ops"][0]["node"];
+            assert_eq!(node["text_content"], url.as_str());
+        }
+        assert!(streamed.css.contains(&format!("url(\"{}\")", url)));
+        std::fs::remove_file(&path).unwrap();
+    }
+
+    fn count_json(node: &serde_json::Value) -> usize {
+        let children = node["children"].as_array().map_or(0, |c| c.iter().map(count_json).sum());
+        1 + children
+    }
+
+    #[test]
+    fn test_small_trees_are_not_streamed() {
+        let mut tree = div(vec![text("a"), text("b")]);
+        assign_stable_ids(&mut tree, "r");
+        let streamed = render_tree_streamed(&tree, 1000, &mut StyleSheet::default());
+        assert_eq!(
+            streamed.html,
+            render_element(&tree, &mut StyleSheet::default())
+        );
+        assert!(streamed.chunks.is_empty());
+    }
+
+    #[test]
+    fn test_repeated_styles_share_a_class() {
+        let rows = (0..3)
+            .map(|i| {
+                let mut row = text(&i.to_string());
+                row.padding = Some(8.0);
+                row
+            })
+            .collect();
+        let mut tree = div(rows);
+        assign_stable_ids(&mut tree, "r");
+
+        let mut sheet = StyleSheet::default();
+        let streamed = render_tree_streamed(&tree, 2, &mut sheet);
+        assert!(!streamed.html.contains("style="));
+        let class = sheet.class_for("padding: 8px").unwrap();
+        assert_eq!(streamed.html.matches(class.as_str()).count(), 1);
+        assert_eq!(streamed.css, format!(".{} {{ padding: 8px }}", class));
+
+        // Streamed rows carry the class instead of the property
+        assert!(streamed.chunks[0].contains(&format!("\"style_class\":\"{}\"", class)));
+        assert!(!streamed.chunks[0].contains("padding"));
+    }
+
+    #[test]
+    fn test_virtual_list_rows_are_placed_by_index() {
+        let mut row = text("row 7");
+        row.row_index = Some(7);
+        row.row_height = Some(24.0);
+        let mut list = div(vec![row]);
+        list.element_type = "virtual_list".to_string();
+        list.row_count = Some(1000);
+        list.row_height = Some(24.0);
+        list.render_row = Some("r:render_row".to_string());
+        assign_stable_ids(&mut list, "r");
+
+        let html = render_element(&list, &mut StyleSheet::default());
+        assert!(html.contains("class=\"wry-vlist\""));
+        assert!(html.contains("data-wry-rows=\"r:render_row\" style=\"--wry-list-height: 24000px\""));
+        assert!(html.contains("data-wry-id=\"r-0\" style=\"top: 168px; height: 24px\""));
+    }
+
+    #[test]
+    fn test_escaping_matches_entities() {
+        let mut out = String::from("x");
+        escape_into(&mut out, "a<b>&\"c\" 'd' é");
+        assert_eq!(out, "xa&lt;b&gt;&amp;&quot;c&quot; &#39;d&#39; é");
+    }
+
+    #[test]
+    fn test_reassigning_ids_reuses_them() {
+        let mut tree = table(100);
+        let ((), count) = allocations(|| assign_stable_ids(&mut tree, "r"));
+        // Just the path buffer, since every node already has a long enough ID
+        assert!(count <= 2, "{} allocations", count);
+        assert_eq!(tree.children[3].id, "r-krow_2d_3");
+        assert_eq!(tree.children[3].children[1].id, "r-krow_2d_3-1");
+    }
+
+    #[test]
+    fn test_rendering_allocates_per_page_not_per_node() {
+        let tree = table(1000);
+        let mut sheet = StyleSheet::default();
+        render_tree_streamed(&tree, usize::MAX, &mut sheet);
+
+        // Once the styles have their classes, the HTML buffer is about all that's allocated
+        let (render, count) = allocations(|| render_tree_streamed(&tree, usize::MAX, &mut sheet));
+        assert!(count < 10, "{} allocations for {} nodes", count, count_nodes(&tree, usize::MAX));
+        assert_eq!(render.html, render_element(&tree, &mut StyleSheet::default()));
+    }
+
+    /// HTML throughput and allocations per node for a 5000-row table (25k nodes).
+    /// Run with `cargo test --release bench_render_html -- --ignored --nocapture`.
+    #[test]
+    #[ignore]
+    fn bench_render_html() {
+        use std::time::Instant;
+
+        let tree = table(5000);
+        let nodes = count_nodes(&tree, usize::MAX);
+
+        let mut sheet = StyleSheet::default();
+        let start = Instant::now();
+        let (render, cold) = allocations(|| render_tree_streamed(&tree, usize::MAX, &mut sheet));
+        let cold_time = start.elapsed();
+
+        let runs = 20;
+        let start = Instant::now();
+        let (bytes, warm) = allocations(|| {
+            (0..runs)
+                .map(|_| render_tree_streamed(&tree, usize::MAX, &mut sheet).html.len())
+                .sum::<usize>()
+        });
+        let warm_time = start.elapsed();
+
+        let ((), ids) = allocations(|| {
+            let mut tree = tree.clone();
+            let start = Instant::now();
+            assign_stable_ids(&mut tree, "r");
+            println!("reassign ids:  {:?}", start.elapsed());
+        });
+
+        println!(
+            "first render:  {} bytes in {:?}, {:.2} allocations/node",
+            render.html.len(),
+            cold_time,
+            cold as f64 / nodes as f64
+        );
+        println!(
+            "warm renders:  {:.1} MB/s, {:.3} allocations/node",
+            bytes as f64 / warm_time.as_secs_f64() / 1e6,
+            warm as f64 / (runs * nodes) as f64
+        );
+        println!("ids + clone:   {:.2} allocations/node", ids as f64 / nodes as f64);
     }
-
-    let style_attr = format!(" style=\"{}\"", styles.join("; "));
-
-    let onchange_attr = if let Some(ref cb_id) = el.on_change {
-        format!(" onchange=\"handleChange('{}', this.value)\"", escape_html(cb_id))
-    } else {
-        String::new()
-    };
-
-    let event_attrs = build_event_attrs(el);
-    let data_id_attr = build_data_id_attr(el);
-
-    let options_html: String = el.options.iter().map(|opt| {
-        let selected = el.selected.as_ref().map(|s| s == &opt.value).unwrap_or(false);
-        let selected_attr = if selected { " selected" } else { "" };
-        format!(
-            "<option value=\"{}\"{}>{}</option>",
-            escape_html(&opt.value),
-            selected_attr,
-            escape_html(&opt.label)
-        )
-    }).collect();
-
-    let class_attr = if el.class_names.is_empty() {
-        String::new()
-    } else {
-        format!(" class=\"{}\"", el.class_names.join(" "))
-    };
-
-    format!(
-        "<select id=\"{}\"{}{}{}{}{}>{}</select>",
-        escape_html(get_element_id(el)),
-        data_id_attr,
-        class_attr,
-        style_attr,
-        onchange_attr,
-        event_attrs,
-        options_html
-    )
 }
-
-fn escape_html(s: &str) -> String {
-    s.replace('&', "&amp;")
-        .replace('<', "&lt;")
-        .replace('>', "&gt;")
-        .replace('"', "&quot;")
-        .replace('\'', "&#39;")
-}
\ No newline at end of file
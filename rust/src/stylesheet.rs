@@ -0,0 +1,538 @@
+use crate::elements::ElementDef;
+use crate::intern::Interned;
+use std::borrow::Cow;
+use std::collections::{HashMap, HashSet};
+use std::fmt::Write;
+use std::hash::{DefaultHasher, Hash, Hasher};
+
+/// Distinct styles a window collects before it starts over with an empty stylesheet
+pub const MAX_STYLE_CLASSES: usize = 10_000;
+
+/// Shared classes for node styles, so a style used by many nodes is declared once.
+///
+/// A class is named after a hash of its declarations, so the same style always gets the
+/// same class, whichever page or reset it was registered in. Rules for new classes pile
+/// up until taken and sent to the page.
+#[derive(Default)]
+pub struct StyleSheet {
+    classes: HashMap<String, Interned>, // By declaration block
+    names: HashSet<Interned>,
+    new_rules: Vec<String>,
+}
+
+impl StyleSheet {
+    /// The class for a declaration block, registering a rule for it if it's new.
+    /// Returns None for an empty block.
+    pub fn class_for(&mut self, css: &str) -> Option<Interned> {
+        if css.is_empty() {
+            return None;
+        }
+        if let Some(class) = self.classes.get(css) {
+            return Some(class.clone());
+        }
+
+        // A style whose hash is already taken by another one gets the next free name
+        let hash = style_hash(css);
+        let mut class = Interned::from(format!("ws{:016x}", hash));
+        let mut n = 1;
+        while self.names.contains(&class) {
+            class = Interned::from(format!("ws{:016x}-{}", hash, n));
+            n += 1;
+        }
+        self.new_rules.push(format!(".{} {{ {} }}", class, contain_declarations(css)));
+        self.names.insert(class.clone());
+        self.classes.insert(css.to_string(), class.clone());
+        Some(class)
+    }
+
+    /// Give every node of a subtree its style class, dropping the properties the class
+    /// replaces so they aren't sent to the page as well. Hover/focus properties are
+    /// dropped too, since the page gets those as rules of their own.
+    pub fn classify(&mut self, node: &mut ElementDef) {
+        node.style_class = self.class_for(&node_style(node));
+        strip_style(node);
+        for child in node.children.iter_mut() {
+            self.classify(child);
+        }
+    }
+
+    /// Rules registered since the last call, in registration order
+    pub fn take_rules(&mut self) -> Vec<String> {
+        std::mem::take(&mut self.new_rules)
+    }
+
+    /// Number of classes registered
+    pub fn len(&self) -> usize {
+        self.classes.len()
+    }
+}
+
+fn style_hash(css: &str) -> u64 {
+    let mut hasher = DefaultHasher::new();
+    css.hash(&mut hasher);
+    hasher.finish()
+}
+
+/// A declaration block made safe to put between the braces of a rule.
+///
+/// Text that would end the rule early or swallow its closing brace (a brace, or a string,
+/// comment or bracket left open) has its syntax characters escaped. The declarations
+/// involved become invalid and the page drops just those. "</" is escaped in any case,
+/// since the rule may sit inside a <style> element.
+pub fn contain_declarations(css: &str) -> Cow<'_, str> {
+    if !is_contained(css) {
+        let mut out = String::with_capacity(css.len() + 16);
+        for c in css.chars() {
+            match c {
+                '{' | '}' | '(' | ')' | '[' | ']' | '"' | '\'' | '\\' | '/' | '<' => {
+                    let _ = write!(out, "\\{:x} ", c as u32);
+                }
+                _ => out.push(c),
+            }
+        }
+        Cow::Owned(out)
+    } else if css.contains("</") {
+        Cow::Owned(css.replace("</", "<\\/"))
+    } else {
+        Cow::Borrowed(css)
+    }
+}
+
+/// Whether every string, comment and bracket in `css` is closed and it has no braces
+fn is_contained(css: &str) -> bool {
+    let mut closers = Vec::new();
+    let mut chars = css.chars();
+    while let Some(c) = chars.next() {
+        match c {
+            '\\' => {
+                if chars.next().is_none() {
+                    return false;
+                }
+            }
+            '"' | '\'' => loop {
+                match chars.next() {
+                    None | Some('\n' | '\r' | '\x0c') => return false,
+                    Some('\\') => {
+                        if chars.next().is_none() {
+                            return false;
+                        }
+                    }
+                    Some(q) if q == c => break,
+                    Some(_) => {}
+                }
+            },
+            '/' if chars.as_str().starts_with('*') => match chars.as_str()[1..].find("*/") {
+                Some(end) => chars = chars.as_str()[end + 3..].chars(),
+                None => return false,
+            },
+            '(' => closers.push(')'),
+            '[' => closers.push(']'),
+            ')' | ']' => {
+                if closers.pop() != Some(c) {
+                    return false;
+                }
+            }
+            '{' | '}' => return false,
+            _ => {}
+        }
+    }
+    closers.is_empty()
+}
+
+/// Some non-empty value
+fn set(value: &Option<Interned>) -> Option<&str> {
+    value.as_deref().filter(|v| !v.is_empty())
+}
+
+fn px(value: f32) -> String {
+    format!("{}px", value)
+}
+
+/// The style of a node as patched into the page: element-type defaults, then the
+/// properties every element shares, in a fixed order.
+pub fn node_style(t: &ElementDef) -> String {
+    let mut s: Vec<String> = Vec::new();
+
+    match t.element_type.as_str() {
+        "button" => {
+            s.push(format!("cursor: {}", set(&t.cursor).unwrap_or("pointer")));
+            s.push(match t.border_width {
+                Some(w) => format!("border: {}px solid {}", w, set(&t.border_color).unwrap_or("#333")),
+                None => "border: none".to_string(),
+            });
+            s.push("outline: none".to_string());
+            s.push(format!("font-size: {}", t.font_size.map_or("14px".to_string(), px)));
+            s.push(format!("background: {}", set(&t.background_color).unwrap_or("#3b82f6")));
+            s.push(format!("color: {}", set(&t.text_color).unwrap_or("white")));
+            s.push(format!("border-radius: {}", t.border_radius.map_or("6px".to_string(), px)));
+            s.push(format!("padding: {}", t.padding.map_or("8px 16px".to_string(), px)));
+        }
+        "input" => {
+            s.push("outline: none".to_string());
+            s.push(format!("padding: {}", t.padding.map_or("8px 12px".to_string(), px)));
+            s.push(match t.border_width {
+                Some(w) => format!("border: {}px solid {}", w, set(&t.border_color).unwrap_or("#555")),
+                None => "border: 1px solid #555".to_string(),
+            });
+            s.push(format!("border-radius: {}", t.border_radius.map_or("4px".to_string(), px)));
+            s.push(format!("background: {}", set(&t.background_color).unwrap_or("#2a2a3a")));
+            s.push(format!("color: {}", set(&t.text_color).unwrap_or("white")));
+            s.push(format!("font-size: {}", t.font_size.map_or("14px".to_string(), px)));
+            if let Some(cursor) = set(&t.cursor) {
+                s.push(format!("cursor: {}", cursor));
+            }
+        }
+        "select" => {
+            s.push("outline: none".to_string());
+            s.push(format!("padding: {}", t.padding.map_or("8px 12px".to_string(), px)));
+            s.push(format!("font-size: {}", t.font_size.map_or("14px".to_string(), px)));
+            s.push(format!("cursor: {}", set(&t.cursor).unwrap_or("pointer")));
+            if let Some(bg) = set(&t.background_color) {
+                s.push(format!("background: {}", bg));
+            }
+            if let Some(color) = set(&t.text_color) {
+                s.push(format!("color: {}", color));
+            }
+            if let Some(br) = t.border_radius {
+                s.push(format!("border-radius: {}px", br));
+            }
+            if let Some(w) = t.border_width {
+                s.push(format!("border: {}px solid {}", w, set(&t.border_color).unwrap_or("#333")));
+            }
+        }
+        _ => {
+            if t.size_full {
+                s.push("width: 100%".to_string());
+                s.push("height: 100%".to_string());
+            }
+            if let Some(bg) = set(&t.background_color) {
+                s.push(format!("background-color: {}", bg));
+            }
+            if let Some(color) = set(&t.text_color) {
+                s.push(format!("color: {}", color));
+            }
+            if let Some(br) = t.border_radius {
+                s.push(format!("border-radius: {}px", br));
+            }
+            if let (Some(w), Some(color)) = (t.border_width, set(&t.border_color)) {
+                s.push(format!("border: {}px solid {}", w, color));
+            }
+            if let Some(p) = t.padding {
+                s.push(format!("padding: {}px", p));
+            }
+            if let Some(size) = t.font_size {
+                s.push(format!("font-size: {}px", size));
+            }
+            if let Some(cursor) = set(&t.cursor) {
+                s.push(format!("cursor: {}", cursor));
+            }
+        }
+    }
+
+    let lengths = [
+        ("width", t.width),
+        ("height", t.height),
+        ("min-width", t.min_width),
+        ("max-width", t.max_width),
+        ("min-height", t.min_height),
+        ("max-height", t.max_height),
+    ];
+    for (name, value) in lengths {
+        if let Some(v) = value {
+            s.push(format!("{}: {}px", name, v));
+        }
+    }
+    if let Some(direction) = set(&t.flex_direction) {
+        s.push(format!("display: flex; flex-direction: {}", direction));
+    }
+    if let Some(v) = set(&t.align_items) {
+        s.push(format!("align-items: {}", v));
+    }
+    if let Some(v) = set(&t.justify_content) {
+        s.push(format!("justify-content: {}", v));
+    }
+    if let Some(v) = t.gap {
+        s.push(format!("gap: {}px", v));
+    }
+    if let Some(v) = set(&t.flex_wrap) {
+        s.push(format!("flex-wrap: {}", v));
+    }
+    if let Some(v) = t.flex_grow {
+        s.push(format!("flex-grow: {}", v));
+    }
+    if let Some(v) = t.flex_shrink {
+        s.push(format!("flex-shrink: {}", v));
+    }
+    if let Some(v) = set(&t.flex_basis) {
+        s.push(format!("flex-basis: {}", v));
+    }
+    if let Some(v) = set(&t.align_self) {
+        s.push(format!("align-self: {}", v));
+    }
+    if t.display_grid {
+        s.push("display: grid".to_string());
+    }
+    let grid = [
+        ("grid-template-columns", &t.grid_template_columns),
+        ("grid-template-rows", &t.grid_template_rows),
+        ("grid-column", &t.grid_column),
+        ("grid-row", &t.grid_row),
+        ("place-items", &t.place_items),
+    ];
+    for (name, value) in grid {
+        if let Some(v) = set(value) {
+            s.push(format!("{}: {}", name, v));
+        }
+    }
+    let spacing = [
+        ("padding-top", t.padding_top),
+        ("padding-right", t.padding_right),
+        ("padding-bottom", t.padding_bottom),
+        ("padding-left", t.padding_left),
+        ("margin", t.margin),
+        ("margin-top", t.margin_top),
+        ("margin-right", t.margin_right),
+        ("margin-bottom", t.margin_bottom),
+        ("margin-left", t.margin_left),
+        ("border-top-left-radius", t.border_radius_top_left),
+        ("border-top-right-radius", t.border_radius_top_right),
+        ("border-bottom-right-radius", t.border_radius_bottom_right),
+        ("border-bottom-left-radius", t.border_radius_bottom_left),
+    ];
+    for (name, value) in spacing {
+        if let Some(v) = value {
+            s.push(format!("{}: {}px", name, v));
+        }
+    }
+    let sides = [
+        ("border-top", t.border_width_top, &t.border_color_top),
+        ("border-right", t.border_width_right, &t.border_color_right),
+        ("border-bottom", t.border_width_bottom, &t.border_color_bottom),
+        ("border-left", t.border_width_left, &t.border_color_left),
+    ];
+    for (name, width, color) in sides {
+        if let Some(w) = width {
+            let color = set(color).or(set(&t.border_color)).unwrap_or("#333");
+            s.push(format!("{}: {}px solid {}", name, w, color));
+        }
+    }
+    let keywords = [
+        ("overflow", &t.overflow),
+        ("text-align", &t.text_align),
+        ("word-wrap", &t.word_wrap),
+        ("position", &t.position),
+    ];
+    for (name, value) in keywords {
+        if let Some(v) = set(value) {
+            s.push(format!("{}: {}", name, v));
+        }
+    }
+    let offsets = [("top", t.top), ("right", t.right), ("bottom", t.bottom), ("left", t.left)];
+    for (name, value) in offsets {
+        if let Some(v) = value {
+            s.push(format!("{}: {}px", name, v));
+        }
+    }
+    if let Some(v) = set(&t.font_weight) {
+        s.push(format!("font-weight: {}", v));
+    }
+    if let Some(v) = set(&t.transition) {
+        s.push(format!("transition: {}", v));
+    }
+    if let Some(v) = t.opacity {
+        s.push(format!("opacity: {}", v));
+    }
+    if let Some(v) = set(&t.object_fit) {
+        s.push(format!("object-fit: {}", v));
+    }
+    if let Some(raw) = t.style.as_deref().filter(|v| !v.is_empty()) {
+        s.push(raw.to_string());
+    }
+    s.join("; ")
+}
+
+/// Clear every property node_style() and the hover/focus rules read
+fn strip_style(t: &mut ElementDef) {
+    t.width = None;
+    t.height = None;
+    t.min_width = None;
+    t.max_width = None;
+    t.min_height = None;
+    t.max_height = None;
+    t.flex_direction = None;
+    t.align_items = None;
+    t.justify_content = None;
+    t.gap = None;
+    t.flex_wrap = None;
+    t.flex_grow = None;
+    t.flex_shrink = None;
+    t.flex_basis = None;
+    t.align_self = None;
+    t.display_grid = false;
+    t.grid_template_columns = None;
+    t.grid_template_rows = None;
+    t.grid_column = None;
+    t.grid_row = None;
+    t.place_items = None;
+    t.padding = None;
+    t.padding_top = None;
+    t.padding_right = None;
+    t.padding_bottom = None;
+    t.padding_left = None;
+    t.margin = None;
+    t.margin_top = None;
+    t.margin_right = None;
+    t.margin_bottom = None;
+    t.margin_left = None;
+    t.size_full = false;
+    t.background_color = None;
+    t.text_color = None;
+    t.border_radius = None;
+    t.border_radius_top_left = None;
+    t.border_radius_top_right = None;
+    t.border_radius_bottom_right = None;
+    t.border_radius_bottom_left = None;
+    t.border_width = None;
+    t.border_width_top = None;
+    t.border_width_right = None;
+    t.border_width_bottom = None;
+    t.border_width_left = None;
+    t.border_color = None;
+    t.border_color_top = None;
+    t.border_color_right = None;
+    t.border_color_bottom = None;
+    t.border_color_left = None;
+    t.overflow = None;
+    t.text_align = None;
+    t.word_wrap = None;
+    t.position = None;
+    t.top = None;
+    t.right = None;
+    t.bottom = None;
+    t.left = None;
+    t.font_size = None;
+    t.font_weight = None;
+    t.transition = None;
+    t.opacity = None;
+    t.cursor = None;
+    t.style = None;
+    t.object_fit = None;
+    t.hover_bg = None;
+    t.hover_text_color = None;
+    t.hover_border_color = None;
+    t.hover_opacity = None;
+    t.hover_scale = None;
+    t.focus_bg = None;
+    t.focus_text_color = None;
+    t.focus_border_color = None;
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn row(color: &str) -> ElementDef {
+        let mut el = ElementDef::default();
+        el.flex_direction = Some("row".into());
+        el.padding = Some(8.0);
+        el.background_color = Some(color.into());
+        el.border_width = Some(1.0);
+        el.border_color = Some("#333".into());
+        el
+    }
+
+    #[test]
+    fn test_node_style_matches_page_defaults() {
+        let mut button = ElementDef::default();
+        button.element_type = "button".to_string();
+        button.padding = Some(4.0);
+        button.opacity = Some(0.5);
+        assert_eq!(
+            node_style(&button),
+            "cursor: pointer; border: none; outline: none; font-size: 14px; \
+             background: #3b82f6; color: white; border-radius: 6px; padding: 4px; opacity: 0.5"
+        );
+        assert_eq!(
+            node_style(&row("#111")),
+            "background-color: #111; border: 1px solid #333; padding: 8px; \
+             display: flex; flex-direction: row"
+        );
+        assert_eq!(node_style(&ElementDef::default()), "");
+    }
+
+    #[test]
+    fn test_identical_styles_share_one_rule() {
+        let mut sheet = StyleSheet::default();
+        let mut root = ElementDef::default();
+        root.children = vec![row("#111"), row("#111"), row("#222")];
+        sheet.classify(&mut root);
+
+        assert_eq!(root.style_class, None);
+        let classes: Vec<_> = root.children.iter().map(|c| c.style_class.clone().unwrap()).collect();
+        assert_eq!(classes[0], classes[1]);
+        assert_ne!(classes[0], classes[2]);
+        let rules = sheet.take_rules();
+        assert_eq!(rules.len(), 2);
+        assert!(rules[0].starts_with(&format!(".{} {{ background-color: #111;", classes[0])));
+        assert!(sheet.take_rules().is_empty());
+
+        // Known styles get their class without registering anything
+        let mut again = row("#222");
+        sheet.classify(&mut again);
+        assert_eq!(again.style_class.as_ref(), Some(&classes[2]));
+        assert!(sheet.take_rules().is_empty());
+        assert_eq!(sheet.len(), 2);
+    }
+
+    #[test]
+    fn test_classified_nodes_serialize_smaller() {
+        let mut node = row("#111");
+        let before = serde_json::to_string(&node).unwrap();
+        StyleSheet::default().classify(&mut node);
+        let after = serde_json::to_string(&node).unwrap();
+        assert!(after.contains("\"style_class\":\"ws"));
+        assert!(!after.contains("background_color"));
+        assert!(after.len() < before.len());
+    }
+
+    #[test]
+    fn test_rules_cannot_close_a_style_element() {
+        let mut sheet = StyleSheet::default();
+        sheet.class_for("content: '</style>'");
+        assert!(!sheet.take_rules()[0].contains("</"));
+    }
+
+    #[test]
+    fn test_raw_styles_cannot_leave_their_rule() {
+        let mut sheet = StyleSheet::default();
+        let class = sheet.class_for("color: red } body { display: none").unwrap();
+        let rule = sheet.take_rules().remove(0);
+        assert_eq!(rule.matches('{').count(), 1);
+        assert!(rule.starts_with(&format!(".{} {{ color: red \\7d  body \\7b ", class)));
+        assert!(rule.ends_with(" }"));
+
+        // Strings, comments and brackets left open would swallow the closing brace
+        for css in ["content: 'x", "width: calc(1px", "color: red /* x", "background: url(a\\"] {
+            assert!(!is_contained(css), "{}", css);
+            assert!(!contain_declarations(css).contains(['(', '\'', '/']), "{}", css);
+        }
+
+        // Valid declarations pass through untouched
+        let valid = "font-family: 'a}b', serif; background: url(\"x.png\") /* { */; width: calc((1px + 2px))";
+        assert!(is_contained(valid));
+        assert_eq!(contain_declarations(valid), valid);
+    }
+
+    #[test]
+    fn test_hash_collisions_get_distinct_classes() {
+        let mut sheet = StyleSheet::default();
+        // Take the name "color: red" would get, as a colliding style would have
+        let taken = Interned::from(format!("ws{:016x}", style_hash("color: red")));
+        sheet.names.insert(taken.clone());
+
+        let class = sheet.class_for("color: red").unwrap();
+        assert_ne!(class, taken);
+        assert_eq!(sheet.class_for("color: red"), Some(class));
+        assert_eq!(sheet.take_rules().len(), 1);
+    }
+}
@@ -0,0 +1,192 @@
+use crate::elements::ElementDef;
+use crate::renderer::assign_stable_ids;
+use std::collections::HashMap;
+use std::ops::Range;
+
+/// Rows rendered beyond each edge of the viewport when a list doesn't set `overscan`
+pub const DEFAULT_OVERSCAN: usize = 10;
+
+/// The part of a virtual list the page shows, as last reported by the page
+#[derive(Clone, Copy, Debug, Default, PartialEq)]
+pub struct Viewport {
+    pub scroll_top: f64,
+    pub height: f64,
+}
+
+/// Rows of `list` to render for `viewport`: the visible ones plus the overscan.
+///
+/// A list the page hasn't reported on yet has an empty viewport at the top, so it starts
+/// out with just the overscan rows.
+pub fn visible_rows(list: &ElementDef, viewport: Viewport) -> Range<usize> {
+    let count = list.row_count.unwrap_or(0);
+    let row_height = f64::from(list.row_height.unwrap_or(0.0));
+    if count == 0 || !(row_height > 0.0) {
+        return 0..0;
+    }
+    let overscan = list.overscan.unwrap_or(DEFAULT_OVERSCAN);
+    let top = viewport.scroll_top.max(0.0);
+    let first = (top / row_height).floor() as usize;
+    let last = ((top + viewport.height.max(0.0)) / row_height).ceil() as usize;
+    let start = first.saturating_sub(overscan).min(count);
+    let end = last.saturating_add(overscan).min(count).max(start);
+    start..end
+}
+
+/// Rows in `rows` that `list` doesn't have rendered yet
+pub fn missing_rows(list: &ElementDef, rows: Range<usize>) -> Vec<usize> {
+    let rendered = rendered_rows(list);
+    rows.filter(|index| !rendered.contains_key(index)).collect()
+}
+
+/// Give `list` exactly the rows in `rows`, taking each from the rows it already has or
+/// from `rendered`. Returns false, leaving the list alone, if a row is in neither.
+///
+/// Row `i` goes in child slot `i % rows.len()`. Scrolling therefore only changes the slots
+/// of rows that left the window, and the page recycles their DOM nodes for the rows that
+/// took their place. The page positions rows by index, so slot order doesn't matter.
+pub fn place_rows(
+    list: &mut ElementDef,
+    rows: Range<usize>,
+    mut rendered: HashMap<usize, ElementDef>,
+) -> bool {
+    if missing_rows(list, rows.clone()).iter().any(|index| !rendered.contains_key(index)) {
+        return false;
+    }
+    let mut current: HashMap<usize, ElementDef> = std::mem::take(&mut list.children)
+        .into_iter()
+        .filter_map(|row| Some((row.row_index?, row)))
+        .collect();
+
+    let slots = rows.len();
+    let mut children: Vec<Option<ElementDef>> = vec![None; slots];
+    for index in rows {
+        let slot = index % slots;
+        let row = match (rendered.remove(&index), current.remove(&index)) {
+            (None, Some(row)) => row,
+            (fresh, _) => {
+                let mut row = fresh.unwrap_or_default();
+                // Slots are matched by position, so the row's own key would only get in the way
+                row.key = None;
+                row.row_index = Some(index);
+                row.row_height = list.row_height;
+                row
+            }
+        };
+        children[slot] = Some(row);
+    }
+    list.children = children.into_iter().flatten().collect();
+    list.cached_hash = None;
+    for (slot, row) in list.children.iter_mut().enumerate() {
+        let path = format!("{}-{}", list.id, slot);
+        if row.id != path {
+            assign_stable_ids(row, &path);
+        }
+    }
+    true
+}
+
+/// The rows a list has rendered, by index
+fn rendered_rows(list: &ElementDef) -> HashMap<usize, &ElementDef> {
+    list.children
+        .iter()
+        .filter_map(|row| Some((row.row_index?, row)))
+        .collect()
+}
+
+/// Find the node with stable ID `id`, only descending into subtrees whose IDs lead to it
+pub fn find_node<'a>(tree: &'a ElementDef, id: &str) -> Option<&'a ElementDef> {
+    if tree.id == id {
+        return Some(tree);
+    }
+    tree.children.iter().find(|child| leads_to(child, id)).and_then(|child| find_node(child, id))
+}
+
+/// Mutable version of find_node(). The caller may change the node, so the nodes on the
+/// way to it drop their content hashes.
+pub fn find_node_mut<'a>(tree: &'a mut ElementDef, id: &str) -> Option<&'a mut ElementDef> {
+    tree.cached_hash = None;
+    if tree.id == id {
+        return Some(tree);
+    }
+    tree.children.iter_mut().find(|child| leads_to(child, id)).and_then(|child| find_node_mut(child, id))
+}
+
+/// Whether `id` is the ID of `node` or of a node below it
+fn leads_to(node: &ElementDef, id: &str) -> bool {
+    id.strip_prefix(node.id.as_str()).is_some_and(|rest| rest.is_empty() || rest.starts_with('-'))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn list(row_count: usize) -> ElementDef {
+        let mut list = ElementDef::default();
+        list.element_type = "virtual_list".to_string();
+        list.row_count = Some(row_count);
+        list.row_height = Some(20.0);
+        list.overscan = Some(2);
+        assign_stable_ids(&mut list, "r");
+        list
+    }
+
+    fn row(index: usize) -> ElementDef {
+        let mut el = ElementDef::default();
+        el.element_type = "text".to_string();
+        el.text_content = Some(index.to_string());
+        el
+    }
+
+    fn render(list: &mut ElementDef, rows: Range<usize>) -> Vec<usize> {
+        let missing = missing_rows(list, rows.clone());
+        let rendered = missing.iter().map(|&i| (i, row(i))).collect();
+        assert!(place_rows(list, rows, rendered));
+        missing
+    }
+
+    #[test]
+    fn test_visible_rows_add_overscan() {
+        let list = list(1000);
+        assert_eq!(visible_rows(&list, Viewport::default()), 0..2);
+        let viewport = Viewport { scroll_top: 200.0, height: 100.0 };
+        assert_eq!(visible_rows(&list, viewport), 8..17);
+        let bottom = Viewport { scroll_top: 19_950.0, height: 100.0 };
+        assert_eq!(visible_rows(&list, bottom), 995..1000);
+        assert_eq!(visible_rows(&self::list(0), viewport), 0..0);
+    }
+
+    #[test]
+    fn test_scrolling_renders_only_new_rows() {
+        let mut list = list(100_000);
+        assert_eq!(render(&mut list, 0..10).len(), 10);
+        let before: Vec<String> = list.children.iter().map(|row| row.id.clone()).collect();
+
+        assert_eq!(render(&mut list, 3..13), vec![10, 11, 12]);
+        assert_eq!(list.children.len(), 10);
+        // Rows that stayed in view keep their slot, and new rows take over the slots freed
+        let after: Vec<String> = list.children.iter().map(|row| row.id.clone()).collect();
+        assert_eq!(before, after);
+        assert_eq!(list.children[0].row_index, Some(10));
+        assert_eq!(list.children[3].row_index, Some(3));
+        assert_eq!(list.children[0].text_content.as_deref(), Some("10"));
+    }
+
+    #[test]
+    fn test_missing_row_leaves_list_alone() {
+        let mut list = list(100);
+        render(&mut list, 0..5);
+        assert!(!place_rows(&mut list, 2..8, HashMap::new()));
+        assert_eq!(list.children.len(), 5);
+    }
+
+    #[test]
+    fn test_find_node_mut_follows_path() {
+        let mut tree = ElementDef::default();
+        tree.children = vec![ElementDef::default(), list(10)];
+        tree.children[1].children = vec![row(0)];
+        assign_stable_ids(&mut tree, "r");
+        assert_eq!(find_node_mut(&mut tree, "r-1-0").unwrap().text_content.as_deref(), Some("0"));
+        assert!(find_node_mut(&mut tree, "r-2").is_none());
+        assert_eq!(find_node(&tree, "r-1").unwrap().row_count, Some(10));
+    }
+}
@@ -1,11 +1,22 @@
-use crate::elements::Element;
-use crate::renderer::{render_to_html, render_to_json, render_to_json_partial};
-use parking_lot::Mutex;
+use crate::dispatch::{CallbackArgs, CallbackResolver, Dispatcher};
+use crate::diff::{diff_state_rules, diff_trees, find_by_user_id, splice_by_user_id, PatchMessage, PatchOp};
+use crate::elements::{pending_callback_count, Element, ElementDef};
+use crate::protocol::{self, Payloads, INLINE_PAYLOAD_LIMIT};
+use crate::renderer::{
+    assign_stable_ids, bind_callbacks, collect_state_rules, prepare_node, render_to_json, render_tree_streamed,
+    StateRules, StreamedRender,
+};
+use crate::stylesheet::{StyleSheet, MAX_STYLE_CLASSES};
+use crate::virtual_list::{find_node, find_node_mut, missing_rows, place_rows, visible_rows, Viewport};
+use parking_lot::{Condvar, Mutex};
 use pyo3::prelude::*;
-use std::collections::HashMap;
-use std::sync::Arc;
+use pyo3::types::{PyCFunction, PyDict, PyTuple};
+use std::collections::{HashMap, HashSet};
+use std::panic::{self, AssertUnwindSafe};
+use std::sync::{mpsc, Arc, OnceLock};
+use std::thread::{self, ThreadId};
+use std::time::{Duration, Instant};
 use wry::WebViewBuilder;
-use tao::event_loop::EventLoopProxy;
 
 #[cfg(target_os = "linux")]
 use {
@@ -17,37 +28,317 @@ use {
 #[cfg(not(target_os = "linux"))]
 use {
     tao::event::{Event, WindowEvent},
-    tao::event_loop::{ControlFlow, EventLoop, EventLoopBuilder},
+    tao::event_loop::{ControlFlow, EventLoop, EventLoopBuilder, EventLoopProxy},
     tao::window::WindowBuilder,
 };
 
+/// Wakes the event loop from Python threads.
+///
+/// tao's EventLoopProxy doesn't work with the GTK main loop, so Linux uses a glib channel.
+#[cfg(target_os = "linux")]
+type EventSender = gtk::glib::Sender<UserEvent>;
+#[cfg(not(target_os = "linux"))]
+type EventSender = EventLoopProxy<UserEvent>;
+
+#[cfg(target_os = "linux")]
+fn wake(sender: &EventSender, event: UserEvent) {
+    let _ = sender.send(event);
+}
+
+#[cfg(not(target_os = "linux"))]
+fn wake(sender: &EventSender, event: UserEvent) {
+    let _ = sender.send_event(event);
+}
+
 /// Custom events we can send to the event loop
 #[derive(Debug, Clone)]
 pub enum UserEvent {
-    PatchRoot(String),             // JSON content for DOM patching
-    PatchElement(String, String),  // (element_id, json) for partial update
+    Flush, // Apply everything in WebViewState::outbox
     SetTitle(String),
     Close,
 }
 
+/// A DOM update waiting in the outbox for the next flush
+#[derive(Debug, Clone, PartialEq)]
+enum DomUpdate {
+    PatchRoot(String),  // JSON content for DOM patching
+    ApplyPatch(String), // JSON patch op list from diffing against the committed tree
+    AddStyles(String),  // JSON list of rules for style classes new to the page
+    ResetStyles,        // Drop every style class rule from the page
+    StateRules(String), // JSON map of node ID -> hover/focus rules (null drops them)
+    Sync(u64),          // Ask the webview to acknowledge everything sent so far
+}
+
+impl DomUpdate {
+    /// The statement that applies this update. `payload` is given the update's JSON and
+    /// returns the expression the statement reads it from.
+    fn script(self, payload: &mut impl FnMut(String) -> String) -> String {
+        match self {
+            DomUpdate::PatchRoot(json) => format!("patchRoot({});", payload(json)),
+            DomUpdate::ApplyPatch(json) => format!("applyPatch({});", payload(json)),
+            DomUpdate::AddStyles(json) => format!("addStyleRules({});", payload(json)),
+            DomUpdate::ResetStyles => "resetStyleRules();".to_string(),
+            DomUpdate::StateRules(json) => format!("applyStateRules({});", payload(json)),
+            DomUpdate::Sync(seq) => format!("ackSync({});", seq),
+        }
+    }
+}
+
+/// Nodes in the first page when UiWindow isn't given `initial_nodes`
+const DEFAULT_INITIAL_NODES: usize = 1000;
+
 /// Shared state between Python and the webview
 struct WebViewState {
-    callbacks: HashMap<String, Py<PyAny>>,
-    pending_html: Option<String>,
+    callbacks: HashMap<String, Py<PyAny>>, // By minted ID; only those bound in `committed`
+    bindings: HashMap<String, String>,     // Stable callback ID in `committed` -> minted ID
+    callbacks_collected: usize,            // Callbacks dropped because their element went away
+    pending_page: Option<StreamedRender>, // Page to build the webview with, from set_root() before run()
+    initial_nodes: usize,                 // Nodes in the first page and in each streamed chunk after it
     pending_title: Option<String>,
-    pending_element_updates: Vec<(String, String)>, // (id, json) pairs
+    outbox: Vec<DomUpdate>, // Updates not yet handed to the webview
+    flush_scheduled: bool,  // A Flush event is on its way to the event loop
+    batch_depth: usize,     // Open UiWindow.batch() blocks; flushing waits until they close
     should_close: bool,
+    committed: Option<ElementDef>, // Last tree sent to the webview, with stable IDs
+    state_rules: StateRules,       // Hover/focus rules the page has, by node ID
+    styles: StyleSheet,            // Style classes the page has rules for
+    viewports: HashMap<String, Viewport>, // Last viewport the page reported for each virtual list
+    payloads: Arc<Mutex<Payloads>>, // Large update JSON, fetched by the page over the custom protocol
 }
 
 impl WebViewState {
-    fn new() -> Self {
+    fn new(initial_nodes: usize) -> Self {
         WebViewState {
             callbacks: HashMap::new(),
-            pending_html: None,
+            bindings: HashMap::new(),
+            callbacks_collected: 0,
+            pending_page: None,
+            initial_nodes,
             pending_title: None,
-            pending_element_updates: Vec::new(),
+            outbox: Vec::new(),
+            flush_scheduled: false,
+            batch_depth: 0,
             should_close: false,
+            committed: None,
+            state_rules: StateRules::new(),
+            styles: StyleSheet::default(),
+            viewports: HashMap::new(),
+            payloads: Arc::new(Mutex::new(Payloads::default())),
+        }
+    }
+
+    /// Render the committed tree as the page the webview will be built with.
+    ///
+    /// The page starts with only the style rules it needs, so the sheet starts over too.
+    fn prepare_page(&mut self) {
+        self.styles = StyleSheet::default();
+        self.pending_page = self
+            .committed
+            .as_ref()
+            .map(|tree| render_tree_streamed(tree, self.initial_nodes, &mut self.styles));
+    }
+
+    /// Take the page prepared by set_root(), stashing the chunks that follow it for the
+    /// page to fetch.
+    fn take_initial_page(&mut self) -> InitialPage {
+        self.state_rules.clear();
+        // Payloads stashed for an earlier page would never be fetched now
+        self.payloads.lock().clear();
+        let Some(page) = self.pending_page.take() else {
+            return InitialPage::default();
+        };
+        if let Some(tree) = self.committed.as_ref() {
+            collect_state_rules(tree, &mut self.state_rules);
+        }
+        let mut payloads = self.payloads.lock();
+        InitialPage {
+            content: Some(page.html),
+            css: page.css,
+            state_rules: serde_json::to_string(&self.state_rules).unwrap_or_default(),
+            stream: page.chunks.into_iter().map(|chunk| payloads.stash_chunk(chunk)).collect(),
+        }
+    }
+
+    /// Queue the rules for style classes registered since the last call, ahead of the
+    /// update that uses them.
+    fn queue_styles(&mut self) {
+        let rules = self.styles.take_rules();
+        if !rules.is_empty() {
+            self.queue(DomUpdate::AddStyles(serde_json::to_string(&rules).unwrap_or_default()));
+        }
+    }
+
+    /// Queue the changes that turn the page's hover/focus rules for the subtree with ID
+    /// `scope` into `fresh`, the rules of that subtree in the committed tree.
+    fn queue_state_rules(&mut self, scope: &str, fresh: StateRules) {
+        let changes = diff_state_rules(&mut self.state_rules, scope, fresh);
+        if !changes.is_empty() {
+            self.queue(DomUpdate::StateRules(serde_json::to_string(&changes).unwrap_or_default()));
+        }
+    }
+
+    /// Drop callbacks that the committed tree no longer references.
+    ///
+    /// Builders mint a new callback ID on every render, so without this every re-render
+    /// would keep the previous render's Python callables alive forever.
+    fn collect_garbage(&mut self) {
+        let Some(tree) = self.committed.as_ref() else {
+            return;
+        };
+        let mut live = HashSet::new();
+        tree.collect_callback_ids(&mut live);
+        self.bindings.retain(|stable, _| live.contains(stable.as_str()));
+        self.viewports
+            .retain(|list, _| live.contains(format!("{}:render_row", list).as_str()));
+
+        let bound: HashSet<&str> = self.bindings.values().map(String::as_str).collect();
+        let before = self.callbacks.len();
+        self.callbacks.retain(|minted, _| bound.contains(minted.as_str()));
+        self.callbacks_collected += before - self.callbacks.len();
+    }
+
+    /// Commit `tree`, with its IDs assigned and callbacks bound, as the root of a running
+    /// page, returning the update that brings the page in line with it.
+    fn commit_root(&mut self, mut tree: ElementDef) -> Option<DomUpdate> {
+        // A page that has seen too many distinct styles starts over with a fresh sheet,
+        // and every node on it needs its class again
+        let restyle = self.styles.len() > MAX_STYLE_CLASSES;
+        if restyle {
+            self.styles = StyleSheet::default();
+            self.queue(DomUpdate::ResetStyles);
+        }
+
+        let event = match self.committed.take() {
+            Some(old) if !restyle => {
+                let mut ops = diff_trees(old, &mut tree);
+                if ops.is_empty() {
+                    None
+                } else {
+                    for node in ops.iter_mut().filter_map(PatchOp::node_mut) {
+                        prepare_node(node, &mut self.styles);
+                    }
+                    let message = PatchMessage { ops: &ops };
+                    Some(DomUpdate::ApplyPatch(serde_json::to_string(&message).unwrap_or_default()))
+                }
+            }
+            // Nothing committed yet (e.g. run() was called before set_root()), or a restyle.
+            // The page gets the tree as committed, so its handler IDs are the bound ones.
+            _ => Some(DomUpdate::PatchRoot(render_to_json(&tree, &mut self.styles))),
+        };
+
+        // Hover/focus rules only change along with the props of some node, so an
+        // unchanged tree leaves them alone too
+        if event.is_some() {
+            let mut fresh = StateRules::new();
+            collect_state_rules(&tree, &mut fresh);
+            self.queue_state_rules(&tree.id, fresh);
+        }
+        self.committed = Some(tree);
+        self.collect_garbage();
+        event
+    }
+
+    /// Find the callable for a callback ID sent by the page.
+    fn callback(&self, py: Python<'_>, callback_id: &str) -> Option<Py<PyAny>> {
+        let minted = self.bindings.get(callback_id)?;
+        self.callbacks.get(minted).map(|cb| cb.clone_ref(py))
+    }
+
+    /// Add an update to the outbox, coalescing it with ones it makes redundant.
+    ///
+    /// A root patch supersedes every queued patch before it.
+    fn queue(&mut self, update: DomUpdate) {
+        if matches!(update, DomUpdate::PatchRoot(_)) {
+            self.outbox.retain(|u| {
+                matches!(
+                    u,
+                    DomUpdate::Sync(_) | DomUpdate::AddStyles(_) | DomUpdate::ResetStyles | DomUpdate::StateRules(_)
+                )
+            });
         }
+        self.outbox.push(update);
+    }
+
+    /// Drain the outbox into a single script that applies it within one animation frame.
+    ///
+    /// Large JSON is not inlined: it is stashed for the page to fetch, and the script
+    /// applies the updates once every fetch has landed, in the order they were sent.
+    fn take_frame_script(&mut self) -> Option<String> {
+        self.flush_scheduled = false;
+        if self.outbox.is_empty() {
+            return None;
+        }
+        let mut fetched = Vec::new();
+        let mut body = String::new();
+        for update in self.outbox.drain(..) {
+            let mut stashed = None;
+            let script = update.script(&mut |json: String| {
+                if json.len() <= INLINE_PAYLOAD_LIMIT {
+                    return json;
+                }
+                let id = self.payloads.lock().stash(json);
+                stashed = Some(id);
+                format!("p[{}]", id)
+            });
+            if let Some(id) = stashed {
+                fetched.push(id.to_string());
+                // A payload whose fetch failed is missing; skip its update, not the flush
+                body.push_str(&format!("if (p[{}] !== undefined) ", id));
+            }
+            body.push_str(&script);
+            body.push('\n');
+        }
+        Some(format!("deliver([{}], function(p) {{\n{}}});", fetched.join(", "), body))
+    }
+}
+
+/// What the webview is built with
+#[derive(Default)]
+struct InitialPage {
+    content: Option<String>, // Content of #root
+    css: String,             // Rules for the style classes the content and stream use
+    state_rules: String,     // JSON map of node ID -> hover/focus rules for the whole tree
+    stream: Vec<u64>,        // Payloads with the rest of a tree too large for one page
+}
+
+/// Ask the event loop to flush the outbox, unless a flush is already on its way.
+///
+/// Before the loop starts the outbox simply accumulates; install_sender() flushes it.
+fn request_flush(state: &mut WebViewState, event_sender: &Mutex<Option<EventSender>>) {
+    if state.flush_scheduled || state.outbox.is_empty() {
+        return;
+    }
+    if let Some(sender) = event_sender.lock().as_ref() {
+        wake(sender, UserEvent::Flush);
+        state.flush_scheduled = true;
+    }
+}
+
+/// Acknowledgements from the webview, used by `UiWindow.sync()`
+#[derive(Default)]
+struct SyncPoint {
+    seq: Mutex<SyncSeq>,
+    acked: Condvar,
+}
+
+#[derive(Default)]
+struct SyncSeq {
+    requested: u64,
+    acked: u64,
+}
+
+impl SyncPoint {
+    fn ack(&self, seq: u64) {
+        let mut s = self.seq.lock();
+        s.acked = s.acked.max(seq);
+        self.acked.notify_all();
+    }
+
+    /// Release every waiter, e.g. once the event loop has stopped.
+    fn release(&self) {
+        let mut s = self.seq.lock();
+        s.acked = s.requested;
+        self.acked.notify_all();
     }
 }
 
@@ -57,7 +348,9 @@ pub struct UiWindow {
     title: String,
     width: u32,
     height: u32,
-    event_proxy: Arc<Mutex<Option<EventLoopProxy<UserEvent>>>>,
+    event_sender: Arc<Mutex<Option<EventSender>>>,
+    sync: Arc<SyncPoint>,
+    dispatcher: Arc<Dispatcher>,
     state: Arc<Mutex<WebViewState>>,
     is_running: Arc<Mutex<bool>>,
     background_color: (u8, u8, u8, u8),
@@ -72,49 +365,87 @@ impl UiWindow {
     ///     width: Window width in pixels. Defaults to 800.
     ///     height: Window height in pixels. Defaults to 600.
     ///     background_color: Background color as hex string (e.g., "#1a1a1a"). Defaults to dark gray.
+    ///     callback_workers: Number of threads that run event callbacks. Events for the same
+    ///         callback always run in order on one thread. Defaults to 1, which runs every
+    ///         callback in the order its event happened.
+    ///     initial_nodes: Number of nodes in the first page of a tree set before run().
+    ///         The rest of a larger tree streams in after the first paint, this many nodes
+    ///         per frame. Defaults to 1000; 0 puts the whole tree in the first page.
     #[new]
-    #[pyo3(signature = (title = None, width = None, height = None, background_color = None), text_signature = "(title=None, width=None, height=None, background_color=None)")]
+    #[pyo3(signature = (title = None, width = None, height = None, background_color = None, callback_workers = None, initial_nodes = None), text_signature = "(title=None, width=None, height=None, background_color=None, callback_workers=None, initial_nodes=None)")]
     fn new(
         title: Option<String>,
         width: Option<u32>,
         height: Option<u32>,
         background_color: Option<String>,
-    ) -> Self {
+        callback_workers: Option<usize>,
+        initial_nodes: Option<usize>,
+    ) -> PyResult<Self> {
         let bg = background_color
             .and_then(|c| parse_hex_color(&c))
             .unwrap_or((26, 26, 26, 255)); // Default: #1a1a1a
 
-        UiWindow {
+        if callback_workers == Some(0) {
+            return Err(pyo3::exceptions::PyValueError::new_err(
+                "callback_workers must be at least 1",
+            ));
+        }
+
+        let initial_nodes = match initial_nodes.unwrap_or(DEFAULT_INITIAL_NODES) {
+            0 => usize::MAX,
+            n => n,
+        };
+        let state = Arc::new(Mutex::new(WebViewState::new(initial_nodes)));
+        let state_for_lookup = state.clone();
+        let resolve: CallbackResolver = Arc::new(move |py: Python<'_>, callback_id: &str| {
+            state_for_lookup.lock().callback(py, callback_id)
+        });
+
+        Ok(UiWindow {
             title: title.unwrap_or_else(|| "Python App".to_string()),
             width: width.unwrap_or(800),
             height: height.unwrap_or(600),
-            event_proxy: Arc::new(Mutex::new(None)),
-            state: Arc::new(Mutex::new(WebViewState::new())),
+            event_sender: Arc::new(Mutex::new(None)),
+            sync: Arc::new(SyncPoint::default()),
+            dispatcher: Arc::new(Dispatcher::new(callback_workers.unwrap_or(1), resolve)),
+            state,
             is_running: Arc::new(Mutex::new(false)),
             background_color: bg,
-        }
+        })
     }
 
     /// Set the root element and update the webview.
     ///
-    /// Uses DOM patching to preserve CSS transitions and element state.
+    /// The new tree is diffed against the last committed one and only the resulting
+    /// patch operations are sent, which preserves CSS transitions and element state.
     #[pyo3(text_signature = "(self, element)")]
-    fn set_root(&self, element: &Element) -> PyResult<()> {
-        let is_running = self.event_proxy.lock().is_some();
+    fn set_root(&self, py: Python<'_>, element: &Element) -> PyResult<()> {
+        // The element brings its own callables, so one that was shown before and left the
+        // tree gets them bound again
+        let mut callbacks = element.collect_callbacks(py);
+        let mut tree = ElementDef::clone(&element.def);
+        assign_stable_ids(&mut tree, "r");
+        self.render_virtual_lists(py, &mut tree, &mut callbacks)?;
+
+        let is_running = *self.is_running.lock();
 
         let mut state = self.state.lock();
-        for (id, callback) in element.collect_callbacks() {
-            state.callbacks.insert(id, callback);
+        state.callbacks.extend(callbacks);
+
+        let mut bindings = HashMap::new();
+        bind_callbacks(&mut tree, &mut bindings);
+        state.bindings = bindings;
+
+        if !is_running {
+            state.committed = Some(tree);
+            state.prepare_page();
+            state.collect_garbage();
+            return Ok(());
         }
 
-        if is_running {
-            let json = render_to_json(&element.def);
-            drop(state);
-            if let Some(proxy) = self.event_proxy.lock().as_ref() {
-                let _ = proxy.send_event(UserEvent::PatchRoot(json));
-            }
-        } else {
-            state.pending_html = Some(render_to_html(&element.def));
+        let event = state.commit_root(tree);
+        if let Some(update) = event {
+            self.send_update(&mut state, update);
         }
 
         Ok(())
@@ -126,12 +457,10 @@ impl UiWindow {
     ///     title: The new title to display in the window header.
     #[pyo3(text_signature = "(self, title)")]
     fn set_title(&self, title: String) -> PyResult<()> {
-        // Store in state for polling (used on Linux)
-        self.state.lock().pending_title = Some(title.clone());
-
-        // Also send via event proxy if available (used on other platforms)
-        if let Some(proxy) = self.event_proxy.lock().as_ref() {
-            let _ = proxy.send_event(UserEvent::SetTitle(title));
+        let mut state = self.state.lock();
+        match self.event_sender.lock().as_ref() {
+            Some(sender) => wake(sender, UserEvent::SetTitle(title)),
+            None => state.pending_title = Some(title),
         }
         Ok(())
     }
@@ -144,25 +473,71 @@ impl UiWindow {
     /// Args:
     ///     element_id: The ID of the element to update (set via id()).
     ///     element: The new Element to replace the existing one.
+    ///
+    /// Raises:
+    ///     ValueError: If no element in the current root has the ID.
     #[pyo3(text_signature = "(self, element_id, element)")]
-    fn update_element(&self, element_id: String, element: &Element) -> PyResult<()> {
-        let json = {
-            let mut state = self.state.lock();
-            for (id, callback) in element.collect_callbacks() {
-                state.callbacks.insert(id, callback);
-            }
+    fn update_element(&self, py: Python<'_>, element_id: String, element: &Element) -> PyResult<()> {
+        let not_found = || {
+            pyo3::exceptions::PyValueError::new_err(format!("No element with id {:?} in the root", element_id))
+        };
+        // Virtual lists in the replacement need their path IDs to find their viewports
+        let path = {
+            let state = self.state.lock();
+            let tree = state.committed.as_ref();
+            tree.and_then(|tree| find_by_user_id(tree, &element_id)).map(|node| node.id.clone())
+        };
+        let path = path.ok_or_else(not_found)?;
+        let mut callbacks = element.collect_callbacks(py);
+        let mut def = ElementDef::clone(&element.def);
+        assign_stable_ids(&mut def, &path);
+        self.render_virtual_lists(py, &mut def, &mut callbacks)?;
 
-            let json = render_to_json_partial(&element.def);
+        let is_running = *self.is_running.lock();
 
-            // Store as pending for Linux polling
-            state.pending_element_updates.push((element_id.clone(), json.clone()));
-            json
-        };
+        let mut state = self.state.lock();
 
-        // Send update to webview if already running
-        if let Some(proxy) = self.event_proxy.lock().as_ref() {
-            let _ = proxy.send_event(UserEvent::PatchElement(element_id, json));
+        // Keep the committed tree in sync so the next set_root() diffs against what
+        // the DOM actually shows. The spliced subtree inherits the target's path IDs.
+        let WebViewState {
+            committed,
+            bindings,
+            styles,
+            ..
+        } = &mut *state;
+        let spliced = committed
+            .as_mut()
+            .and_then(|tree| splice_by_user_id(tree, &element_id, &def))
+            .map(|(old, node)| {
+                bind_callbacks(node, bindings);
+                let mut fresh = StateRules::new();
+                collect_state_rules(node, &mut fresh);
+                // Only what differs from the replaced subtree goes to the page; the parts
+                // with unchanged content are skipped by their hashes
+                let mut ops = diff_trees(old, node);
+                for op_node in ops.iter_mut().filter_map(PatchOp::node_mut) {
+                    prepare_node(op_node, styles);
+                }
+                (ops, node.id.clone(), fresh)
+            });
+        // A set_root() from another thread may have removed the element since
+        let (ops, scope, fresh) = spliced.ok_or_else(not_found)?;
+        state.callbacks.extend(callbacks);
+        state.collect_garbage();
+
+        if !is_running {
+            state.prepare_page();
+            return Ok(());
+        }
+        // Rules only change along with some node's props
+        if ops.is_empty() {
+            return Ok(());
         }
+        state.queue_state_rules(&scope, fresh);
+        let message = PatchMessage { ops: &ops };
+        let update = DomUpdate::ApplyPatch(serde_json::to_string(&message).unwrap_or_default());
+        self.send_update(&mut state, update);
+        restyle_if_full(&mut state, &self.event_sender);
 
         Ok(())
     }
@@ -177,31 +552,188 @@ impl UiWindow {
         let width = self.width;
         let height = self.height;
         let state = self.state.clone();
-        let event_proxy_holder = self.event_proxy.clone();
+        let event_sender_holder = self.event_sender.clone();
+        let sync = self.sync.clone();
+        let dispatcher = self.dispatcher.clone();
         let is_running = self.is_running.clone();
         let background_color = self.background_color;
+        claim_ui_thread(&UI_THREAD).map_err(pyo3::exceptions::PyRuntimeError::new_err)?;
 
         // Release GIL while running the event loop
         #[allow(deprecated)]
         py.allow_threads(|| {
-            run_event_loop(title, width, height, state, event_proxy_holder, is_running, background_color)
+            run_event_loop(
+                title,
+                width,
+                height,
+                state,
+                event_sender_holder,
+                sync,
+                dispatcher,
+                is_running,
+                background_color,
+            )
         })
         .map_err(|e| pyo3::exceptions::PyRuntimeError::new_err(e))
     }
 
+    /// Run the window from asyncio code: ``await window.run_async()``.
+    ///
+    /// The event loop runs on a thread kept for windows started this way, so the
+    /// awaiting coroutine resumes when the window closes while other tasks keep running.
+    /// Every run_async() call in the process uses that same thread, since the toolkit
+    /// can't move between threads once initialized. Callbacks defined with ``async def``
+    /// are scheduled on this asyncio loop, so coroutines and the code calling
+    /// set_root()/update_element() share one thread.
+    ///
+    /// Raises NotImplementedError on macOS, where the window must own the main thread.
+    #[pyo3(text_signature = "(self)")]
+    fn run_async<'py>(slf: &Bound<'py, Self>) -> PyResult<Bound<'py, PyAny>> {
+        if cfg!(target_os = "macos") {
+            return Err(pyo3::exceptions::PyNotImplementedError::new_err(
+                "run_async() is not supported on macOS, where the window must run on the main thread; use run()",
+            ));
+        }
+        let py = slf.py();
+        let event_loop = py.import("asyncio")?.call_method0("get_running_loop")?;
+        let future = event_loop.call_method0("create_future")?;
+        let dispatcher = slf.borrow().dispatcher.clone();
+        dispatcher.set_event_loop(Some(event_loop.clone().unbind()));
+
+        let window = slf.clone().unbind();
+        let done_loop = event_loop.unbind();
+        let done = future.clone().unbind();
+        let sent = run_on_ui_thread(Box::new(move || {
+            // A panic in the event loop still resolves the future, so the awaiting
+            // coroutine can't hang
+            let result = panic::catch_unwind(AssertUnwindSafe(|| {
+                #[allow(deprecated)]
+                Python::with_gil(|py| window.bind(py).borrow().run(py))
+            }))
+            .unwrap_or_else(|_| Err(pyo3::exceptions::PyRuntimeError::new_err("The window's event loop panicked")));
+            dispatcher.set_event_loop(None);
+            #[allow(deprecated)]
+            Python::with_gil(|py| {
+                if let Err(e) = settle_future(py, done_loop.bind(py), done, result) {
+                    eprintln!("Failed to resolve run_async(): {:?}", e);
+                }
+            })
+        }));
+        if let Err(e) = sent {
+            slf.borrow().dispatcher.set_event_loop(None);
+            return Err(e);
+        }
+        Ok(future)
+    }
+
+    /// Wait until the webview has applied every update sent so far.
+    ///
+    /// Useful in tests and for measuring update latency. Returns immediately if the
+    /// window isn't running.
+    ///
+    /// Args:
+    ///     timeout: Maximum number of seconds to wait. Defaults to 5.
+    ///
+    /// Returns:
+    ///     True if the webview caught up, False if the timeout expired first.
+    #[pyo3(signature = (timeout = 5.0), text_signature = "(self, timeout=5.0)")]
+    fn sync(&self, py: Python, timeout: f64) -> PyResult<bool> {
+        if !*self.is_running.lock() {
+            return Ok(true);
+        }
+
+        let seq = {
+            let mut s = self.sync.seq.lock();
+            s.requested += 1;
+            s.requested
+        };
+        {
+            // Flush even inside a batch, otherwise waiting here could never succeed
+            let mut state = self.state.lock();
+            state.queue(DomUpdate::Sync(seq));
+            request_flush(&mut state, &self.event_sender);
+        }
+
+        let sync = self.sync.clone();
+        let deadline = Duration::try_from_secs_f64(timeout.max(0.0))
+            .ok()
+            .and_then(|d| Instant::now().checked_add(d));
+        #[allow(deprecated)]
+        let done = py.allow_threads(move || {
+            let mut s = sync.seq.lock();
+            while s.acked < seq {
+                match deadline {
+                    Some(deadline) => {
+                        if sync.acked.wait_until(&mut s, deadline).timed_out() {
+                            return s.acked >= seq;
+                        }
+                    }
+                    None => sync.acked.wait(&mut s),
+                }
+            }
+            true
+        });
+        Ok(done)
+    }
+
+    /// Group updates so they reach the webview together.
+    ///
+    /// Inside the block set_root() and update_element() only queue their changes. They are
+    /// flushed as one script, applied within a single animation frame, when the outermost
+    /// block exits.
+    ///
+    /// Example:
+    ///     with window.batch():
+    ///         for i, row in enumerate(rows):
+    ///             window.update_element(f"row-{i}", row)
+    #[pyo3(text_signature = "(self)")]
+    fn batch(&self) -> UpdateBatch {
+        UpdateBatch {
+            state: self.state.clone(),
+            event_sender: self.event_sender.clone(),
+        }
+    }
+
     /// Close the window and stop the event loop.
     #[pyo3(text_signature = "(self)")]
     fn close(&self) -> PyResult<()> {
-        // Set close flag in state for polling (used on Linux)
-        self.state.lock().should_close = true;
-
-        // Also send via event proxy if available (used on other platforms)
-        if let Some(proxy) = self.event_proxy.lock().as_ref() {
-            let _ = proxy.send_event(UserEvent::Close);
+        let mut state = self.state.lock();
+        match self.event_sender.lock().as_ref() {
+            Some(sender) => wake(sender, UserEvent::Close),
+            None => state.should_close = true,
         }
         Ok(())
     }
 
+    /// Report callback registry and dispatch metrics.
+    ///
+    /// Returns:
+    ///     A dict with ``callbacks_live`` (callbacks reachable from the current tree),
+    ///     ``callbacks_collected`` (callbacks dropped after their element went away),
+    ///     ``callbacks_pending`` (registered by builders but not yet passed to a window),
+    ///     ``callback_workers`` (pool size), ``callback_queue_depth`` (events waiting or
+    ///     running now), ``callback_queue_peak`` (highest depth seen),
+    ///     ``callback_worker_depths`` (depth per worker), ``callbacks_dispatched`` and
+    ///     ``style_classes`` (distinct node styles the page has a class for).
+    #[pyo3(text_signature = "(self)")]
+    fn stats<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyDict>> {
+        let dispatch = self.dispatcher.stats();
+        let stats = PyDict::new(py);
+        {
+            let state = self.state.lock();
+            stats.set_item("callbacks_live", state.callbacks.len())?;
+            stats.set_item("callbacks_collected", state.callbacks_collected)?;
+            stats.set_item("style_classes", state.styles.len())?;
+        }
+        stats.set_item("callbacks_pending", pending_callback_count())?;
+        stats.set_item("callback_workers", dispatch.workers)?;
+        stats.set_item("callback_queue_depth", dispatch.queued)?;
+        stats.set_item("callback_queue_peak", dispatch.peak_queued)?;
+        stats.set_item("callback_worker_depths", dispatch.worker_queued)?;
+        stats.set_item("callbacks_dispatched", dispatch.dispatched)?;
+        Ok(stats)
+    }
+
     /// Check if the window is currently running.
     ///
     /// Returns:
@@ -219,27 +751,347 @@ impl UiWindow {
     }
 }
 
+impl UiWindow {
+    /// Queue a DOM update and wake the event loop to flush it.
+    fn send_update(&self, state: &mut WebViewState, update: DomUpdate) {
+        send_update(state, &self.event_sender, update);
+    }
+
+    /// Render the rows in view of every virtual list in a tree whose IDs are assigned.
+    ///
+    /// `callbacks` are the callables of the element the tree was built from. Row renderers
+    /// are found there, and the callables of the rendered rows are added to them.
+    /// Call this without holding the state lock, since a row renderer may call back
+    /// into the window.
+    fn render_virtual_lists(
+        &self,
+        py: Python<'_>,
+        tree: &mut ElementDef,
+        callbacks: &mut HashMap<String, Py<PyAny>>,
+    ) -> PyResult<()> {
+        let viewports = self.state.lock().viewports.clone();
+        fill_virtual_lists(py, tree, &viewports, callbacks).map(|_| ())
+    }
+}
+
+/// Queue a DOM update and wake the event loop to flush it.
+///
+/// Updates queued before the loop handles the flush are coalesced and applied together.
+fn send_update(state: &mut WebViewState, event_sender: &Mutex<Option<EventSender>>, update: DomUpdate) {
+    state.queue_styles();
+    state.queue(update);
+    if state.batch_depth == 0 {
+        request_flush(state, event_sender);
+    }
+}
+
+/// Start the page over with a fresh stylesheet once it has seen too many distinct styles.
+///
+/// The page never deletes style rules, so the paths that patch part of the tree call this
+/// after sending their update, as set_root() does before its own. The committed tree is
+/// sent again with the classes of the new sheet.
+fn restyle_if_full(state: &mut WebViewState, event_sender: &Mutex<Option<EventSender>>) {
+    if state.styles.len() <= MAX_STYLE_CLASSES {
+        return;
+    }
+    let Some(tree) = state.committed.as_ref() else {
+        return;
+    };
+    state.styles = StyleSheet::default();
+    let json = render_to_json(tree, &mut state.styles);
+    state.queue(DomUpdate::ResetStyles);
+    send_update(state, event_sender, DomUpdate::PatchRoot(json));
+}
+
+/// Give every virtual list in a tree the rows for its last reported viewport.
+///
+/// Returns whether the tree had any lists, in which case the content hashes of the
+/// nodes above them are dropped.
+fn fill_virtual_lists(
+    py: Python<'_>,
+    node: &mut ElementDef,
+    viewports: &HashMap<String, Viewport>,
+    callbacks: &mut HashMap<String, Py<PyAny>>,
+) -> PyResult<bool> {
+    let mut filled = false;
+    let render_row = node.render_row.as_deref().and_then(|id| callbacks.get(id)).map(|cb| cb.clone_ref(py));
+    if let Some(render_row) = render_row {
+        let rows = visible_rows(node, viewports.get(&node.id).copied().unwrap_or_default());
+        let rendered = render_rows(py, &render_row, rows.clone())?;
+        let mut defs = HashMap::with_capacity(rendered.len());
+        for (index, row) in rendered {
+            callbacks.extend(row.take_own_callbacks(py));
+            defs.insert(index, Arc::unwrap_or_clone(row.def));
+        }
+        place_rows(node, rows, defs);
+        filled = true;
+    }
+    for child in node.children.iter_mut() {
+        filled |= fill_virtual_lists(py, child, viewports, callbacks)?;
+    }
+    if filled {
+        node.cached_hash = None;
+    }
+    Ok(filled)
+}
+
+/// Call a virtual list's row renderer for each index
+fn render_rows(
+    py: Python<'_>,
+    render_row: &Py<PyAny>,
+    indices: impl IntoIterator<Item = usize>,
+) -> PyResult<Vec<(usize, Element)>> {
+    indices
+        .into_iter()
+        .map(|index| {
+            let row = render_row.bind(py).call1((index,))?;
+            match Element::from_object(&row) {
+                Some(element) => Ok((index, element)),
+                None => Err(pyo3::exceptions::PyTypeError::new_err(format!(
+                    "render_row({}) must return an Element or ElementBuilder, not {}",
+                    index,
+                    row.get_type().name()?
+                ))),
+            }
+        })
+        .collect()
+}
+
+/// Bring a virtual list's rows in line with the viewport the page last reported for it.
+///
+/// Runs on a callback worker. Only the rows that scrolled into view are rendered, with
+/// the state unlocked, and they are placed only if the list still uses the same renderer.
+fn scroll_virtual_list(
+    py: Python<'_>,
+    state: &Mutex<WebViewState>,
+    event_sender: &Mutex<Option<EventSender>>,
+    list_id: &str,
+) {
+    let (rows, missing, stable, minted) = {
+        let mut guard = state.lock();
+        let state = &mut *guard;
+        let viewport = state.viewports.get(list_id).copied().unwrap_or_default();
+        let Some(list) = state.committed.as_ref().and_then(|tree| find_node(tree, list_id)) else {
+            return;
+        };
+        let Some(stable) = list.render_row.clone() else {
+            return;
+        };
+        let rows = visible_rows(list, viewport);
+        let missing = missing_rows(list, rows.clone());
+        if missing.is_empty() && list.children.len() == rows.len() {
+            return;
+        }
+        (rows, missing, stable.clone(), state.bindings.get(&stable).cloned())
+    };
+    let Some(render_row) = minted.as_deref().and_then(|id| state.lock().callbacks.get(id).map(|cb| cb.clone_ref(py)))
+    else {
+        return;
+    };
+    let rendered = match render_rows(py, &render_row, missing.iter().copied()) {
+        Ok(rendered) => rendered,
+        Err(e) => {
+            eprintln!("Callback error: {:?}", e);
+            return;
+        }
+    };
+
+    let mut guard = state.lock();
+    let state = &mut *guard;
+    if state.bindings.get(&stable) != minted.as_ref() {
+        return;
+    }
+    let mut defs = HashMap::new();
+    for (index, row) in rendered {
+        state.callbacks.extend(row.take_own_callbacks(py));
+        defs.insert(index, Arc::unwrap_or_clone(row.def));
+    }
+
+    let WebViewState {
+        committed,
+        bindings,
+        styles,
+        ..
+    } = state;
+    let Some(list) = committed.as_mut().and_then(|tree| find_node_mut(tree, list_id)) else {
+        return;
+    };
+    let old = list.clone();
+    if !place_rows(list, rows, defs) {
+        return;
+    }
+    for row in list.children.iter_mut() {
+        if row.row_index.is_some_and(|index| missing.contains(&index)) {
+            bind_callbacks(row, bindings);
+        }
+    }
+    let mut ops = diff_trees(old, list);
+    for node in ops.iter_mut().filter_map(PatchOp::node_mut) {
+        prepare_node(node, styles);
+    }
+    let mut fresh = StateRules::new();
+    collect_state_rules(list, &mut fresh);
+
+    state.queue_state_rules(list_id, fresh);
+    state.collect_garbage();
+    if !ops.is_empty() {
+        let message = PatchMessage { ops: &ops };
+        let update = DomUpdate::ApplyPatch(serde_json::to_string(&message).unwrap_or_default());
+        send_update(state, event_sender, update);
+        restyle_if_full(state, event_sender);
+    }
+}
+
+/// Context manager returned by `UiWindow.batch()`
+#[pyclass]
+pub struct UpdateBatch {
+    state: Arc<Mutex<WebViewState>>,
+    event_sender: Arc<Mutex<Option<EventSender>>>,
+}
+
+#[pymethods]
+impl UpdateBatch {
+    fn __enter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+        slf.state.lock().batch_depth += 1;
+        slf
+    }
+
+    #[pyo3(signature = (_exc_type = None, _exc_value = None, _traceback = None))]
+    fn __exit__(
+        &self,
+        _exc_type: Option<Py<PyAny>>,
+        _exc_value: Option<Py<PyAny>>,
+        _traceback: Option<Py<PyAny>>,
+    ) -> bool {
+        let mut state = self.state.lock();
+        state.batch_depth = state.batch_depth.saturating_sub(1);
+        if state.batch_depth == 0 {
+            request_flush(&mut state, &self.event_sender);
+        }
+        false
+    }
+}
+
+/// Hand the event sender to Python, first forwarding anything queued before the loop started.
+///
+/// If set_root() ran after the webview was built from the initial page, the committed tree
+/// is re-sent in full and the stale queued patches are dropped.
+fn install_sender(state: &Mutex<WebViewState>, holder: &Mutex<Option<EventSender>>, sender: EventSender) {
+    let mut guard = state.lock();
+    let state = &mut *guard;
+    if state.pending_page.take().is_some() {
+        state.styles = StyleSheet::default();
+        if let Some(tree) = state.committed.as_ref() {
+            let json = render_to_json(tree, &mut state.styles);
+            let mut fresh = StateRules::new();
+            collect_state_rules(tree, &mut fresh);
+            let scope = tree.id.clone();
+            state.queue_styles();
+            state.queue(DomUpdate::PatchRoot(json));
+            state.queue_state_rules(&scope, fresh);
+        }
+    }
+    if !state.outbox.is_empty() && state.batch_depth == 0 {
+        wake(&sender, UserEvent::Flush);
+        state.flush_scheduled = true;
+    }
+    if let Some(title) = state.pending_title.take() {
+        wake(&sender, UserEvent::SetTitle(title));
+    }
+    if std::mem::take(&mut state.should_close) {
+        wake(&sender, UserEvent::Close);
+    }
+    *holder.lock() = Some(sender);
+}
+
+/// The thread the window toolkit was first started on.
+///
+/// GTK binds itself to the thread that initialized it, and tao event loops can't move
+/// between threads either, so every window in the process has to run on this one.
+static UI_THREAD: OnceLock<ThreadId> = OnceLock::new();
+
+/// Claim `owner` for the current thread, or fail if another thread already holds it.
+fn claim_ui_thread(owner: &OnceLock<ThreadId>) -> Result<(), String> {
+    let current = thread::current().id();
+    if *owner.get_or_init(|| current) != current {
+        return Err("Windows already ran on another thread; the toolkit can only be used from \
+                    one thread per process (run_async() always uses the same thread)"
+            .to_string());
+    }
+    Ok(())
+}
+
+type UiJob = Box<dyn FnOnce() + Send>;
+
+/// Run `job` on the thread run_async() keeps for windows.
+///
+/// The thread starts on first use and lives as long as the process, so windows started
+/// from asyncio always initialize and drive the toolkit from the same thread.
+fn run_on_ui_thread(job: UiJob) -> PyResult<()> {
+    static JOBS: OnceLock<mpsc::Sender<UiJob>> = OnceLock::new();
+    let jobs = JOBS.get_or_init(|| {
+        let (sender, receiver) = mpsc::channel::<UiJob>();
+        thread::Builder::new()
+            .name("wry-ui".to_string())
+            .spawn(move || {
+                for job in receiver {
+                    // Keep the thread for the next job even if this one panics
+                    let _ = panic::catch_unwind(AssertUnwindSafe(job));
+                }
+            })
+            .expect("failed to spawn UI thread");
+        sender
+    });
+    jobs.send(job)
+        .map_err(|_| pyo3::exceptions::PyRuntimeError::new_err("The UI thread has stopped"))
+}
+
+/// Resolve an asyncio future with the outcome of run() from the UI thread.
+fn settle_future(
+    py: Python<'_>,
+    event_loop: &Bound<'_, PyAny>,
+    future: Py<PyAny>,
+    result: PyResult<()>,
+) -> PyResult<()> {
+    let settle = PyCFunction::new_closure(
+        py,
+        None,
+        None,
+        move |args: &Bound<'_, PyTuple>, _kwargs: Option<&Bound<'_, PyDict>>| -> PyResult<()> {
+            let py = args.py();
+            let future = future.bind(py);
+            // The awaiting task may have been cancelled while the window was open
+            if future.call_method0("done")?.is_truthy()? {
+                return Ok(());
+            }
+            match &result {
+                Ok(()) => future.call_method1("set_result", (py.None(),))?,
+                Err(e) => future.call_method1("set_exception", (e.clone_ref(py).into_value(py),))?,
+            };
+            Ok(())
+        },
+    )?;
+    event_loop.call_method1("call_soon_threadsafe", (settle,))?;
+    Ok(())
+}
+
 #[cfg(target_os = "linux")]
 fn run_event_loop(
     title: String,
     width: u32,
     height: u32,
     state: Arc<Mutex<WebViewState>>,
-    event_proxy_holder: Arc<Mutex<Option<EventLoopProxy<UserEvent>>>>,
+    event_sender_holder: Arc<Mutex<Option<EventSender>>>,
+    sync: Arc<SyncPoint>,
+    dispatcher: Arc<Dispatcher>,
     is_running: Arc<Mutex<bool>>,
     background_color: (u8, u8, u8, u8),
 ) -> Result<(), String> {
     use gtk::glib;
-    use std::cell::RefCell;
     use std::rc::Rc;
-    use std::sync::mpsc;
 
     gtk::init().map_err(|e| format!("Failed to initialize GTK: {:?}", e))?;
 
-    // Create a channel for internal events
-    let (event_tx, event_rx) = mpsc::channel::<UserEvent>();
-    let event_rx = Rc::new(RefCell::new(event_rx));
-
     let state_clone = state.clone();
 
     // Create GTK window
@@ -253,75 +1105,28 @@ fn run_event_loop(
     gtk_box.set_hexpand(true);
 
     // Get initial HTML
-    let initial_content = {
-        let state = state_clone.lock();
-        state.pending_html.clone()
+    let (initial_page, payloads) = {
+        let mut state = state_clone.lock();
+        (state.take_initial_page(), state.payloads.clone())
     };
 
-    let initial_html = get_initial_html(initial_content.as_deref(), background_color);
+    let initial_html = get_initial_html(&initial_page, background_color);
 
     // Create IPC handler for callbacks
-    let state_for_ipc = state_clone.clone();
+    let sync_for_ipc = sync.clone();
+    let state_for_ipc = state.clone();
+    let sender_for_ipc = event_sender_holder.clone();
     let ipc_handler = move |request: wry::http::Request<String>| {
-        let body = request.body();
-        if let Ok(event) = serde_json::from_str::<IpcEvent>(body) {
-            // Handle click and mouse events (no arguments)
-            if matches!(event.event_type.as_str(), "click" | "mouse_enter" | "mouse_leave" | "mouse_down" | "mouse_up") {
-                if let Some(ref callback_id) = event.callback_id {
-                    let state_for_cb = state_for_ipc.clone();
-                    let callback_id = callback_id.clone();
-                    #[allow(deprecated)]
-                    Python::with_gil(|py| {
-                        let callback = {
-                            let state = state_for_cb.lock();
-                            state.callbacks.get(&callback_id).map(|cb| cb.clone_ref(py))
-                        };
-
-                        if let Some(callback) = callback {
-                            std::thread::spawn(move || {
-                                #[allow(deprecated)]
-                                Python::with_gil(|py| {
-                                    if let Err(e) = callback.call0(py) {
-                                        eprintln!("Callback error: {:?}", e);
-                                    }
-                                });
-                            });
-                        }
-                    });
-                }
-            }
-
-            if event.event_type == "input" || event.event_type == "change" {
-                if let (Some(callback_id), Some(value)) = (&event.callback_id, event.value) {
-                    let state_for_cb = state_for_ipc.clone();
-                    let callback_id = callback_id.clone();
-                    #[allow(deprecated)]
-                    Python::with_gil(|py| {
-                        let callback = {
-                            let state = state_for_cb.lock();
-                            state.callbacks.get(&callback_id).map(|cb| cb.clone_ref(py))
-                        };
-
-                        if let Some(callback) = callback {
-                            std::thread::spawn(move || {
-                                #[allow(deprecated)]
-                                Python::with_gil(|py| {
-                                    if let Err(e) = callback.call1(py, (value,)) {
-                                        eprintln!("Input/change callback error: {:?}", e);
-                                    }
-                                });
-                            });
-                        }
-                    });
-                }
-            }
-        }
+        handle_ipc(request.body(), &sync_for_ipc, &dispatcher, &state_for_ipc, &sender_for_ipc);
     };
 
     // Build webview with GTK
     let webview = WebViewBuilder::new()
         .with_html(initial_html)
         .with_ipc_handler(ipc_handler)
+        .with_asynchronous_custom_protocol(protocol::SCHEME.to_string(), move |_webview_id, request, responder| {
+            protocol::handle_async(request, &payloads, move |response| responder.respond(response))
+        })
         .with_background_color(background_color)
         .build_gtk(&gtk_box)
         .map_err(|e| format!("Failed to build webview: {}", e))?;
@@ -342,38 +1147,34 @@ fn run_event_loop(
 
     *is_running.lock() = true;
 
-    // Set up a polling loop to check for events from Python
-    let webview_for_poll = webview.clone();
-    let window_for_poll = window.clone();
-    let is_running_for_poll = is_running.clone();
-    glib::timeout_add_local(std::time::Duration::from_millis(16), move || {
-        // Check for events
-        while let Ok(event) = event_rx.borrow().try_recv() {
-            match event {
-                UserEvent::PatchRoot(json) => {
-                    let js = format!("patchRoot({});", json);
-                    let _ = webview_for_poll.evaluate_script(&js);
-                }
-                UserEvent::PatchElement(id, json) => {
-                    let js = format!(
-                        "patchElementById({}, {});",
-                        serde_json::to_string(&id).unwrap(),
-                        json
-                    );
-                    let _ = webview_for_poll.evaluate_script(&js);
-                }
-                UserEvent::SetTitle(title) => {
-                    window_for_poll.set_title(&title);
-                }
-                UserEvent::Close => {
-                    *is_running_for_poll.lock() = false;
-                    gtk::main_quit();
-                    return glib::ControlFlow::Break;
+    // Python threads wake the GTK main loop through this channel, so updates are applied
+    // on the next loop iteration and the loop sleeps while idle.
+    #[allow(deprecated)]
+    let (event_tx, event_rx) = glib::MainContext::channel::<UserEvent>(glib::Priority::DEFAULT);
+    let webview_for_events = webview.clone();
+    let window_for_events = window.clone();
+    let state_for_events = state.clone();
+    let is_running_for_events = is_running.clone();
+    event_rx.attach(None, move |event| {
+        match event {
+            UserEvent::Flush => {
+                let script = state_for_events.lock().take_frame_script();
+                if let Some(js) = script {
+                    let _ = webview_for_events.evaluate_script(&js);
                 }
             }
+            UserEvent::SetTitle(title) => {
+                window_for_events.set_title(&title);
+            }
+            UserEvent::Close => {
+                *is_running_for_events.lock() = false;
+                gtk::main_quit();
+                return glib::ControlFlow::Break;
+            }
         }
         glib::ControlFlow::Continue
     });
+    install_sender(&state, &event_sender_holder, event_tx);
 
     // Handle Ctrl+C (SIGINT) to close the window gracefully
     let is_running_for_sigint = is_running.clone();
@@ -385,39 +1186,12 @@ fn run_event_loop(
         glib::ControlFlow::Break
     });
 
-    // Poll the state for pending changes from Python
-    // This is needed because EventLoopProxy doesn't work with GTK
-    let state_for_poll = state.clone();
-    glib::timeout_add_local(std::time::Duration::from_millis(50), move || {
-        let mut state = state_for_poll.lock();
-
-        // Clear pending_html on first poll (already used for initial render)
-        state.pending_html.take();
-
-        // Check for pending element updates
-        for (id, json) in state.pending_element_updates.drain(..) {
-            let _ = event_tx.send(UserEvent::PatchElement(id, json));
-        }
-
-        // Check for pending title update
-        if let Some(title) = state.pending_title.take() {
-            let _ = event_tx.send(UserEvent::SetTitle(title));
-        }
-
-        // Check for close request
-        if state.should_close {
-            state.should_close = false;
-            let _ = event_tx.send(UserEvent::Close);
-        }
-
-        glib::ControlFlow::Continue
-    });
-
     gtk::main();
     *is_running.lock() = false;
 
-    // Clear the event proxy
-    *event_proxy_holder.lock() = None;
+    // Queue further updates in state again and release anyone blocked in sync()
+    *event_sender_holder.lock() = None;
+    sync.release();
 
     Ok(())
 }
@@ -428,7 +1202,9 @@ fn run_event_loop(
     width: u32,
     height: u32,
     state: Arc<Mutex<WebViewState>>,
-    event_proxy_holder: Arc<Mutex<Option<EventLoopProxy<UserEvent>>>>,
+    event_sender_holder: Arc<Mutex<Option<EventSender>>>,
+    sync: Arc<SyncPoint>,
+    dispatcher: Arc<Dispatcher>,
     is_running: Arc<Mutex<bool>>,
     background_color: (u8, u8, u8, u8),
 ) -> Result<(), String> {
@@ -445,10 +1221,16 @@ fn run_event_loop(
         }
     }
 
-    let event_loop: EventLoop<UserEvent> = EventLoopBuilder::with_user_event().build();
+    #[allow(unused_mut)]
+    let mut builder = EventLoopBuilder::with_user_event();
+    // run_async() drives the loop from its own UI thread rather than the main thread
+    #[cfg(target_os = "windows")]
+    {
+        use tao::platform::windows::EventLoopBuilderExtWindows;
+        builder.with_any_thread(true);
+    }
+    let event_loop: EventLoop<UserEvent> = builder.build();
 
-    // Store the proxy so Python can send events
-    *event_proxy_holder.lock() = Some(event_loop.create_proxy());
     *is_running.lock() = true;
 
     let window = WindowBuilder::new()
@@ -458,82 +1240,33 @@ fn run_event_loop(
         .map_err(|e| e.to_string())?;
 
     // Get pending HTML or use default
-    let initial_content = {
-        let state = state.lock();
-        state.pending_html.clone()
+    let (initial_page, payloads) = {
+        let mut state = state.lock();
+        (state.take_initial_page(), state.payloads.clone())
     };
 
-    let initial_html = get_initial_html(initial_content.as_deref(), background_color);
+    let initial_html = get_initial_html(&initial_page, background_color);
 
     // Create IPC handler for callbacks
-    let state_clone = state.clone();
-    let _proxy_for_callbacks = event_loop.create_proxy();
-
+    let sync_for_ipc = sync.clone();
+    let state_for_ipc = state.clone();
+    let sender_for_ipc = event_sender_holder.clone();
     let ipc_handler = move |request: wry::http::Request<String>| {
-        let body = request.body();
-        if let Ok(event) = serde_json::from_str::<IpcEvent>(body) {
-            // Handle click and mouse events (no arguments)
-            if matches!(event.event_type.as_str(), "click" | "mouse_enter" | "mouse_leave" | "mouse_down" | "mouse_up") {
-                if let Some(ref callback_id) = event.callback_id {
-                    let state_for_cb = state_clone.clone();
-                    let callback_id = callback_id.clone();
-                    #[allow(deprecated)]
-                    Python::with_gil(|py| {
-                        let callback = {
-                            let state = state_for_cb.lock();
-                            state.callbacks.get(&callback_id).map(|cb| cb.clone_ref(py))
-                        };
-
-                        if let Some(callback) = callback {
-                            std::thread::spawn(move || {
-                                #[allow(deprecated)]
-                                Python::with_gil(|py| {
-                                    if let Err(e) = callback.call0(py) {
-                                        eprintln!("Callback error: {:?}", e);
-                                    }
-                                });
-                            });
-                        }
-                    });
-                }
-            }
-
-            if event.event_type == "input" || event.event_type == "change" {
-                if let (Some(callback_id), Some(value)) = (&event.callback_id, event.value) {
-                    let state_for_cb = state_clone.clone();
-                    let callback_id = callback_id.clone();
-                    #[allow(deprecated)]
-                    Python::with_gil(|py| {
-                        let callback = {
-                            let state = state_for_cb.lock();
-                            state.callbacks.get(&callback_id).map(|cb| cb.clone_ref(py))
-                        };
-
-                        if let Some(callback) = callback {
-                            std::thread::spawn(move || {
-                                #[allow(deprecated)]
-                                Python::with_gil(|py| {
-                                    if let Err(e) = callback.call1(py, (value,)) {
-                                        eprintln!("Input/change callback error: {:?}", e);
-                                    }
-                                });
-                            });
-                        }
-                    });
-                }
-            }
-        }
+        handle_ipc(request.body(), &sync_for_ipc, &dispatcher, &state_for_ipc, &sender_for_ipc);
     };
 
     let webview = WebViewBuilder::new()
         .with_html(initial_html)
         .with_ipc_handler(ipc_handler)
+        .with_asynchronous_custom_protocol(protocol::SCHEME.to_string(), move |_webview_id, request, responder| {
+            protocol::handle_async(request, &payloads, move |response| responder.respond(response))
+        })
         .with_background_color(background_color)
         .build(&window)
         .map_err(|e| e.to_string())?;
 
-    // Clear pending_html (already used for initial render)
-    state.lock().pending_html.take();
+    // Store the proxy so Python can send events
+    install_sender(&state, &event_sender_holder, event_loop.create_proxy());
 
     event_loop.run(move |event, _, control_flow| {
         *control_flow = ControlFlow::Wait;
@@ -544,27 +1277,25 @@ fn run_event_loop(
                 ..
             } => {
                 *is_running.lock() = false;
+                *event_sender_holder.lock() = None;
+                sync.release();
                 *control_flow = ControlFlow::Exit;
             }
 
             Event::UserEvent(user_event) => match user_event {
-                UserEvent::PatchRoot(json) => {
-                    let js = format!("patchRoot({});", json);
-                    let _ = webview.evaluate_script(&js);
-                }
-                UserEvent::PatchElement(id, json) => {
-                    let js = format!(
-                        "patchElementById({}, {});",
-                        serde_json::to_string(&id).unwrap(),
-                        json
-                    );
-                    let _ = webview.evaluate_script(&js);
+                UserEvent::Flush => {
+                    let script = state.lock().take_frame_script();
+                    if let Some(js) = script {
+                        let _ = webview.evaluate_script(&js);
+                    }
                 }
                 UserEvent::SetTitle(title) => {
                     window.set_title(&title);
                 }
                 UserEvent::Close => {
                     *is_running.lock() = false;
+                    *event_sender_holder.lock() = None;
+                    sync.release();
                     *control_flow = ControlFlow::Exit;
                 }
             },
@@ -574,10 +1305,7 @@ fn run_event_loop(
     });
 
     #[allow(unreachable_code)]
-    {
-        *event_proxy_holder.lock() = None;
-        Ok(())
-    }
+    Ok(())
 }
 
 #[derive(serde::Deserialize)]
@@ -585,6 +1313,64 @@ struct IpcEvent {
     event_type: String,
     callback_id: Option<String>,
     value: Option<String>,
+    x: Option<f64>,
+    y: Option<f64>,
+}
+
+/// Handle a message posted by the page. Runs on the event loop thread, so callbacks are
+/// handed to the dispatcher rather than run here.
+fn handle_ipc(
+    body: &str,
+    sync: &SyncPoint,
+    dispatcher: &Dispatcher,
+    state: &Arc<Mutex<WebViewState>>,
+    event_sender: &Arc<Mutex<Option<EventSender>>>,
+) {
+    let Ok(event) = serde_json::from_str::<IpcEvent>(body) else {
+        return;
+    };
+
+    let args = match event.event_type.as_str() {
+        "sync" => {
+            if let Some(seq) = event.value.and_then(|v| v.parse().ok()) {
+                sync.ack(seq);
+            }
+            return;
+        }
+        "viewport" => {
+            // A virtual list scrolled or resized: x is its scroll offset, y its height
+            let (Some(callback_id), Some(scroll_top), Some(height)) = (event.callback_id, event.x, event.y)
+            else {
+                return;
+            };
+            // The row renderer's stable ID is "<list id>:render_row"
+            let Some((list_id, _)) = callback_id.rsplit_once(':') else {
+                return;
+            };
+            let list_id = list_id.to_string();
+            state.lock().viewports.insert(list_id.clone(), Viewport { scroll_top, height });
+            let (state, event_sender) = (state.clone(), event_sender.clone());
+            dispatcher.run(
+                &callback_id,
+                Box::new(move |py| scroll_virtual_list(py, &state, &event_sender, &list_id)),
+            );
+            return;
+        }
+        "click" | "mouse_enter" | "mouse_leave" | "mouse_down" | "mouse_up" => CallbackArgs::Empty,
+        "input" | "change" => match event.value {
+            Some(value) => CallbackArgs::Value(value),
+            None => return,
+        },
+        "mouse_move" => match (event.x, event.y) {
+            (Some(x), Some(y)) => CallbackArgs::Point(x, y),
+            _ => return,
+        },
+        _ => return,
+    };
+
+    if let Some(callback_id) = event.callback_id {
+        dispatcher.dispatch(callback_id, args);
+    }
 }
 
 /// Parse a hex color string like "#1a1a1a" or "#1a1a1aff" to RGBA tuple
@@ -608,8 +1394,10 @@ fn parse_hex_color(hex: &str) -> Option<(u8, u8, u8, u8)> {
     }
 }
 
-fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -> String {
-    let root_content = content.unwrap_or(r#"<div style="display:flex;align-items:center;justify-content:center;height:100%;color:#666;">Loading...</div>"#);
+/// The page the webview is built with. The rest of a tree too large for one page is
+/// fetched and inserted after the first paint.
+fn get_initial_html(page: &InitialPage, background_color: (u8, u8, u8, u8)) -> String {
+    let root_content = page.content.as_deref().unwrap_or(r#"<div style="display:flex;align-items:center;justify-content:center;height:100%;color:#666;">Loading...</div>"#);
     let (r, g, b, _a) = background_color;
 
     format!(
@@ -647,12 +1435,17 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
         .justify-between {{ justify-content: space-between; }}
         .justify-start {{ justify-content: flex-start; }}
         .justify-end {{ justify-content: flex-end; }}
+        .wry-vlist {{ position: relative; overflow-y: auto; }}
+        .wry-vlist::before {{ content: ''; display: block; height: var(--wry-list-height, 0px); }}
+        .wry-vlist > * {{ position: absolute; left: 0; right: 0; }}
         button:focus, button:focus-visible,
         input:focus, input:focus-visible,
         select:focus, select:focus-visible {{
             outline: none;
         }}
     </style>
+    <style id="wry-styles">{style_rules}</style>
+    <style id="wry-state-styles"></style>
 </head>
 <body>
     <div id="root">{}</div>
@@ -664,7 +1457,7 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             }}));
         }}
 
-        function handleInput(callbackId, value) {{
+        function postInput(callbackId, value) {{
             window.ipc.postMessage(JSON.stringify({{
                 event_type: 'input',
                 callback_id: callbackId,
@@ -672,6 +1465,67 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             }}));
         }}
 
+        // Per-callback rate limiting state, so only the latest value crosses the IPC boundary
+        var inputLimits = {{}};
+
+        function handleInput(callbackId, value, debounceMs, throttleMs) {{
+            if (!debounceMs && !throttleMs) {{
+                postInput(callbackId, value);
+                return;
+            }}
+            var s = inputLimits[callbackId] || (inputLimits[callbackId] = {{ timer: null, last: 0, value: null }});
+            s.value = value;
+            if (debounceMs) {{
+                clearTimeout(s.timer);
+                s.timer = setTimeout(function() {{
+                    s.timer = null;
+                    postInput(callbackId, s.value);
+                }}, debounceMs);
+                return;
+            }}
+            if (s.timer) return;
+            var wait = s.last + throttleMs - Date.now();
+            if (wait <= 0) {{
+                s.last = Date.now();
+                postInput(callbackId, value);
+            }} else {{
+                s.timer = setTimeout(function() {{
+                    s.timer = null;
+                    s.last = Date.now();
+                    postInput(callbackId, s.value);
+                }}, wait);
+            }}
+        }}
+
+        var pendingMoves = {{}};
+
+        function handleMouseMove(callbackId, e, el) {{
+            var pending = pendingMoves[callbackId];
+            if (pending) {{
+                pending.x = e.clientX;
+                pending.y = e.clientY;
+                return;
+            }}
+            pending = pendingMoves[callbackId] = {{ x: e.clientX, y: e.clientY }};
+            requestAnimationFrame(function() {{
+                delete pendingMoves[callbackId];
+                var rect = el.getBoundingClientRect();
+                window.ipc.postMessage(JSON.stringify({{
+                    event_type: 'mouse_move',
+                    callback_id: callbackId,
+                    x: pending.x - rect.left,
+                    y: pending.y - rect.top
+                }}));
+            }});
+        }}
+
+        function ackSync(seq) {{
+            window.ipc.postMessage(JSON.stringify({{
+                event_type: 'sync',
+                value: String(seq)
+            }}));
+        }}
+
         function handleMouseEvent(callbackId, eventType) {{
             window.ipc.postMessage(JSON.stringify({{
                 event_type: eventType,
@@ -679,22 +1533,6 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             }}));
         }}
 
-        function patchElementById(elementId, t) {{
-            var el = document.getElementById(elementId);
-            if (el) {{
-                var expectedTag = getTagForType(t.element_type);
-                if (el.tagName === expectedTag) {{
-                    patchElement(el, t);
-                    patchChildren(el, t.children || []);
-                }} else {{
-                    var newEl = renderElement(t);
-                    el.replaceWith(newEl);
-                }}
-            }} else {{
-                console.warn('Element not found: ' + elementId);
-            }}
-        }}
-
         function handleChange(callbackId, value) {{
             window.ipc.postMessage(JSON.stringify({{
                 event_type: 'change',
@@ -703,137 +1541,6 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             }}));
         }}
 
-        function buildStyleString(t) {{
-            var s = [];
-            
-            // Element-type specific defaults
-            if (t.element_type === 'button') {{
-                s.push('cursor: ' + (t.cursor || 'pointer'));
-                s.push('border: ' + (t.border_width != null ? t.border_width + 'px solid ' + (t.border_color || '#333') : 'none'));
-                s.push('outline: none');
-                s.push('font-size: ' + (t.font_size != null ? t.font_size + 'px' : '14px'));
-                s.push('background: ' + (t.background_color || '#3b82f6'));
-                s.push('color: ' + (t.text_color || 'white'));
-                s.push('border-radius: ' + (t.border_radius != null ? t.border_radius + 'px' : '6px'));
-                s.push('padding: ' + (t.padding != null ? t.padding + 'px' : '8px 16px'));
-            }} else if (t.element_type === 'input') {{
-                s.push('outline: none');
-                s.push('padding: ' + (t.padding != null ? t.padding + 'px' : '8px 12px'));
-                s.push('border: ' + (t.border_width != null ? t.border_width + 'px solid ' + (t.border_color || '#555') : '1px solid #555'));
-                s.push('border-radius: ' + (t.border_radius != null ? t.border_radius + 'px' : '4px'));
-                s.push('background: ' + (t.background_color || '#2a2a3a'));
-                s.push('color: ' + (t.text_color || 'white'));
-                s.push('font-size: ' + (t.font_size != null ? t.font_size + 'px' : '14px'));
-                if (t.cursor) s.push('cursor: ' + t.cursor);
-            }} else if (t.element_type === 'select') {{
-                s.push('outline: none');
-                s.push('padding: ' + (t.padding != null ? t.padding + 'px' : '8px 12px'));
-                s.push('font-size: ' + (t.font_size != null ? t.font_size + 'px' : '14px'));
-                s.push('cursor: ' + (t.cursor || 'pointer'));
-                if (t.background_color) s.push('background: ' + t.background_color);
-                if (t.text_color) s.push('color: ' + t.text_color);
-                if (t.border_radius != null) s.push('border-radius: ' + t.border_radius + 'px');
-                if (t.border_width != null) s.push('border: ' + t.border_width + 'px solid ' + (t.border_color || '#333'));
-            }} else {{
-                // Generic elements (div, span, etc.)
-                if (t.size_full) {{ s.push('width: 100%'); s.push('height: 100%'); }}
-                if (t.background_color) s.push('background-color: ' + t.background_color);
-                if (t.text_color) s.push('color: ' + t.text_color);
-                if (t.border_radius != null) s.push('border-radius: ' + t.border_radius + 'px');
-                if (t.border_width != null && t.border_color) s.push('border: ' + t.border_width + 'px solid ' + t.border_color);
-                if (t.padding != null) s.push('padding: ' + t.padding + 'px');
-                if (t.font_size != null) s.push('font-size: ' + t.font_size + 'px');
-                if (t.cursor) s.push('cursor: ' + t.cursor);
-            }}
-            
-            // Common properties for all element types
-            if (t.width != null) s.push('width: ' + t.width + 'px');
-            if (t.height != null) s.push('height: ' + t.height + 'px');
-            if (t.min_width != null) s.push('min-width: ' + t.min_width + 'px');
-            if (t.max_width != null) s.push('max-width: ' + t.max_width + 'px');
-            if (t.min_height != null) s.push('min-height: ' + t.min_height + 'px');
-            if (t.max_height != null) s.push('max-height: ' + t.max_height + 'px');
-            if (t.flex_direction) s.push('display: flex; flex-direction: ' + t.flex_direction);
-            if (t.align_items) s.push('align-items: ' + t.align_items);
-            if (t.justify_content) s.push('justify-content: ' + t.justify_content);
-            if (t.gap != null) s.push('gap: ' + t.gap + 'px');
-            if (t.flex_wrap) s.push('flex-wrap: ' + t.flex_wrap);
-            if (t.flex_grow != null) s.push('flex-grow: ' + t.flex_grow);
-            if (t.flex_shrink != null) s.push('flex-shrink: ' + t.flex_shrink);
-            if (t.flex_basis) s.push('flex-basis: ' + t.flex_basis);
-            if (t.align_self) s.push('align-self: ' + t.align_self);
-            if (t.display_grid) s.push('display: grid');
-            if (t.grid_template_columns) s.push('grid-template-columns: ' + t.grid_template_columns);
-            if (t.grid_template_rows) s.push('grid-template-rows: ' + t.grid_template_rows);
-            if (t.grid_column) s.push('grid-column: ' + t.grid_column);
-            if (t.grid_row) s.push('grid-row: ' + t.grid_row);
-            if (t.place_items) s.push('place-items: ' + t.place_items);
-            if (t.padding_top != null) s.push('padding-top: ' + t.padding_top + 'px');
-            if (t.padding_right != null) s.push('padding-right: ' + t.padding_right + 'px');
-            if (t.padding_bottom != null) s.push('padding-bottom: ' + t.padding_bottom + 'px');
-            if (t.padding_left != null) s.push('padding-left: ' + t.padding_left + 'px');
-            if (t.margin != null) s.push('margin: ' + t.margin + 'px');
-            if (t.margin_top != null) s.push('margin-top: ' + t.margin_top + 'px');
-            if (t.margin_right != null) s.push('margin-right: ' + t.margin_right + 'px');
-            if (t.margin_bottom != null) s.push('margin-bottom: ' + t.margin_bottom + 'px');
-            if (t.margin_left != null) s.push('margin-left: ' + t.margin_left + 'px');
-            if (t.border_radius_top_left != null) s.push('border-top-left-radius: ' + t.border_radius_top_left + 'px');
-            if (t.border_radius_top_right != null) s.push('border-top-right-radius: ' + t.border_radius_top_right + 'px');
-            if (t.border_radius_bottom_right != null) s.push('border-bottom-right-radius: ' + t.border_radius_bottom_right + 'px');
-            if (t.border_radius_bottom_left != null) s.push('border-bottom-left-radius: ' + t.border_radius_bottom_left + 'px');
-            if (t.border_width_top != null) s.push('border-top: ' + t.border_width_top + 'px solid ' + (t.border_color_top || t.border_color || '#333'));
-            if (t.border_width_right != null) s.push('border-right: ' + t.border_width_right + 'px solid ' + (t.border_color_right || t.border_color || '#333'));
-            if (t.border_width_bottom != null) s.push('border-bottom: ' + t.border_width_bottom + 'px solid ' + (t.border_color_bottom || t.border_color || '#333'));
-            if (t.border_width_left != null) s.push('border-left: ' + t.border_width_left + 'px solid ' + (t.border_color_left || t.border_color || '#333'));
-            if (t.overflow) s.push('overflow: ' + t.overflow);
-            if (t.text_align) s.push('text-align: ' + t.text_align);
-            if (t.word_wrap) s.push('word-wrap: ' + t.word_wrap);
-            if (t.position) s.push('position: ' + t.position);
-            if (t.top != null) s.push('top: ' + t.top + 'px');
-            if (t.right != null) s.push('right: ' + t.right + 'px');
-            if (t.bottom != null) s.push('bottom: ' + t.bottom + 'px');
-            if (t.left != null) s.push('left: ' + t.left + 'px');
-            if (t.font_weight) s.push('font-weight: ' + t.font_weight);
-            if (t.transition) s.push('transition: ' + t.transition);
-            if (t.opacity != null) s.push('opacity: ' + t.opacity);
-            if (t.object_fit) s.push('object-fit: ' + t.object_fit);
-            if (t.style) s.push(t.style);
-            return s.join('; ');
-        }}
-
-        function buildStateStyles(t) {{
-            var id = t.user_id || t.id;
-            var css = '';
-            var hover = [];
-            var focus = [];
-            
-            // Add hover styles
-            if (t.hover_bg) hover.push('background-color: ' + t.hover_bg + ' !important');
-            if (t.hover_text_color) hover.push('color: ' + t.hover_text_color + ' !important');
-            if (t.hover_border_color) hover.push('border-color: ' + t.hover_border_color + ' !important');
-            if (t.hover_opacity != null) hover.push('opacity: ' + t.hover_opacity + ' !important');
-            if (t.hover_scale != null) hover.push('transform: scale(' + t.hover_scale + ') !important');
-            
-            // For buttons, ensure cursor stays pointer on hover (unless disabled)
-            if (t.element_type === 'button' && !t.disabled) {{
-                hover.push('cursor: pointer !important');
-            }}
-            
-            // Add focus styles
-            if (t.focus_bg) focus.push('background-color: ' + t.focus_bg + ' !important');
-            if (t.focus_text_color) focus.push('color: ' + t.focus_text_color + ' !important');
-            if (t.focus_border_color) focus.push('border-color: ' + t.focus_border_color + ' !important');
-            
-            // For buttons/inputs, ensure outline stays none on focus
-            if (t.element_type === 'button' || t.element_type === 'input' || t.element_type === 'select') {{
-                focus.push('outline: none !important');
-            }}
-            
-            if (hover.length) css += '#' + id + ':hover {{ ' + hover.join('; ') + ' }} ';
-            if (focus.length) css += '#' + id + ':focus {{ ' + focus.join('; ') + ' }} ';
-            return css;
-        }}
-
         function getTagForType(type) {{
             if (type === 'text') return 'SPAN';
             if (type === 'button') return 'BUTTON';
@@ -845,14 +1552,61 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
         }}
 
         function patchAttrs(el, t) {{
-            if (t.user_id && el.id !== t.user_id) el.id = t.user_id;
-            if (t.class_names && t.class_names.length) {{
-                el.className = t.class_names.join(' ');
-            }} else if (el.className) {{
-                el.className = '';
+            var domId = t.user_id || t.id;
+            if (el.id !== domId) el.id = domId;
+            if (el.getAttribute('data-wry-id') !== t.id) el.setAttribute('data-wry-id', t.id);
+            var className = classNameOf(t);
+            if (el.className !== className) el.className = className;
+            patchVirtual(el, t);
+        }}
+
+        // Size a virtual list for all of its rows, and put each rendered row at its index
+        function patchVirtual(el, t) {{
+            if (t.element_type === 'virtual_list') {{
+                el.style.setProperty('--wry-list-height', (t.row_count || 0) * (t.row_height || 0) + 'px');
+                if (el.getAttribute('data-wry-rows') !== t.render_row) el.setAttribute('data-wry-rows', t.render_row);
+                watchList(el);
+                reportViewport(el);
+            }}
+            if (t.row_index != null) {{
+                el.style.top = t.row_index * t.row_height + 'px';
+                el.style.height = t.row_height + 'px';
             }}
         }}
 
+        // Virtual lists report what they show once per frame; Rust answers with the rows
+        var pendingViewports = {{}};
+
+        function reportViewport(el) {{
+            var callbackId = el.getAttribute('data-wry-rows');
+            if (!callbackId || pendingViewports[callbackId]) return;
+            pendingViewports[callbackId] = true;
+            requestAnimationFrame(function() {{
+                delete pendingViewports[callbackId];
+                window.ipc.postMessage(JSON.stringify({{
+                    event_type: 'viewport',
+                    callback_id: callbackId,
+                    x: el.scrollTop,
+                    y: el.clientHeight
+                }}));
+            }});
+        }}
+
+        function watchList(el) {{
+            if (el.wryWatched) return;
+            el.wryWatched = true;
+            el.addEventListener('scroll', function() {{ reportViewport(el); }}, {{ passive: true }});
+            new ResizeObserver(function() {{ reportViewport(el); }}).observe(el);
+        }}
+
+        // A node's own classes plus the shared class holding its style
+        function classNameOf(t) {{
+            var names = t.class_names ? t.class_names.slice() : [];
+            if (t.element_type === 'virtual_list') names.push('wry-vlist');
+            if (t.style_class) names.push(t.style_class);
+            return names.join(' ');
+        }}
+
         function patchEvents(el, t) {{
             if (t.on_click) {{
                 el.onclick = function() {{ handleClick(t.on_click); }};
@@ -879,8 +1633,15 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             }} else {{
                 el.onmouseup = null;
             }}
+            if (t.on_mouse_move) {{
+                el.onmousemove = function(e) {{ handleMouseMove(t.on_mouse_move, e, el); }};
+            }} else {{
+                el.onmousemove = null;
+            }}
             if (t.on_input) {{
-                el.oninput = function() {{ handleInput(t.on_input, el.value); }};
+                el.oninput = function() {{
+                    handleInput(t.on_input, el.value, t.input_debounce_ms || 0, t.input_throttle_ms || 0);
+                }};
             }} else {{
                 el.oninput = null;
             }}
@@ -897,10 +1658,6 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
         function patchElement(el, t) {{
             var hadFocus = document.activeElement === el;
             patchAttrs(el, t);
-            var newStyle = buildStyleString(t);
-            if (el.style.cssText !== newStyle) {{
-                el.style.cssText = newStyle;
-            }}
             patchEvents(el, t);
             if (t.element_type === 'text' || t.element_type === 'button') {{
                 var txt = t.text_content || '';
@@ -926,7 +1683,73 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             if (hadFocus && document.activeElement !== el) el.focus();
         }}
 
+        function isKeyed(nodes, getKey) {{
+            var seen = {{}};
+            for (var i = 0; i < nodes.length; i++) {{
+                var k = getKey(nodes[i]);
+                if (k == null || seen[k]) return false;
+                seen[k] = true;
+            }}
+            return true;
+        }}
+
+        function longestIncreasing(seq) {{
+            var tails = [], prev = new Array(seq.length), marks = new Array(seq.length);
+            for (var i = 0; i < seq.length; i++) {{
+                if (seq[i] < 0) continue;
+                var lo = 0, hi = tails.length;
+                while (lo < hi) {{
+                    var mid = (lo + hi) >> 1;
+                    if (seq[tails[mid]] < seq[i]) lo = mid + 1; else hi = mid;
+                }}
+                prev[i] = lo > 0 ? tails[lo - 1] : -1;
+                tails[lo] = i;
+            }}
+            var cur = tails.length ? tails[tails.length - 1] : -1;
+            while (cur >= 0) {{
+                marks[cur] = true;
+                cur = prev[cur];
+            }}
+            return marks;
+        }}
+
+        function patchKeyedChildren(parent, newChildren) {{
+            var oldEls = Array.prototype.slice.call(parent.children);
+            var oldIndex = {{}};
+            for (var i = 0; i < oldEls.length; i++) oldIndex[oldEls[i].dataset.wryKey] = i;
+            var sources = [], els = [], used = {{}};
+            for (var i = 0; i < newChildren.length; i++) {{
+                var nc = newChildren[i];
+                var j = oldIndex.hasOwnProperty(nc.key) ? oldIndex[nc.key] : -1;
+                if (j >= 0 && oldEls[j].tagName === getTagForType(nc.element_type)) {{
+                    patchElement(oldEls[j], nc);
+                    patchChildren(oldEls[j], nc.children || []);
+                    used[j] = true;
+                    sources.push(j);
+                    els.push(oldEls[j]);
+                }} else {{
+                    sources.push(-1);
+                    els.push(renderElement(nc));
+                }}
+            }}
+            for (var i = 0; i < oldEls.length; i++) {{
+                if (!used[i]) parent.removeChild(oldEls[i]);
+            }}
+            var stays = longestIncreasing(sources);
+            var anchor = null;
+            for (var i = els.length - 1; i >= 0; i--) {{
+                if (!stays[i]) parent.insertBefore(els[i], anchor);
+                anchor = els[i];
+            }}
+        }}
+
         function patchChildren(parent, newChildren) {{
+            if (parent.children.length && newChildren.length
+                && isKeyed(newChildren, function(c) {{ return c.key; }})
+                && isKeyed(parent.children, function(c) {{ return c.dataset.wryKey; }})) {{
+                patchKeyedChildren(parent, newChildren);
+                return;
+            }}
             for (var i = 0; i < newChildren.length; i++) {{
                 var nc = newChildren[i];
                 var oldChild = parent.children[i];
@@ -952,8 +1775,10 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             var el = document.createElement(tag);
             el.id = t.user_id || t.id;
             el.setAttribute('data-wry-id', t.id);
-            el.style.cssText = buildStyleString(t);
-            if (t.class_names && t.class_names.length) el.className = t.class_names.join(' ');
+            if (t.key != null) el.setAttribute('data-wry-key', t.key);
+            var className = classNameOf(t);
+            if (className) el.className = className;
+            patchVirtual(el, t);
             patchEvents(el, t);
             if (t.element_type === 'text' || t.element_type === 'button') {{
                 el.textContent = t.text_content || '';
@@ -978,24 +1803,48 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
             return el;
         }}
 
-        function updateStateStyles(t) {{
-            var styleId = 'wry-state-styles';
-            var styleEl = document.getElementById(styleId);
-            if (!styleEl) {{
-                styleEl = document.createElement('style');
-                styleEl.id = styleId;
-                document.head.appendChild(styleEl);
-            }}
-            var css = '';
-            function collectStyles(node) {{
-                css += buildStateStyles(node);
-                var children = node.children || [];
-                for (var i = 0; i < children.length; i++) {{
-                    collectStyles(children[i]);
+        function addStyleRules(rules) {{
+            var sheet = document.getElementById('wry-styles').sheet;
+            for (var i = 0; i < rules.length; i++) {{
+                try {{
+                    sheet.insertRule(rules[i], sheet.cssRules.length);
+                }} catch (e) {{
+                    console.warn('Invalid style rule: ' + rules[i]);
                 }}
             }}
-            collectStyles(t);
-            if (styleEl.textContent !== css) styleEl.textContent = css;
+        }}
+
+        function resetStyleRules() {{
+            document.getElementById('wry-styles').textContent = '';
+        }}
+
+        // The :hover/:focus rules in #wry-state-styles, by the node ID they belong to
+        var stateRules = {{}};
+
+        function applyStateRules(changes) {{
+            var sheet = document.getElementById('wry-state-styles').sheet;
+            var stale = new Set();
+            for (var id in changes) {{
+                (stateRules[id] || []).forEach(function(rule) {{ stale.add(rule); }});
+                delete stateRules[id];
+            }}
+            // deleteRule() takes an index, so find every stale rule in one pass
+            for (var i = sheet.cssRules.length - 1; stale.size && i >= 0; i--) {{
+                if (stale.delete(sheet.cssRules[i])) sheet.deleteRule(i);
+            }}
+            for (var id in changes) {{
+                var rules = changes[id];
+                if (!rules) continue;
+                var added = [];
+                for (var j = 0; j < rules.length; j++) {{
+                    try {{
+                        added.push(sheet.cssRules[sheet.insertRule(rules[j], sheet.cssRules.length)]);
+                    }} catch (e) {{
+                        console.warn('Invalid state rule: ' + rules[j]);
+                    }}
+                }}
+                stateRules[id] = added;
+            }}
         }}
 
         function patchRoot(t) {{
@@ -1008,12 +1857,356 @@ fn get_initial_html(content: Option<&str>, background_color: (u8, u8, u8, u8)) -
                 patchElement(existing, t);
                 patchChildren(existing, t.children || []);
             }}
-            updateStateStyles(t);
         }}
 
+        function findNode(id) {{
+            return document.querySelector('[data-wry-id="' + id + '"]');
+        }}
+
+        function placeNode(parentId, beforeId, el) {{
+            var parent = findNode(parentId);
+            if (!parent) {{
+                console.warn('Node not found: ' + parentId);
+                return;
+            }}
+            parent.insertBefore(el, beforeId != null ? findNode(beforeId) : null);
+        }}
+
+        function applyOp(op) {{
+            if (op.op === 'insert') {{
+                placeNode(op.parent, op.before, renderElement(op.node));
+                return;
+            }}
+            var el = findNode(op.id);
+            if (!el) {{
+                console.warn('Node not found: ' + op.id);
+                return;
+            }}
+            if (op.op === 'update') {{
+                patchElement(el, op.node);
+            }} else if (op.op === 'replace') {{
+                el.replaceWith(renderElement(op.node));
+            }} else if (op.op === 'move') {{
+                placeNode(op.parent, op.before, el);
+            }} else if (op.op === 'remove') {{
+                el.remove();
+            }}
+        }}
+
+        var frameQueue = [];
+
+        function runFrame() {{
+            var queue = frameQueue;
+            frameQueue = [];
+            for (var i = 0; i < queue.length; i++) {{
+                // A failing update mustn't drop the ones after it, or their sync acks
+                try {{
+                    queue[i]();
+                }} catch (e) {{
+                    console.error('Failed to apply update', e);
+                }}
+            }}
+        }}
+
+        function scheduleFrame(fn) {{
+            frameQueue.push(fn);
+            if (frameQueue.length > 1) return;
+            // Hidden pages get no animation frames, so apply right away
+            if (document.hidden) {{
+                runFrame();
+            }} else {{
+                requestAnimationFrame(runFrame);
+            }}
+        }}
+
+        document.addEventListener('visibilitychange', function() {{
+            if (document.hidden && frameQueue.length) runFrame();
+        }});
+
+        // Flushes from Rust, oldest first. Each waits for the payloads it fetches and for
+        // every flush before it, so updates always apply in the order they were sent.
+        var deliveries = [];
+
+        function drainDeliveries() {{
+            while (deliveries.length && deliveries[0].waiting === 0) {{
+                scheduleFrame(deliveries.shift().run);
+            }}
+        }}
+
+        function deliver(ids, apply) {{
+            var payloads = {{}};
+            var delivery = {{
+                waiting: ids.length,
+                run: function() {{ apply(payloads); }}
+            }};
+            deliveries.push(delivery);
+            ids.forEach(function(id) {{
+                fetch({payload_url} + id)
+                    .then(function(response) {{ return response.json(); }})
+                    .then(function(value) {{ payloads[id] = value; }})
+                    .catch(function(e) {{ console.error('Failed to fetch update ' + id, e); }})
+                    .then(function() {{
+                        delivery.waiting--;
+                        drainDeliveries();
+                    }});
+            }});
+            drainDeliveries();
+        }}
+
+        // The rest of a tree too large for the first page, inserted one chunk per frame
+        // once the first page has painted. Flushes from Rust wait until it has all landed.
+        function streamRest(ids) {{
+            if (!ids.length) return;
+            var delivery = {{ waiting: 1, run: function() {{}} }};
+            deliveries.push(delivery);
+            var next = 0;
+            function step() {{
+                if (next === ids.length) {{
+                    delivery.waiting--;
+                    drainDeliveries();
+                    return;
+                }}
+                var id = ids[next++];
+                fetch({payload_url} + id)
+                    .then(function(response) {{ return response.json(); }})
+                    .then(function(p) {{
+                        scheduleFrame(function() {{
+                            try {{
+                                applyPatch(p);
+                            }} finally {{
+                                step();
+                            }}
+                        }});
+                    }}, function(e) {{
+                        console.error('Failed to fetch chunk ' + id, e);
+                        step();
+                    }});
+            }}
+            scheduleFrame(function() {{ setTimeout(step, 0); }});
+        }}
+
+        function applyPatch(p) {{
+            var ops = p.ops || [];
+            for (var i = 0; i < ops.length; i++) {{
+                applyOp(ops[i]);
+            }}
+        }}
+
+        applyStateRules({state_rules});
+        document.querySelectorAll('[data-wry-rows]').forEach(watchList);
+        streamRest({stream});
+
     </script>
 </body>
 </html>"#,
-        r, g, b, root_content
+        r,
+        g,
+        b,
+        root_content,
+        payload_url = serde_json::to_string(&protocol::url("payload/")).unwrap(),
+        stream = serde_json::to_string(&page.stream).unwrap(),
+        style_rules = page.css,
+        state_rules = if page.state_rules.is_empty() { "{}" } else { &page.state_rules }.replace("</", "<\\/"),
     )
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_ui_thread_rejects_other_threads() {
+        let owner = OnceLock::new();
+        assert!(claim_ui_thread(&owner).is_ok());
+        assert!(claim_ui_thread(&owner).is_ok());
+
+        let other = thread::scope(|scope| scope.spawn(|| claim_ui_thread(&owner)).join().unwrap());
+        assert!(other.is_err());
+    }
+
+    #[test]
+    fn test_root_patch_supersedes_queue() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        state.queue(DomUpdate::ApplyPatch("{}".to_string()));
+        state.queue(DomUpdate::Sync(1));
+        state.queue(DomUpdate::ApplyPatch("{}".to_string()));
+        state.queue(DomUpdate::PatchRoot("{}".to_string()));
+        assert_eq!(
+            state.outbox,
+            vec![DomUpdate::Sync(1), DomUpdate::PatchRoot("{}".to_string())]
+        );
+    }
+
+    #[test]
+    fn test_root_patch_keeps_style_rules() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        state.queue(DomUpdate::ApplyPatch("{}".to_string()));
+        state.styles.class_for("color: red");
+        state.queue_styles();
+        state.queue(DomUpdate::PatchRoot("{}".to_string()));
+        assert_eq!(state.outbox.len(), 2);
+        assert!(matches!(&state.outbox[0], DomUpdate::AddStyles(rules) if rules.contains("color: red")));
+
+        // Rules are sent once
+        state.styles.class_for("color: red");
+        state.queue_styles();
+        assert_eq!(state.outbox.len(), 2);
+    }
+
+    /// A root with one button, bound the way set_root() binds it
+    fn bound_root(render: usize, bindings: &mut HashMap<String, String>) -> ElementDef {
+        let mut button = ElementDef::default();
+        button.element_type = "button".to_string();
+        button.on_click = Some(format!("el_{}_0", render));
+        let mut tree = ElementDef::default();
+        tree.children.push(button);
+        assign_stable_ids(&mut tree, "r");
+        bind_callbacks(&mut tree, bindings);
+        tree
+    }
+
+    #[test]
+    fn test_first_root_on_running_page_keeps_handlers_bound() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        let tree = bound_root(1, &mut state.bindings);
+        // run() started before any set_root(), so the page gets the whole tree
+        let json = match state.commit_root(tree) {
+            Some(DomUpdate::PatchRoot(json)) => json,
+            other => panic!("expected a root patch, got {:?}", other),
+        };
+        assert!(json.contains("\"r-0:click\""));
+        assert!(!json.contains("el_1_0"));
+
+        // The same handler next render diffs to nothing and stays reachable
+        let mut bindings = HashMap::new();
+        let tree = bound_root(2, &mut bindings);
+        state.bindings = bindings;
+        assert_eq!(state.commit_root(tree), None);
+        assert_eq!(state.bindings["r-0:click"], "el_2_0");
+    }
+
+    #[test]
+    fn test_restyle_sends_bound_tree() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        let tree = bound_root(1, &mut state.bindings);
+        state.commit_root(tree);
+        for i in 0..=MAX_STYLE_CLASSES {
+            state.styles.class_for(&format!("width: {}px", i));
+        }
+        let tree = bound_root(2, &mut state.bindings);
+        match state.commit_root(tree) {
+            Some(DomUpdate::PatchRoot(json)) => assert!(json.contains("\"r-0:click\"")),
+            other => panic!("expected a root patch, got {:?}", other),
+        }
+        assert!(state.outbox.contains(&DomUpdate::ResetStyles));
+    }
+
+    #[test]
+    fn test_partial_updates_restyle_when_sheet_is_full() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        let tree = bound_root(1, &mut state.bindings);
+        state.commit_root(tree);
+        state.outbox.clear();
+        let no_loop = Mutex::new(None);
+        restyle_if_full(&mut state, &no_loop);
+        assert!(state.outbox.is_empty());
+
+        // An update_element() or scrolled list that pushes the sheet over the limit
+        for i in 0..=MAX_STYLE_CLASSES {
+            state.styles.class_for(&format!("width: {}px", i));
+        }
+        state.queue(DomUpdate::ApplyPatch("{\"ops\":[]}".to_string()));
+        restyle_if_full(&mut state, &no_loop);
+        assert!(state.styles.len() < MAX_STYLE_CLASSES);
+        assert_eq!(state.outbox[0], DomUpdate::ResetStyles);
+        match state.outbox.last() {
+            Some(DomUpdate::PatchRoot(json)) => assert!(json.contains("\"r-0:click\"")),
+            other => panic!("expected a root patch, got {:?}", other),
+        }
+    }
+
+    #[test]
+    fn test_frame_script_drains_outbox() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        state.queue(DomUpdate::ApplyPatch("{}".to_string()));
+        state.queue(DomUpdate::Sync(3));
+        state.flush_scheduled = true;
+
+        let js = state.take_frame_script().unwrap();
+        assert!(js.starts_with("deliver([], function(p) {"));
+        assert!(js.contains("applyPatch({});"));
+        assert!(js.contains("ackSync(3);"));
+        assert!(state.outbox.is_empty());
+        assert!(!state.flush_scheduled);
+        assert_eq!(state.take_frame_script(), None);
+    }
+
+    #[test]
+    fn test_large_payloads_are_fetched() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        let big = format!("{{\"text_content\":\"{}\"}}", "x".repeat(INLINE_PAYLOAD_LIMIT));
+        state.queue(DomUpdate::ApplyPatch("{}".to_string()));
+        state.queue(DomUpdate::ApplyPatch(big.clone()));
+
+        let js = state.take_frame_script().unwrap();
+        assert!(js.starts_with("deliver([1], function(p) {"));
+        assert!(js.contains("\napplyPatch({});"));
+        assert!(js.contains("if (p[1] !== undefined) applyPatch(p[1]);"));
+        assert!(js.len() < 200);
+        assert_eq!(state.payloads.lock().take(1), Some(big));
+    }
+
+    #[test]
+    fn test_large_initial_tree_is_streamed() {
+        let mut tree = ElementDef::default();
+        tree.children = vec![ElementDef::default(); 25];
+        assign_stable_ids(&mut tree, "r");
+        let mut state = WebViewState::new(10);
+        state.committed = Some(tree);
+        state.prepare_page();
+
+        let page = state.take_initial_page();
+        assert!(page.content.unwrap().contains("data-wry-id=\"r-8\""));
+        assert_eq!(page.stream, vec![1, 2]);
+        assert!(state.pending_page.is_none());
+        let chunk = state.payloads.lock().take(2).unwrap();
+        assert!(chunk.contains("\"parent\":\"r\""));
+    }
+
+    #[test]
+    fn test_new_page_drops_unfetched_payloads() {
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        state.queue(DomUpdate::ApplyPatch("x".repeat(INLINE_PAYLOAD_LIMIT + 1)));
+        state.take_frame_script().unwrap();
+        assert_eq!(state.payloads.lock().len(), 1);
+
+        // The window runs again and the old page never fetched its payload
+        state.committed = Some(ElementDef::default());
+        state.prepare_page();
+        state.take_initial_page();
+        assert_eq!(state.payloads.lock().len(), 0);
+    }
+
+    #[test]
+    fn test_state_rules_follow_the_page() {
+        let mut tree = ElementDef::default();
+        tree.children = vec![ElementDef::default(); 2];
+        tree.children[1].hover_bg = Some("#333".into());
+        assign_stable_ids(&mut tree, "r");
+        let mut state = WebViewState::new(DEFAULT_INITIAL_NODES);
+        state.committed = Some(tree);
+        state.prepare_page();
+
+        let page = state.take_initial_page();
+        assert!(page.state_rules.contains("#r-1:hover"));
+
+        // Rules already on the page aren't sent again
+        let mut fresh = StateRules::new();
+        collect_state_rules(state.committed.as_ref().unwrap(), &mut fresh);
+        state.queue_state_rules("r", fresh);
+        assert!(state.outbox.is_empty());
+
+        state.queue_state_rules("r-1", StateRules::new());
+        assert_eq!(state.outbox, vec![DomUpdate::StateRules("{\"r-1\":null}".to_string())]);
+    }
+}
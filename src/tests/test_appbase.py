@@ -31,3 +31,23 @@ def test_appbase_run_calls_render_and_runs_window():
     # The window should have received an Element instance; verify type and content
     assert isinstance(w.root, wry_py.Element)
     assert "root" in w.root.to_json()
+
+
+def test_appbase_run_async_awaits_window():
+    import asyncio
+
+    events = []
+
+    class DummyApp(AppBase):
+        def render(self):
+            events.append("render")
+
+    class FakeWindow:
+        async def run_async(self):
+            events.append("run_async")
+
+    app = DummyApp()
+    app.set_window(FakeWindow())  # type: ignore
+    asyncio.run(app.run_async())
+
+    assert events == ["render", "run_async"]
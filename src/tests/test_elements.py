@@ -1,4 +1,7 @@
 import json
+import zipfile
+
+import pytest
 import wry_py
 
 
@@ -26,6 +29,71 @@ def test_asset_catalog_basename_lookup():
     assert uri.startswith("data:image/png;base64,")
 
 
+def test_asset_catalog_caches_data_uris():
+    catalog = wry_py.AssetCatalog()
+    catalog.add("cache-test.png", b"\x89PNG\r\n\x1a\n")
+    before = catalog.cache_stats()
+    first = catalog.get_data_uri("cache-test.png")
+    assert catalog.get_data_uri("cache-test.png") == first
+    after = catalog.cache_stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+    catalog.add("cache-test.png", b"GIF89a")
+    assert catalog.get_data_uri("cache-test.png") != first
+
+
+def test_asset_catalog_add_file(tmp_path):
+    path = tmp_path / "lazy-file.png"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n")
+    catalog = wry_py.AssetCatalog()
+    catalog.add_file(path)
+    assert catalog.get_data_uri("lazy-file.png").startswith("data:image/png;base64,")
+
+    catalog.add_file(str(path), name="renamed/lazy.png")
+    assert catalog.get_url("lazy.png") is not None
+
+    with pytest.raises(OSError):
+        catalog.add_file(tmp_path / "missing.png")
+
+
+def test_asset_catalog_add_dir(tmp_path):
+    (tmp_path / "icons" / "dark").mkdir(parents=True)
+    (tmp_path / "icons" / "dir-a.png").write_bytes(b"a")
+    (tmp_path / "icons" / "dark" / "dir-b.png").write_bytes(b"b")
+    (tmp_path / "icons" / "notes.txt").write_bytes(b"c")
+    catalog = wry_py.AssetCatalog()
+    assert catalog.add_dir(tmp_path, "**/*.png") == 2
+    assert catalog.get_url("icons/dark/dir-b.png") is not None
+    assert catalog.get_url("dir-a.png") is not None
+    assert catalog.get_url("notes.txt") is None
+
+
+def test_asset_catalog_add_zip(tmp_path):
+    path = tmp_path / "icons.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("zipped/zip-a.png", b"a" * 1000)
+        archive.writestr("zipped/zip-b.svg", b"<svg/>")
+    catalog = wry_py.AssetCatalog()
+    assert catalog.add_zip(path) == 2
+    assert catalog.get_data_uri("zip-b.svg") == "data:image/svg+xml;base64,PHN2Zy8+"
+
+    (tmp_path / "broken.zip").write_bytes(b"not a zip")
+    with pytest.raises(ValueError):
+        catalog.add_zip(tmp_path / "broken.zip")
+
+
+def test_asset_catalog_url():
+    catalog = wry_py.AssetCatalog()
+    catalog.add("icons/url-test.png", b"\x89PNG\r\n\x1a\n")
+    url = catalog.get_url("url-test.png")
+    assert url is not None
+    assert "asset/icons%2Furl%2Dtest%2Epng?v=" in url
+    catalog.add("icons/url-test.png", b"\x89PNG\r\n\x1a\n")
+    assert catalog.get_url("url-test.png") != url
+    assert catalog.get_url("missing.png") is None
+
+
 def test_div_element():
     el = wry_py.div().build()
     parsed = json.loads(el.to_json())
@@ -81,6 +149,21 @@ def test_select_element():
     assert parsed.get("selected") == "b"
 
 
+def test_virtual_list_element():
+    el = wry_py.virtual_list(100_000, 24, lambda i: wry_py.text(str(i))).overscan(5).build()
+    parsed = json.loads(el.to_json())
+    assert parsed.get("element_type") == "virtual_list"
+    assert parsed.get("row_count") == 100_000
+    assert parsed.get("row_height") == 24
+    assert parsed.get("overscan") == 5
+    assert parsed.get("children") == []
+
+
+def test_virtual_list_needs_row_height():
+    with pytest.raises(ValueError):
+        wry_py.virtual_list(10, 0, lambda i: wry_py.text(str(i)))
+
+
 class TestLayoutMethods:
     def test_size_methods(self):
         el = wry_py.div().width(100).height(200).build()
@@ -284,6 +367,46 @@ class TestChildren:
         parsed = json.loads(el.to_json())
         assert len(parsed.get("children", [])) == 3
 
+    def test_child_returns_same_builder(self):
+        container = wry_py.div()
+        assert container.child_builder(wry_py.text("One")) is container
+        assert container.child(wry_py.text("Two").build()) is container
+        assert container.on_click(lambda: None) is container
+        assert len(json.loads(container.build().to_json())["children"]) == 2
+
+    def test_built_element_is_independent(self):
+        container = wry_py.div().child_text("One")
+        el = container.build()
+        container.child_text("Two")
+        assert len(json.loads(el.to_json())["children"]) == 1
+
+
+class TestBulkChildren:
+    def test_children_from_list(self):
+        el = wry_py.div().children([wry_py.text("A"), wry_py.text("B").build()]).build()
+        parsed = json.loads(el.to_json())
+        assert [c["text_content"] for c in parsed["children"]] == ["A", "B"]
+
+    def test_extend_from_generator(self):
+        el = wry_py.div().child_text("First").extend(wry_py.text(str(i)) for i in range(100)).build()
+        children = json.loads(el.to_json())["children"]
+        assert len(children) == 101
+        assert children[1]["text_content"] == "0"
+        assert children[-1]["text_content"] == "99"
+
+    def test_children_matches_per_child_loop(self):
+        rows = [wry_py.div().child_text(f"Row {i}").on_click(lambda: None) for i in range(10)]
+        looped = wry_py.div()
+        for row in rows:
+            looped.child_builder(row)
+        bulk = wry_py.div().children(rows)
+        children = lambda b: json.loads(b.build().to_json())["children"]
+        assert children(bulk) == children(looped)
+
+    def test_children_rejects_other_types(self):
+        with pytest.raises(TypeError):
+            wry_py.div().children([wry_py.text("A"), "B"])
+
 
 class TestIdentification:
     def test_id(self):
@@ -301,6 +424,16 @@ class TestIdentification:
         parsed = json.loads(el.to_json())
         assert parsed.get("class_names") == ["one", "two", "three"]
 
+    def test_key(self):
+        el = wry_py.div().key("row-1").build()
+        parsed = json.loads(el.to_json())
+        assert parsed.get("key") == "row-1"
+
+    def test_key_omitted_by_default(self):
+        el = wry_py.div().build()
+        parsed = json.loads(el.to_json())
+        assert "key" not in parsed
+
 
 class TestText:
     def test_text_size(self):
@@ -317,3 +450,46 @@ class TestText:
         el = wry_py.text("Hello").text_center().build()
         parsed = json.loads(el.to_json())
         assert parsed.get("text_align") == "center"
+
+
+class TestEvents:
+    def test_on_input_without_rate_limit(self):
+        el = wry_py.input().on_input(lambda value: None).build()
+        parsed = json.loads(el.to_json())
+        assert parsed.get("on_input")
+        assert "input_debounce_ms" not in parsed
+        assert "input_throttle_ms" not in parsed
+
+    def test_on_input_debounce(self):
+        el = wry_py.input().on_input(lambda value: None, debounce_ms=250).build()
+        parsed = json.loads(el.to_json())
+        assert parsed.get("input_debounce_ms") == 250
+
+    def test_on_input_throttle(self):
+        el = wry_py.input().on_input(lambda value: None, throttle_ms=100).build()
+        parsed = json.loads(el.to_json())
+        assert parsed.get("input_throttle_ms") == 100
+
+    def test_on_input_rejects_both_limits(self):
+        with pytest.raises(ValueError):
+            wry_py.input().on_input(lambda value: None, debounce_ms=250, throttle_ms=100)
+
+    def test_on_mouse_move(self):
+        el = wry_py.div().on_mouse_move(lambda x, y: None).build()
+        parsed = json.loads(el.to_json())
+        assert parsed.get("on_mouse_move")
+
+
+def test_built_element_is_frozen():
+    builder = wry_py.text("static").padding(4)
+    el = builder.build()
+    first = el.to_json()
+    assert el.to_json() == first
+
+    # Changing the builder afterwards leaves the built element alone
+    builder.padding(8)
+    assert el.to_json() == first
+    assert builder.build().to_json() != first
+
+    parent = wry_py.div().child(el).child(el).build()
+    assert [c["text_content"] for c in json.loads(parent.to_json())["children"]] == ["static", "static"]
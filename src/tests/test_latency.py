@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import wry_py
+
+needs_display = pytest.mark.skipif(
+    sys.platform.startswith("linux")
+    and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")),
+    reason="needs a display to open a window",
+)
+
+
+def test_sync_returns_immediately_when_not_running():
+    window = wry_py.UiWindow()
+    assert window.sync(timeout=0) is True
+
+
+@needs_display
+def test_update_element_latency():
+    window = wry_py.UiWindow(title="latency")
+    window.set_root(wry_py.div().child(wry_py.text("0").id("counter")).build())
+
+    samples = []
+    errors = []
+
+    def drive():
+        try:
+            deadline = time.monotonic() + 10
+            while not window.is_running() or not window.sync(timeout=5):
+                if time.monotonic() > deadline:
+                    raise TimeoutError("window did not start")
+                time.sleep(0.01)
+
+            for i in range(1, 51):
+                start = time.perf_counter()
+                window.update_element("counter", wry_py.text(str(i)).id("counter").build())
+                assert window.sync(timeout=5)
+                samples.append(time.perf_counter() - start)
+        except Exception as e:  # surfaced on the main thread
+            errors.append(e)
+        finally:
+            window.close()
+
+    threading.Thread(target=drive, daemon=True).start()
+    window.run()
+
+    assert not errors, errors[0]
+    samples.sort()
+    median = samples[len(samples) // 2]
+    # The old GTK timers added up to 66 ms per update. With a direct wakeup the update lands
+    # in the next animation frame, so allow two frames at 60 Hz.
+    assert median < 0.034, f"median update latency {median * 1000:.1f} ms"
@@ -0,0 +1,62 @@
+import pytest
+import wry_py
+
+
+def test_memo_reuses_element_while_deps_match():
+    memo = wry_py.Memo()
+    calls = []
+
+    def header():
+        calls.append("header")
+        return wry_py.text("Header").padding(8)
+
+    first = memo("header", ("light",), header)
+    assert isinstance(first, wry_py.Element)
+    assert memo("header", ("light",), header) is first
+    assert calls == ["header"]
+
+    # Changed deps rebuild the element
+    assert memo("header", ("dark",), header) is not first
+    assert calls == ["header", "header"]
+
+    stats = memo.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    assert memo.hit_rate == pytest.approx(1 / 3)
+
+
+def test_memo_evicts_least_recently_used():
+    memo = wry_py.Memo(max_entries=2)
+    memo("a", 1, lambda: wry_py.text("a").build())
+    memo("b", 1, lambda: wry_py.text("b").build())
+    memo("a", 1, lambda: wry_py.text("a").build())
+    memo("c", 1, lambda: wry_py.text("c").build())
+
+    assert "a" in memo and "c" in memo and "b" not in memo
+    assert memo.evictions == 1
+    assert len(memo) == 2
+
+    with pytest.raises(ValueError):
+        wry_py.Memo(max_entries=0)
+
+
+def test_memo_keeps_callbacks_of_reused_elements():
+    memo = wry_py.Memo()
+    window = wry_py.UiWindow()
+
+    def toolbar():
+        return wry_py.div().child(wry_py.button("Save").on_click(lambda: None).build())
+
+    window.set_root(wry_py.div().child(memo("toolbar", (), toolbar)).build())
+    assert window.stats()["callbacks_live"] == 1
+
+    # Hiding the toolbar releases its callback; the cached element brings it back
+    window.set_root(wry_py.div().build())
+    assert window.stats()["callbacks_live"] == 0
+    window.set_root(wry_py.div().child(memo("toolbar", (), toolbar)).build())
+    assert window.stats()["callbacks_live"] == 1
+    assert memo.hits == 1
+
+
+def test_appbase_has_memo():
+    app = wry_py.AppBase()
+    assert isinstance(app.memo, wry_py.Memo)
@@ -0,0 +1,168 @@
+import pytest
+import wry_py
+
+
+def test_batch_is_a_context_manager():
+    window = wry_py.UiWindow()
+    window.set_root(wry_py.div().child(wry_py.text("0").id("counter")).build())
+
+    with window.batch() as batch:
+        assert batch is not None
+        for i in range(200):
+            window.update_element("counter", wry_py.text(str(i)).id("counter").build())
+
+
+def test_batch_nests():
+    window = wry_py.UiWindow()
+    with window.batch():
+        with window.batch():
+            window.set_root(wry_py.text("inner").build())
+        window.set_root(wry_py.text("outer").build())
+    assert window.sync(timeout=0) is True
+
+
+def test_batch_does_not_swallow_exceptions():
+    window = wry_py.UiWindow()
+    with pytest.raises(ValueError, match="boom"):
+        with window.batch():
+            raise ValueError("boom")
+
+
+def test_stats_reports_dispatch_queue():
+    window = wry_py.UiWindow(callback_workers=3)
+    stats = window.stats()
+    assert stats["callback_workers"] == 3
+    assert stats["callback_queue_depth"] == 0
+    assert stats["callback_queue_peak"] == 0
+    assert stats["callback_worker_depths"] == [0, 0, 0]
+    assert stats["callbacks_dispatched"] == 0
+
+
+def test_default_single_ordered_worker():
+    assert wry_py.UiWindow().stats()["callback_workers"] == 1
+
+
+def test_callback_workers_must_be_positive():
+    with pytest.raises(ValueError):
+        wry_py.UiWindow(callback_workers=0)
+
+
+def test_run_async_needs_running_loop():
+    window = wry_py.UiWindow()
+    with pytest.raises(RuntimeError):
+        window.run_async()
+
+
+class _Handler:
+    """Callable that can be tracked with a weak reference."""
+
+    def __call__(self):
+        pass
+
+
+def _button_list(n, handlers):
+    root = wry_py.div().id("list")
+    for i in range(n):
+        handler = _Handler()
+        handlers.add(handler)
+        root = root.child(wry_py.button(str(i)).on_click(handler).build())
+    return root.build()
+
+
+def test_large_root_before_run_keeps_callbacks():
+    window = wry_py.UiWindow(initial_nodes=10)
+    window.set_root(_button_list(500, set()))
+    assert window.stats()["callbacks_live"] == 500
+
+    window.update_element("list", _button_list(20, set()))
+    assert window.stats()["callbacks_live"] == 20
+
+
+def test_repeated_styles_share_a_class():
+    window = wry_py.UiWindow()
+    rows = [wry_py.text(str(i)).padding(8).text_color("#ccc").build() for i in range(100)]
+    window.set_root(wry_py.div().padding(4).children(rows).build())
+    # One class for the rows and one for the container
+    assert window.stats()["style_classes"] == 2
+
+
+def test_virtual_list_renders_only_rows_in_view():
+    rendered = []
+
+    def render_row(index):
+        rendered.append(index)
+        return wry_py.text(f"row {index}").on_click(lambda: None)
+
+    window = wry_py.UiWindow()
+    rows = wry_py.virtual_list(100_000, 20, render_row).height(400)
+    window.set_root(wry_py.div().child_builder(rows).build())
+
+    # Before the page reports a viewport only the overscan below the top is rendered
+    assert rendered == list(range(10))
+    # One click handler per row, plus render_row itself
+    assert window.stats()["callbacks_live"] == 11
+
+
+def test_virtual_list_rejects_non_elements():
+    window = wry_py.UiWindow()
+    with pytest.raises(TypeError):
+        window.set_root(wry_py.virtual_list(5, 20, lambda index: index).build())
+
+
+def test_rerender_releases_old_callbacks():
+    import gc
+    import weakref
+
+    window = wry_py.UiWindow()
+    handlers = weakref.WeakSet()
+
+    for _ in range(20):
+        window.set_root(_button_list(500, handlers))
+        gc.collect()
+        # Only the current render's handlers survive, however many renders came before
+        assert len(handlers) <= 500
+
+    stats = window.stats()
+    assert stats["callbacks_live"] == 500
+    assert stats["callbacks_collected"] == 19 * 500
+    assert stats["callbacks_pending"] == 0
+
+
+def test_update_element_releases_replaced_callbacks():
+    window = wry_py.UiWindow()
+    window.set_root(
+        wry_py.div()
+        .child(wry_py.button("a").on_click(lambda: None).build())
+        .child(wry_py.div().id("panel").on_click(lambda: None).build())
+        .build()
+    )
+    for _ in range(10):
+        window.update_element("panel", wry_py.div().id("panel").on_click(lambda: None).build())
+
+    stats = window.stats()
+    assert stats["callbacks_live"] == 2
+    assert stats["callbacks_collected"] == 10
+
+
+def test_update_element_rejects_unknown_ids():
+    window = wry_py.UiWindow()
+    with pytest.raises(ValueError):
+        window.update_element("panel", wry_py.div().id("panel").build())
+
+    window.set_root(wry_py.div().child(wry_py.div().id("panel").build()).build())
+    with pytest.raises(ValueError):
+        window.update_element("missing", wry_py.div().id("missing").on_click(lambda: None).build())
+    assert window.stats()["callbacks_live"] == 0
+
+
+def test_remounted_element_keeps_its_handlers():
+    window = wry_py.UiWindow()
+    toolbar = wry_py.button("Save").on_click(lambda: None).build()
+
+    window.set_root(wry_py.div().child(toolbar).build())
+    window.set_root(wry_py.div().build())
+    assert window.stats()["callbacks_live"] == 0
+
+    # The element still has its callable, so showing it again binds it again
+    window.set_root(wry_py.div().child(toolbar).build())
+    assert window.stats()["callbacks_live"] == 1
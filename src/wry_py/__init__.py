@@ -1,11 +1,13 @@
-from .wry_py import Element, ElementBuilder, UiWindow, div, text, button, input, image, checkbox, radio, select, AssetCatalog
+from .wry_py import Element, ElementBuilder, UiWindow, div, text, button, input, image, checkbox, radio, select, virtual_list, AssetCatalog
 from .app import AppBase
+from .memo import Memo
 
 __all__ = [
     "Element",
     "ElementBuilder",
     "UiWindow",
     "AppBase",
+    "Memo",
     "div",
     "text",
     "button",
@@ -14,5 +16,6 @@ __all__ = [
     "checkbox",
     "radio",
     "select",
+    "virtual_list",
     "AssetCatalog",
 ]
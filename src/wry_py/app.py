@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Optional, TYPE_CHECKING
 
+from .memo import Memo
+
 if TYPE_CHECKING:
     from .wry_py import UiWindow, Element
 
@@ -12,10 +14,14 @@ class AppBase:
     Subclass this and implement `render()` to build the UI tree. Use
     `set_window()` to receive the `UiWindow` the app will use. Calling
     `run()` will call `render()` once and start the window event loop.
+
+    `self.memo` is a `Memo` that `render()` can use to reuse parts of the
+    tree whose inputs haven't changed since the last render.
     """
 
     def __init__(self) -> None:
         self.window: Optional["UiWindow"] = None
+        self.memo = Memo()
 
     def set_window(self, window: "UiWindow") -> None:
         """Attach a `UiWindow` to this app (called by the embedding code)."""
@@ -41,6 +47,17 @@ class AppBase:
         # block until the window closes.
         self.window.run()
 
+    async def run_async(self) -> None:
+        """Render once and run the window without blocking the asyncio loop.
+
+        Awaits `UiWindow.run_async()`. Raises `RuntimeError` if no window has
+        been attached.
+        """
+        if not self.window:
+            raise RuntimeError("Window not set. Call set_window(window) before run_async().")
+        self.render()
+        await self.window.run_async()
+
     def set_root(self, element: Element) -> None:
         """Convenience: set the window root element.
 
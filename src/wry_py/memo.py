@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .wry_py import Element, ElementBuilder
+
+
+class _Entry(NamedTuple):
+    deps: Tuple[Any, ...]
+    element: "Element"
+
+
+class Memo:
+    """Cache of built subtrees, reused across renders while their deps don't change.
+
+    Call it with a key, the values the subtree depends on and a function that
+    builds it. The function only runs when the key is new or its deps changed;
+    otherwise the element built last time is returned. That element keeps the
+    content hash computed when it was built, so the window skips it when
+    diffing instead of comparing it again.
+
+    The least recently used entries are evicted once there are more than
+    `max_entries` of them.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+
+    def __call__(
+        self,
+        key: Hashable,
+        deps: Any,
+        build: Callable[[], Union["Element", "ElementBuilder"]],
+    ) -> "Element":
+        """Return the element cached under `key`, building it if `deps` changed.
+
+        `deps` is compared by equality; a list or tuple is compared item by
+        item. `build` may return an `Element` or an `ElementBuilder`.
+        """
+        deps = tuple(deps) if isinstance(deps, (list, tuple)) else (deps,)
+        entry = self._entries.get(key)
+        if entry is not None and entry.deps == deps:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.element
+
+        self.misses += 1
+        element = build()
+        if hasattr(element, "build"):
+            element = element.build()
+        self._entries[key] = _Entry(deps, element)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return element
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of calls answered from the cache, or 0.0 before any call."""
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Report ``hits``, ``misses``, ``evictions``, ``entries``,
+        ``max_entries`` and ``hit_rate``."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": self.hit_rate,
+        }
+
+    def invalidate(self, key: Hashable) -> None:
+        """Forget the element cached under `key`, if any."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Forget every cached element. Counters are kept."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
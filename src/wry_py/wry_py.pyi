@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Callable, Optional
+import os
+from typing import Awaitable, Callable, Iterable, Optional
 
 # Element
 
@@ -28,6 +29,10 @@ class ElementBuilder:
     def radio(label: Optional[str] = ...) -> ElementBuilder: ...
     @staticmethod
     def select() -> ElementBuilder: ...
+    @staticmethod
+    def virtual_list(
+        row_count: int, row_height: float, render_row: Callable[[int], Element | ElementBuilder]
+    ) -> ElementBuilder: ...
 
     # Layout - Size
     def width(self, w: float) -> ElementBuilder: ...
@@ -149,15 +154,23 @@ class ElementBuilder:
     def child(self, child: Element) -> ElementBuilder: ...
     def child_builder(self, child: ElementBuilder) -> ElementBuilder: ...
     def child_text(self, text: str) -> ElementBuilder: ...
+    def children(self, children: Iterable[Element | ElementBuilder]) -> ElementBuilder: ...
+    def extend(self, children: Iterable[Element | ElementBuilder]) -> ElementBuilder: ...
 
     # Interactivity
     def on_click(self, callback: Callable[[], None]) -> ElementBuilder: ...
-    def on_input(self, callback: Callable[[str], None]) -> ElementBuilder: ...
+    def on_input(
+        self,
+        callback: Callable[[str], None],
+        debounce_ms: Optional[int] = ...,
+        throttle_ms: Optional[int] = ...,
+    ) -> ElementBuilder: ...
     def on_change(self, callback: Callable[[str], None]) -> ElementBuilder: ...
     def on_mouse_enter(self, callback: Callable[[], None]) -> ElementBuilder: ...
     def on_mouse_leave(self, callback: Callable[[], None]) -> ElementBuilder: ...
     def on_mouse_down(self, callback: Callable[[], None]) -> ElementBuilder: ...
     def on_mouse_up(self, callback: Callable[[], None]) -> ElementBuilder: ...
+    def on_mouse_move(self, callback: Callable[[float, float], None]) -> ElementBuilder: ...
 
     # Input properties
     def value(self, val: str) -> ElementBuilder: ...
@@ -171,10 +184,14 @@ class ElementBuilder:
     def option(self, value: str, label: str) -> ElementBuilder: ...
     def selected(self, value: str) -> ElementBuilder: ...
 
+    # Virtual list properties
+    def overscan(self, rows: int) -> ElementBuilder: ...
+
     # Identification (for partial updates)
     def id(self, id: str) -> ElementBuilder: ...
     def class_name(self, name: str) -> ElementBuilder: ...
     def classes(self, names: list[str]) -> ElementBuilder: ...
+    def key(self, key: str) -> ElementBuilder: ...
 
     # Final
     def build(self) -> Element: ...
@@ -186,6 +203,7 @@ class AppBase:
     def set_window(self, window: "UiWindow") -> None: ...
     def render(self) -> None: ...
     def run(self) -> None: ...
+    async def run_async(self) -> None: ...
     def set_root(self, element: Element) -> None: ...
     def on_start(self) -> None: ...
     def on_close(self) -> None: ...
@@ -197,16 +215,26 @@ class UiWindow:
         width: Optional[int] = ...,
         height: Optional[int] = ...,
         background_color: Optional[str] = ...,
+        callback_workers: Optional[int] = ...,
+        initial_nodes: Optional[int] = ...,
     ) -> None: ...
 
     def set_root(self, element: Element) -> None: ...
     def set_title(self, title: str) -> None: ...
     def update_element(self, element_id: str, element: Element) -> None: ...
     def run(self) -> None: ...
+    def run_async(self) -> Awaitable[None]: ...
+    def sync(self, timeout: float = 5.0) -> bool: ...
+    def batch(self) -> UpdateBatch: ...
     def close(self) -> None: ...
     def is_running(self) -> bool: ...
+    def stats(self) -> dict[str, object]: ...
     def __repr__(self) -> str: ...
 
+class UpdateBatch:
+    def __enter__(self) -> UpdateBatch: ...
+    def __exit__(self, exc_type: object = ..., exc_value: object = ..., traceback: object = ...) -> bool: ...
+
 # Convenience functions
 
 def div() -> ElementBuilder: ...
@@ -217,8 +245,17 @@ def input() -> ElementBuilder: ...
 def checkbox(label: Optional[str] = ...) -> ElementBuilder: ...
 def radio(label: Optional[str] = ...) -> ElementBuilder: ...
 def select() -> ElementBuilder: ...
+def virtual_list(
+    row_count: int, row_height: float, render_row: Callable[[int], Element | ElementBuilder]
+) -> ElementBuilder: ...
 
 class AssetCatalog:
     def __init__(self) -> None: ...
     def add(self, name: str, data: bytes) -> None: ...
+    def add_file(self, path: str | os.PathLike[str], name: Optional[str] = ...) -> None: ...
+    def add_dir(self, root: str | os.PathLike[str], glob: str = ...) -> int: ...
+    def add_zip(self, path: str | os.PathLike[str]) -> int: ...
+    def get_url(self, name: str) -> Optional[str]: ...
     def get_data_uri(self, name: str) -> Optional[str]: ...
+    def set_cache_budget(self, max_bytes: int) -> None: ...
+    def cache_stats(self) -> dict[str, int]: ...